@@ -30,7 +30,9 @@ class UserDetailsSerializer(serializers.ModelSerializer):
 
         if address_data:
             if instance.address:
-                Address.objects.filter(id=instance.address.id).update(**address_data)
+                for attr, value in address_data.items():
+                    setattr(instance.address, attr, value)
+                instance.address.save()
             else:
                 address = Address.objects.create(**address_data)
                 validated_data.update({'address': address})
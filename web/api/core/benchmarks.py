@@ -0,0 +1,528 @@
+"""
+Нагрузочный прогон маршрутов API через тестовый клиент (команда `bench_api`).
+
+Каждый маршрут `api/public` и `api/auth` описан случаем `Case`: метод, имя маршрута, параметры, тело запроса
+и пользователь. Параметры строятся по `BenchFixtures` - популярному предложению заполненной базы (см. core.seeding),
+его точке выдачи, компании и служебным пользователям. Каждый запрос выполняется в точке сохранения, которая
+откатывается после ответа, поэтому запись не меняет данные и все повторы видят одно и то же состояние.
+
+По каждому случаю считаются перцентили времени ответа (после прогревочных запросов), число SQL-запросов
+и пиковая память Python (tracemalloc) отдельного инструментированного запроса: трассировка памяти и запись
+запросов замедляют ответ и не должны попадать в замеры времени. `get_api_routes` перечисляет маршруты с методами,
+чтобы показать маршруты без случая.
+"""
+import copy
+import io
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver, resolve, reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.test import APIClient
+
+from company.models import Company, RentalPoint, Reservation
+from core.collections import ImportFormats, ImportStatuses, ReservationStatuses
+from core.seeding import SCHEDULES
+from offer.images import get_or_create_image
+from offer.models import CatalogImport, ImageUpload, Offer, Price, Rating
+from product.models import Product
+from reference.models import Address, Category, City
+from user.models import User
+
+
+API_NAMESPACES = ('api:public', 'api:auth')
+ROUTE_METHODS = ('get', 'post', 'put', 'patch', 'delete')
+PERCENTILES = (50, 95, 99)
+EXPECTED_STATUSES = {'get': 200, 'post': 201, 'put': 200, 'patch': 200, 'delete': 204}
+BENCH_PASSWORD = 'bench-Password-1'
+CATALOG_CSV = 'rental_point,product,category,count,prices\n{rental_point},Байдарка,Вода,3,"[]"\n'
+
+
+class BenchError(Exception):
+    """
+    Для прогона недостаточно данных
+    """
+
+
+class Case:
+    """
+    Запрос прогона. `url_name` - имя маршрута, путь или функция от `BenchFixtures`, возвращающая путь;
+    `kwargs`, `query`, `data` и `headers` - значения или функции от `BenchFixtures`;
+    `user` - атрибут fixtures с пользователем запроса или None для анонимного запроса.
+    `external` - маршрут обращается к внешнему сервису и выполняется только по запросу.
+    `status` - ожидаемый код ответа, по умолчанию из EXPECTED_STATUSES по методу
+    """
+
+    def __init__(self, method, url_name, kwargs=None, query=None, data=None, headers=None, user='user',
+                 format='json', external=False, name=None, status=None):
+        self.method = method
+        self.url_name = url_name
+        self.kwargs = kwargs
+        self.query = query
+        self.data = data
+        self.headers = headers
+        self.user = user
+        self.format = format
+        self.external = external
+        self.name = name or f'{method.upper()} {url_name.rsplit(":", 1)[-1]}'
+        self.status = status or EXPECTED_STATUSES[method]
+
+    @staticmethod
+    def resolve_value(value, fixtures):
+        return value(fixtures) if callable(value) else value
+
+    def get_path(self, fixtures):
+        if callable(self.url_name):
+            return self.url_name(fixtures)
+        if self.url_name.startswith('/'):
+            return self.url_name
+
+        return reverse(self.url_name, kwargs=self.resolve_value(self.kwargs, fixtures))
+
+    def get_request(self, fixtures):
+        """
+        Путь и именованные аргументы вызова метода тестового клиента
+        """
+
+        path = self.get_path(fixtures)
+        options = dict(self.resolve_value(self.headers, fixtures) or {})
+
+        if self.method == 'get':
+            options['data'] = self.resolve_value(self.query, fixtures)
+        elif self.format == 'raw':
+            options['data'] = self.resolve_value(self.data, fixtures)
+            options['content_type'] = 'application/octet-stream'
+        else:
+            options['data'] = self.resolve_value(self.data, fixtures)
+            options['format'] = self.format
+            query = self.resolve_value(self.query, fixtures)
+            if query:
+                path = f'{path}?{"&".join(f"{key}={value}" for key, value in query.items())}'
+
+        return path, options
+
+
+class BenchFixtures:
+    """
+    Объекты, на которые ссылаются случаи прогона. Создаются внутри транзакции прогона и откатываются вместе с ней
+    """
+
+    def __init__(self):
+        self.offer = Offer.objects.select_related('rental_point__company', 'product__category').filter(
+            rental_point__company__isnull=False).order_by('-rating_count', 'id').first()
+        if self.offer is None:
+            raise BenchError('Нет предложений: заполните базу командой seed_bench.')
+
+        self.rental_point = self.offer.rental_point
+        self.company = self.rental_point.company
+        self.offer_ids = list(
+            Offer.objects.filter(rental_point=self.rental_point).order_by('-id').values_list('id', flat=True)[:50])
+        self.today = timezone.localdate()
+
+        self.user = User.objects.create_user('bench-api-user@example.com', BENCH_PASSWORD)
+        self.admin = User.objects.create_user('bench-api-admin@example.com', BENCH_PASSWORD, is_staff=True)
+        self.owner = self.company.user
+        if self.owner is None:
+            self.owner = User.objects.create_user('bench-api-owner@example.com', BENCH_PASSWORD)
+            self.company.user = self.owner
+            self.company.save(update_fields=('user', 'updated_at'))
+
+        self.city = self.rental_point.address.city if self.rental_point.address else City.objects.first()
+        self.product = self.offer.product or Product.objects.first()
+        self.category = self.product.category if self.product and self.product.category else Category.objects.first()
+        if self.city is None or self.product is None or self.category is None:
+            raise BenchError('Нет городов, предметов или категорий: заполните базу командой seed_bench.')
+
+        self.price = Price.objects.filter(offer=self.offer).first() or Price.objects.create(
+            offer=self.offer, time_from=1, price_per_time=100)
+        self.rating = Rating.objects.create(offer=self.offer, user=self.user, mark=5)
+        self.reservation = Reservation.objects.create(
+            offer=self.offer, user=self.user, status=ReservationStatuses.NEW,
+            datetime_from=timezone.now() + timedelta(days=1),
+            datetime_to=timezone.now() + timedelta(days=1, hours=2),
+        )
+
+        self.image_content = get_bench_image()
+        self.image, _ = get_or_create_image(ContentFile(self.image_content), 'bench.png')
+        self.upload = ImageUpload.objects.create(user=self.user, name='bench.png', size=len(self.image_content))
+        self.catalog_import = CatalogImport.objects.create(
+            company=self.company, user=self.admin, source='bench.csv', format=ImportFormats.CSV,
+            status=ImportStatuses.FAILED, file=ContentFile(self.get_catalog().encode(), 'bench.csv'),
+        )
+
+        # Удаления выполняются на отдельной компании: каскад по популярной компании или предложению измерял бы
+        # объем данных, а не маршрут
+        self.scratch_owner = User.objects.create_user('bench-api-scratch@example.com', BENCH_PASSWORD)
+        self.scratch_company = Company.objects.create(name='Прокат для удаления', user=self.scratch_owner)
+        self.scratch_rental_point = RentalPoint.objects.create(
+            company=self.scratch_company, address=Address.objects.create(address='ул. Лесная, 0', city=self.city),
+            phone='+79990000000', schedule=SCHEDULES[0],
+        )
+        self.scratch_offer = Offer.objects.create(
+            rental_point=self.scratch_rental_point, product=self.product, count=3, description='Прокат для удаления')
+        Price.objects.create(offer=self.scratch_offer, time_from=1, price_per_time=100)
+        Rating.objects.create(offer=self.scratch_offer, user=self.user, mark=4)
+        Reservation.objects.create(
+            offer=self.scratch_offer, user=self.user, datetime_from=self.reservation.datetime_from,
+            datetime_to=self.reservation.datetime_to,
+        )
+
+        uid = urlsafe_base64_encode(force_bytes(self.user.pk))
+        self.password_reset = {'uid': uid, 'token': default_token_generator.make_token(self.user)}
+
+    def get_catalog(self):
+        return CATALOG_CSV.format(rental_point=self.rental_point.id)
+
+    def get_catalog_file(self):
+        file = io.BytesIO(self.get_catalog().encode())
+        file.name = 'bench.csv'
+        return file
+
+    def window(self, days=1, hours=2):
+        start = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=days)
+        return {'datetime_from': start.isoformat(), 'datetime_to': (start + timedelta(hours=hours)).isoformat()}
+
+    def rental_point_data(self):
+        return {
+            'phone': '+79990000001', 'is_delivery': False, 'schedule': SCHEDULES[0],
+            'address': {'city': self.city.id, 'address': 'ул. Новая, 1', 'latitude': '55.750000',
+                        'longitude': '37.620000'},
+        }
+
+
+def get_bench_image():
+    """
+    PNG 64x64 для загрузок и вариантов изображений
+    """
+
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (200, 80, 40)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def company_kwargs(fixtures):
+    return {'company_pk': fixtures.company.id}
+
+
+def rental_point_kwargs(fixtures):
+    return {'rental_point_pk': fixtures.rental_point.id}
+
+
+def offer_kwargs(fixtures):
+    return {'offer_pk': fixtures.offer.id}
+
+
+def offer_data(fixtures):
+    return {'description': 'Прокат велосипеда', 'count': 5, 'product': fixtures.product.id,
+            'rental_point': fixtures.rental_point.id}
+
+
+def slots_query(fixtures):
+    return {'date_from': fixtures.today.isoformat(), 'date_to': (fixtures.today + timedelta(days=6)).isoformat()}
+
+
+def analytics_query(fixtures):
+    return {'date_from': (fixtures.today - timedelta(days=30)).isoformat(),
+            'date_to': fixtures.today.isoformat(), 'group': 'rental_point'}
+
+
+COMPANY = 'api:public:company:'
+REFERENCE = 'api:public:reference:'
+PRODUCT = 'api:public:product:'
+OFFER = 'api:public:offer:'
+AUTH = 'api:auth:'
+
+CASES = (
+    # Компании и точки выдачи
+    Case('get', f'{COMPANY}slots', query=lambda f: {'rental_point': f.rental_point.id, 'date': f.today.isoformat()},
+         external=True),
+    Case('post', f'{COMPANY}slots', data=lambda f: {'rental_point': f.rental_point.id}, external=True, status=200),
+    Case('get', f'{COMPANY}company-list', user='owner'),
+    # Известная ошибка: CompanyViewSet.perform_create падает на пользователе без компании
+    Case('post', f'{COMPANY}company-list', data={'name': 'Новый прокат', 'description': 'Лодки'}, status=500),
+    Case('get', f'{COMPANY}company-detail', kwargs=lambda f: {'pk': f.company.id}, user='owner'),
+    Case('put', f'{COMPANY}company-detail', kwargs=lambda f: {'pk': f.company.id}, user='owner',
+         data=lambda f: {'name': f.company.name, 'description': 'Обновлено'}),
+    Case('delete', f'{COMPANY}company-detail', kwargs=lambda f: {'pk': f.scratch_company.id}, user='scratch_owner'),
+    # Доска компаний зарегистрирована под теми же именами маршрутов, что и компании пользователя
+    Case('get', '/api/v1/company/board/', name='GET company board', user=None),
+    Case('get', lambda f: f'/api/v1/company/board/{f.company.id}/', name='GET company board detail', user=None),
+    Case('get', f'{COMPANY}rentalpoint-list', kwargs=company_kwargs, name='GET company rental points', user='owner'),
+    Case('post', f'{COMPANY}rentalpoint-list', kwargs=company_kwargs, name='POST company rental point',
+         user='owner', data=lambda f: f.rental_point_data()),
+    Case('get', f'{COMPANY}rentalpoint-detail', name='GET company rental point', user='owner',
+         kwargs=lambda f: {'company_pk': f.company.id, 'pk': f.rental_point.id}),
+    Case('put', f'{COMPANY}rentalpoint-detail', name='PUT company rental point', user='owner',
+         kwargs=lambda f: {'company_pk': f.company.id, 'pk': f.rental_point.id}, data=lambda f: f.rental_point_data()),
+    Case('delete', f'{COMPANY}rentalpoint-detail', name='DELETE company rental point', user='scratch_owner',
+         kwargs=lambda f: {'company_pk': f.scratch_company.id, 'pk': f.scratch_rental_point.id}),
+    Case('get', f'{COMPANY}company-analytics-list', kwargs=company_kwargs, query=analytics_query, user='owner'),
+    Case('get', f'{COMPANY}rentalpoint-list'),
+    Case('get', f'{COMPANY}rentalpoint-batch-slots', query=slots_query),
+    Case('get', f'{COMPANY}rentalpoint-detail', kwargs=lambda f: {'pk': f.rental_point.id}),
+    Case('get', f'{COMPANY}rentalpoint-slots', kwargs=lambda f: {'pk': f.rental_point.id}, query=slots_query),
+    Case('get', f'{COMPANY}offer-list', kwargs=rental_point_kwargs, name='GET rental point offers'),
+    Case('get', f'{COMPANY}offer-detail', kwargs=lambda f: {'rental_point_pk': f.rental_point.id, 'pk': f.offer.id},
+         name='GET rental point offer'),
+    Case('get', f'{COMPANY}offer-export', kwargs=lambda f: {**rental_point_kwargs(f), 'export_format': 'csv'},
+         name='GET rental point offers export'),
+    Case('get', f'{COMPANY}reservation-list', kwargs=rental_point_kwargs, name='GET rental point reservations'),
+    Case('get', f'{COMPANY}reservation-detail', name='GET rental point reservation',
+         kwargs=lambda f: {'rental_point_pk': f.rental_point.id, 'pk': f.reservation.id}),
+    Case('get', f'{COMPANY}reservation-export', kwargs=lambda f: {**rental_point_kwargs(f), 'export_format': 'jsonl'},
+         name='GET rental point reservations export', user='owner'),
+
+    # Справочники и предметы
+    Case('get', f'{REFERENCE}city', user=None),
+    Case('get', f'{REFERENCE}address', user=None),
+    Case('get', f'{REFERENCE}category-list', user=None),
+    Case('get', f'{REFERENCE}category-tree', user=None),
+    Case('get', f'{REFERENCE}category-detail', kwargs=lambda f: {'pk': f.category.id}, user=None),
+    Case('get', f'{REFERENCE}product-list', kwargs=lambda f: {'category_pk': f.category.id},
+         name='GET category products', user=None),
+    Case('get', f'{REFERENCE}product-detail', kwargs=lambda f: {'category_pk': f.category.id, 'pk': f.product.id},
+         name='GET category product', user=None),
+    Case('get', f'{PRODUCT}product-list'),
+    Case('get', f'{PRODUCT}product-detail', kwargs=lambda f: {'pk': f.product.id}),
+
+    # Предложения
+    Case('get', f'{OFFER}offer-list', query={'search': 'велосипеды'}),
+    Case('post', f'{OFFER}offer-list', data=offer_data),
+    Case('get', f'{OFFER}offer-detail', kwargs=lambda f: {'pk': f.offer.id}),
+    Case('put', f'{OFFER}offer-detail', kwargs=lambda f: {'pk': f.offer.id}, data=offer_data),
+    Case('delete', f'{OFFER}offer-detail', kwargs=lambda f: {'pk': f.scratch_offer.id}),
+    Case('get', f'{OFFER}offer-availability', kwargs=lambda f: {'pk': f.offer.id}, query=lambda f: f.window()),
+    Case('post', f'{OFFER}offer-batch-availability', data=lambda f: {**f.window(), 'offers': f.offer_ids},
+         status=200),
+    Case('get', f'{OFFER}offer-quote', kwargs=lambda f: {'pk': f.offer.id}, query={'duration': '03:00:00'}),
+    Case('post', f'{OFFER}offer-batch-quote',
+         data=lambda f: {'offers': f.offer_ids, 'durations': ['01:00:00', '1 00:00:00', '7 00:00:00']}, status=200),
+    Case('get', f'{OFFER}offer-board-list', user=None),
+    # Известная ошибка: сериализатор доски только для чтения, создание падает на обязательных полях предложения
+    Case('post', f'{OFFER}offer-board-list', data=offer_data, status=500),
+    Case('get', f'{OFFER}offer-board-detail', kwargs=lambda f: {'pk': f.offer.id}, user=None),
+    Case('put', f'{OFFER}offer-board-detail', kwargs=lambda f: {'pk': f.offer.id}, data=offer_data),
+    Case('delete', f'{OFFER}offer-board-detail', kwargs=lambda f: {'pk': f.scratch_offer.id}),
+    Case('get', f'{OFFER}rating-list', kwargs=offer_kwargs),
+    Case('post', f'{OFFER}rating-list', kwargs=offer_kwargs,
+         data=lambda f: {'mark': 4, 'comment': 'Хорошо', 'offer': f.offer.id, 'user': f.user.id}),
+    Case('get', f'{OFFER}rating-detail', kwargs=lambda f: {**offer_kwargs(f), 'pk': f.rating.id}),
+    Case('put', f'{OFFER}rating-detail', kwargs=lambda f: {**offer_kwargs(f), 'pk': f.rating.id},
+         data=lambda f: {'mark': 3, 'comment': 'Неплохо', 'offer': f.offer.id, 'user': f.user.id}),
+    Case('delete', f'{OFFER}rating-detail', kwargs=lambda f: {**offer_kwargs(f), 'pk': f.rating.id}),
+    Case('get', f'{OFFER}price-list', kwargs=offer_kwargs),
+    Case('post', f'{OFFER}price-list', kwargs=offer_kwargs,
+         data=lambda f: {'time_from': 2, 'time_from_unit': 'day', 'price_per_time': 900, 'price_per_time_unit': 'day',
+                         'offer': f.offer.id}),
+    Case('get', f'{OFFER}price-detail', kwargs=lambda f: {**offer_kwargs(f), 'pk': f.price.id}),
+    Case('put', f'{OFFER}price-detail', kwargs=lambda f: {**offer_kwargs(f), 'pk': f.price.id},
+         data=lambda f: {'time_from': f.price.time_from, 'time_from_unit': f.price.time_from_unit,
+                         'price_per_time': f.price.price_per_time + 10,
+                         'price_per_time_unit': f.price.price_per_time_unit, 'offer': f.offer.id}),
+    Case('delete', f'{OFFER}price-detail', kwargs=lambda f: {**offer_kwargs(f), 'pk': f.price.id}),
+    Case('get', f'{OFFER}reservation-list', kwargs=offer_kwargs),
+    Case('post', f'{OFFER}reservation-list', kwargs=offer_kwargs, data=lambda f: {**f.window(days=2), 'count': 1}),
+    Case('get', f'{OFFER}reservation-detail', kwargs=lambda f: {**offer_kwargs(f), 'pk': f.reservation.id}),
+    Case('put', f'{OFFER}reservation-detail', kwargs=lambda f: {**offer_kwargs(f), 'pk': f.reservation.id},
+         data=lambda f: {**f.window(), 'count': 1, 'status': ReservationStatuses.ACCEPTED}),
+    Case('get', f'{OFFER}offer-image-detail', kwargs=lambda f: {'pk': f.image.id}, user=None),
+    Case('get', f'{OFFER}offer-image-variant', kwargs=lambda f: {'pk': f.image.id, 'variant': 'thumbnail'},
+         user=None, status=302),
+    Case('post', f'{OFFER}offer-upload-list', data=lambda f: {'name': 'bench.png', 'size': len(f.image_content)}),
+    Case('get', f'{OFFER}offer-upload-detail', kwargs=lambda f: {'pk': f.upload.id}),
+    Case('put', f'{OFFER}offer-upload-detail', kwargs=lambda f: {'pk': f.upload.id}, format='raw',
+         data=lambda f: f.image_content,
+         headers=lambda f: {'HTTP_CONTENT_RANGE': f'bytes 0-{len(f.image_content) - 1}/{len(f.image_content)}'}),
+    Case('get', f'{OFFER}offer-import-list', user='admin'),
+    Case('post', f'{OFFER}offer-import-list', user='admin', format='multipart',
+         data=lambda f: {'company': f.company.id, 'file': f.get_catalog_file()}),
+    Case('get', f'{OFFER}offer-import-detail', kwargs=lambda f: {'pk': f.catalog_import.id}, user='admin'),
+    Case('post', f'{OFFER}offer-import-resume', kwargs=lambda f: {'pk': f.catalog_import.id}, user='admin',
+         status=200),
+
+    # Документация
+    Case('get', '/api/v1/docs/', name='GET public docs', user='admin'),
+    Case('get', '/api/v1/docs/redoc/', name='GET public redoc', user='admin'),
+    Case('get', '/api/v1/auth/docs/', name='GET auth docs', user='admin'),
+    Case('get', '/api/v1/auth/docs/redoc/', name='GET auth redoc', user='admin'),
+
+    # Аутентификация
+    Case('post', '/api/v1/auth/', name='POST register', user=None,
+         data=lambda f: {'email': 'bench-api-new@example.com', 'password1': BENCH_PASSWORD,
+                         'password2': BENCH_PASSWORD, 'first_name': 'Иван', 'last_name': 'Петров',
+                         'address': {'city': f.city.id}}),
+    Case('post', f'{AUTH}rest_login', user=None,
+         data=lambda f: {'email': f.user.email, 'password': BENCH_PASSWORD}, status=200),
+    # Выход по GET отключен (ACCOUNT_LOGOUT_ON_GET)
+    Case('get', f'{AUTH}rest_logout', status=405),
+    Case('post', f'{AUTH}rest_logout', status=200),
+    Case('get', f'{AUTH}rest_user_details'),
+    Case('put', f'{AUTH}rest_user_details',
+         data={'first_name': 'Иван', 'last_name': 'Петров', 'phone': '+79990000002'}),
+    Case('post', f'{AUTH}rest_password_change',
+         data={'old_password': BENCH_PASSWORD, 'new_password1': f'{BENCH_PASSWORD}2',
+               'new_password2': f'{BENCH_PASSWORD}2'}, status=200),
+    # Известная ошибка: в письме сброса пароля нет маршрута password_reset_confirm
+    Case('post', f'{AUTH}rest_password_reset', user=None, data=lambda f: {'email': f.user.email}, status=500),
+    Case('post', f'{AUTH}rest_password_reset_confirm', user=None,
+         data=lambda f: {**f.password_reset, 'new_password1': f'{BENCH_PASSWORD}3',
+                         'new_password2': f'{BENCH_PASSWORD}3'}, status=200),
+)
+
+
+def join_route(prefix, route):
+    """
+    Склеивает шаблоны маршрутов так же, как `ResolverMatch.route`
+    """
+
+    if not prefix:
+        return route
+
+    return prefix + (route[1:] if route.startswith('^') else route)
+
+
+def normalize_route(route):
+    return route.rstrip('$')
+
+
+def get_pattern_methods(pattern):
+    view_class = getattr(pattern.callback, 'view_class', None) or getattr(pattern.callback, 'cls', None)
+    actions = getattr(pattern.callback, 'actions', None)
+    if actions:
+        # Действия набора, методы которых запрещены во view (http_method_names), отвечают 405
+        allowed = view_class.http_method_names if view_class is not None else ROUTE_METHODS
+        return sorted(method for method in actions if method in ROUTE_METHODS and method in allowed)
+
+    if view_class is None:
+        return ['get']
+
+    return [
+        method for method in ROUTE_METHODS if method in view_class.http_method_names and hasattr(view_class, method)
+    ]
+
+
+def get_api_routes(namespaces=API_NAMESPACES):
+    """
+    Маршруты API в пространствах имен `namespaces`: {(метод, шаблон маршрута)}. Шаблоны, отличающиеся только
+    завершающим `$`, считаются одним маршрутом: запрос разрешается в первый из них, поэтому методы берутся
+    только у первого
+    """
+
+    routes = set()
+    seen = set()
+    prefixes = tuple(f'{namespace}:' for namespace in namespaces)
+
+    def walk(patterns, prefix, namespace):
+        for pattern in patterns:
+            route = join_route(prefix, str(pattern.pattern))
+            if isinstance(pattern, URLResolver):
+                nested = ':'.join(filter(None, (namespace, pattern.namespace))) if pattern.namespace else namespace
+                walk(pattern.url_patterns, route, nested)
+            elif (namespace in namespaces or namespace.startswith(prefixes)) and normalize_route(route) not in seen:
+                seen.add(normalize_route(route))
+                routes.update((method, normalize_route(route)) for method in get_pattern_methods(pattern))
+
+    walk(get_resolver().url_patterns, '', '')
+    return routes
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(int(round(percent / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+class BenchRunner:
+    """
+    Выполнение случаев прогона тестовым клиентом и сбор метрик
+    """
+
+    def __init__(self, fixtures, repeat=20, warmup=2, cold=False):
+        self.fixtures = fixtures
+        self.repeat = repeat
+        self.warmup = warmup
+        self.cold = cold
+        self.client = APIClient(raise_request_exception=False)
+
+    def call(self, case):
+        """
+        Один запрос в откатываемой точке сохранения. Потоковый ответ читается целиком.
+        Возвращает (время в мс, код ответа, размер ответа)
+        """
+
+        # Запрос собирается заново: файлы multipart читаются при отправке
+        path, options = case.get_request(self.fixtures)
+        # Откат транзакции не возвращает изменения пользователя в памяти (например, смену пароля)
+        user = getattr(self.fixtures, case.user) if case.user else None
+        self.client.force_authenticate(copy.copy(user))
+        if self.cold:
+            cache.clear()
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            response = getattr(self.client, case.method)(path, **options)
+            if response.streaming:
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.content)
+            transaction.set_rollback(True)
+
+        return (time.perf_counter() - started) * 1000, response.status_code, size
+
+    def run(self, case):
+        for _ in range(self.warmup):
+            self.call(case)
+        timings = [self.call(case)[0] for _ in range(self.repeat)]
+
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            _, status, size = self.call(case)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        result = {
+            'name': case.name,
+            'method': case.method.upper(),
+            'status': status,
+            'expected': case.status,
+            'size': size,
+            'mean': statistics.mean(timings),
+            'queries': len(queries),
+            'peak_kb': peak / 1024,
+        }
+        result.update({f'p{percent}': percentile(timings, percent) for percent in PERCENTILES})
+        return result
+
+    def get_route(self, case):
+        path = case.get_request(self.fixtures)[0].split('?', 1)[0]
+        return case.method, normalize_route(resolve(path).route)
+
+
+def compare_results(results, baseline, threshold):
+    """
+    Регрессии относительно сохраненного прогона: рост p50 больше чем на `threshold` (доля) или рост числа запросов
+    """
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['name'])
+        if previous is None:
+            continue
+
+        if result['p50'] > previous['p50'] * (1 + threshold):
+            regressions.append(f'{result["name"]}: p50 {previous["p50"]:.2f} -> {result["p50"]:.2f} мс')
+        if result['queries'] > previous['queries']:
+            regressions.append(f'{result["name"]}: запросов {previous["queries"]} -> {result["queries"]}')
+
+    return regressions
@@ -0,0 +1,67 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+from core.cache import get_generations, is_process_local, record_hit
+
+
+class ResponseCacheMixin:
+    """
+    Примесь кэширует данные ответов list и retrieve. Ключ строится из адреса, нормализованной строки запроса
+    (параметры по алфавиту, пустые значения отброшены) и поколений моделей `cache_models`, поэтому запись
+    становится недоступной сразу после изменения любой из этих моделей. Попадания и промахи учитываются
+    в счетчиках и отражаются заголовком X-Cache. В кэше в памяти процесса каждый процесс хранит свою копию
+    записей, поэтому их время жизни ограничено LOCAL_RESPONSE_CACHE_TIMEOUT
+    """
+
+    cache_models = ()
+    cache_timeout = None
+
+    def get_cache_models(self):
+        return self.cache_models
+
+    def get_cache_name(self):
+        return self.__class__.__name__
+
+    def get_cache_key(self, request):
+        params = sorted(
+            (key, sorted(value for value in values if value != ''))
+            for key, values in request.query_params.lists()
+        )
+        document = json.dumps([
+            request.build_absolute_uri(request.path),
+            [(key, values) for key, values in params if values],
+            get_generations(self.get_cache_models()),
+        ])
+
+        return f'response:{self.get_cache_name()}:{hashlib.sha1(document.encode()).hexdigest()}'
+
+    def get_cached_response(self, request, build_response):
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        record_hit(self.get_cache_name(), data is not None)
+
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = build_response()
+        if response.status_code == 200:
+            timeout = self.cache_timeout if self.cache_timeout is not None else settings.RESPONSE_CACHE_TIMEOUT
+            if is_process_local():
+                timeout = min(timeout, settings.LOCAL_RESPONSE_CACHE_TIMEOUT)
+            cache.set(key, response.data, timeout)
+        response['X-Cache'] = 'MISS'
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(request, lambda: super(ResponseCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, lambda: super(ResponseCacheMixin, self).retrieve(request, *args, **kwargs))
@@ -0,0 +1,261 @@
+"""
+Компилированный режим сериализаторов только на чтение.
+
+Дерево полей сериализатора один раз превращается в плоский список колонок для `.values()` и сгенерированную
+функцию, собирающую словарь ответа из строки: без объектов моделей и без вызова `get_attribute`/`to_representation`
+каждого поля там, где это не меняет результат. Вложенные сериализаторы по внешнему ключу читаются из тех же строк
+через JOIN, вложенные списки по обратному внешнему ключу - одним дополнительным запросом на список. Подписи choices
+(`source='get_<поле>_display'` и ChoiceField проекта) берутся из словарей, собранных при компиляции.
+
+Результат совпадает с `serializer_class(queryset, many=True).data`. Сериализатор, содержащий поля, для которых
+это не гарантируется (SerializerMethodField, источники-методы, many-to-many и т. п.), не компилируется:
+`compile_serializer` выбрасывает NotCompilable, и представление использует обычный сериализатор.
+"""
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import ForeignKey, ManyToOneRel, OneToOneField
+from django.utils.encoding import force_str
+from rest_framework import serializers
+from rest_framework.fields import empty
+
+from api.core.serializers import ChoiceField
+
+
+DISPLAY_SOURCE = re.compile(r'^get_(?P<field>\w+)_display$')
+
+# Поля, чье to_representation для значения из базы данных возвращает его без изменений
+IDENTITY_FIELDS = (
+    serializers.ReadOnlyField, serializers.CharField, serializers.IntegerField, serializers.FloatField,
+    serializers.BooleanField, serializers.PrimaryKeyRelatedField,
+)
+
+
+class NotCompilable(Exception):
+    """
+    Сериализатор нельзя скомпилировать без изменения результата
+    """
+
+
+def is_identity(field):
+    for field_class in IDENTITY_FIELDS:
+        if isinstance(field, field_class):
+            if type(field).to_representation is not field_class.to_representation:
+                return False
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                return field.pk_field is None
+            return True
+
+    return False
+
+
+class Compiler:
+    """
+    Генератор кода функции строка -> словарь
+    """
+
+    def __init__(self):
+        self.columns = []
+        self.constants = {}
+        self.nested = []
+        self.lines = []
+
+    def column(self, path):
+        if path not in self.columns:
+            self.columns.append(path)
+
+        return f'row[{path!r}]'
+
+    def constant(self, value):
+        name = f'c{len(self.constants)}'
+        self.constants[name] = value
+
+        return name
+
+    def emit(self, indent, line):
+        self.lines.append('    ' * indent + line)
+
+    def compile_serializer(self, serializer, model, prefix, target, indent):
+        self.emit(indent, f'{target} = {{}}')
+        self.column(f'{prefix}{model._meta.pk.name}')
+
+        for field in serializer._readable_fields:
+            if field.default is not empty:
+                raise NotCompilable(f'{field.field_name}: значение по умолчанию')
+            if field.source == '*':
+                raise NotCompilable(f'{field.field_name}: source="*"')
+
+            self.compile_field(field, model, prefix, f'{target}[{field.field_name!r}]', indent)
+
+    def compile_field(self, field, model, prefix, target, indent):
+        *relations, attr = field.source_attrs
+
+        # Переход по внешним ключам: при пустом ключе DRF отдает None (allow_null) или пропускает поле
+        for relation in relations:
+            model_field = self.get_model_field(model, relation)
+            if not isinstance(model_field, (ForeignKey, OneToOneField)):
+                raise NotCompilable(f'{field.field_name}: {relation} не внешний ключ')
+
+            key = self.column(f'{prefix}{relation}')
+            self.emit(indent, f'if {key} is None:')
+            self.emit(indent + 1, f'{target} = None' if field.allow_null else 'pass')
+            self.emit(indent, 'else:')
+            indent += 1
+            prefix, model = f'{prefix}{relation}__', model_field.related_model
+
+        if isinstance(field, serializers.ListSerializer):
+            self.compile_list(field, model, prefix, attr, target, indent)
+        elif isinstance(field, serializers.BaseSerializer):
+            self.compile_nested(field, model, prefix, attr, target, indent)
+        else:
+            self.compile_value(field, model, prefix, attr, target, indent)
+
+    def compile_nested(self, serializer, model, prefix, attr, target, indent):
+        model_field = self.get_model_field(model, attr)
+        if not isinstance(model_field, (ForeignKey, OneToOneField)):
+            raise NotCompilable(f'{serializer.field_name}: {attr} не внешний ключ')
+
+        key = self.column(f'{prefix}{attr}')
+        self.emit(indent, f'if {key} is None:')
+        self.emit(indent + 1, f'{target} = None')
+        self.emit(indent, 'else:')
+
+        variable = f'nested{len(self.lines)}'
+        self.compile_serializer(serializer, model_field.related_model, f'{prefix}{attr}__', variable, indent + 1)
+        self.emit(indent + 1, f'{target} = {variable}')
+
+    def compile_list(self, serializer, model, prefix, attr, target, indent):
+        if prefix:
+            raise NotCompilable(f'{serializer.field_name}: вложенный список через связь')
+
+        relation = self.get_model_field(model, attr)
+        if type(relation) is not ManyToOneRel:
+            raise NotCompilable(f'{serializer.field_name}: {attr} не обратный внешний ключ')
+
+        child = CompiledSerializer(serializer.child, relation.related_model)
+        index = len(self.nested)
+        self.nested.append((child, relation.field.attname))
+        self.emit(indent, f'{target} = nested[{index}].get({self.column(model._meta.pk.name)}, [])')
+
+    def compile_value(self, field, model, prefix, attr, target, indent):
+        display = DISPLAY_SOURCE.match(attr)
+        if display is not None:
+            model_field = self.get_model_field(model, display['field'])
+            if not model_field.choices or not is_identity(field):
+                raise NotCompilable(f'{field.field_name}: {attr}')
+
+            # Как Model._get_FIELD_display: подпись choices или само значение, затем to_representation поля
+            labels = self.constant({
+                value: force_str(label, strings_only=True) for value, label in model_field.flatchoices})
+            value = self.column(f'{prefix}{display["field"]}')
+            if isinstance(field, serializers.CharField):
+                self.emit(indent, f'{target} = {labels}[{value}] if {value} in {labels} else '
+                                  f'(None if {value} is None else str({value}))')
+            else:
+                self.emit(indent, f'{target} = {labels}.get({value}, {value})')
+            return
+
+        model_field = self.get_model_field(model, attr)
+        if model_field.is_relation and not (
+                isinstance(field, serializers.PrimaryKeyRelatedField) and model_field.many_to_one):
+            raise NotCompilable(f'{field.field_name}: связь {attr}')
+
+        value = self.column(f'{prefix}{attr}')
+        if isinstance(field, ChoiceField) and type(field).to_representation is ChoiceField.to_representation:
+            choices = dict(field._choices)
+            if field.allow_blank:
+                choices[''] = ''
+            self.emit(indent, f'{target} = None if {value} is None else {self.constant(choices)}[{value}]')
+        elif is_identity(field):
+            self.emit(indent, f'{target} = {value}')
+        else:
+            representation = self.constant(field.to_representation)
+            self.emit(indent, f'{target} = None if {value} is None else {representation}({value})')
+
+    @staticmethod
+    def get_model_field(model, name):
+        try:
+            return model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise NotCompilable(f'{model.__name__}.{name} не поле модели')
+
+
+class CompiledSerializer:
+    """
+    Скомпилированный сериализатор: колонки для `.values()`, вложенные списки и функция сборки словаря
+    """
+
+    def __init__(self, serializer, model):
+        compiler = Compiler()
+        compiler.compile_serializer(serializer, model, '', 'data', 1)
+
+        source = '\n'.join(['def transform(row, nested):', *compiler.lines, '    return data'])
+        namespace = dict(compiler.constants)
+        exec(compile(source, f'<compiled {serializer.__class__.__name__}>', 'exec'), namespace)
+
+        self.model = model
+        self.columns = tuple(compiler.columns)
+        self.nested = tuple(compiler.nested)
+        self.transform = namespace['transform']
+        self.source = source
+
+    def values(self, queryset, *extra):
+        """
+        Строки queryset для сборки. `extra` - дополнительные колонки, например поля сортировки пагинации
+        """
+
+        return queryset.values(*self.columns, *(column for column in extra if column not in self.columns))
+
+    def serialize_rows(self, rows):
+        """
+        Список словарей ответа по строкам `.values(*self.columns)`
+        """
+
+        pk_name = self.model._meta.pk.name
+        nested = [child.serialize_children(key, [row[pk_name] for row in rows]) for child, key in self.nested]
+
+        transform = self.transform
+        return [transform(row, nested) for row in rows]
+
+    def serialize_children(self, key, parent_ids):
+        """
+        Вложенный список: {идентификатор родителя: [словари]} одним запросом
+        """
+
+        if not parent_ids:
+            return {}
+
+        queryset = self.model._default_manager.filter(**{f'{key}__in': parent_ids})
+        queryset = queryset.order_by(*(self.model._meta.ordering or ('pk',)))
+        rows = list(queryset.values(key, *self.columns))
+
+        grouped = defaultdict(list)
+        for row, data in zip(rows, self.serialize_rows(rows)):
+            grouped[row[key]].append(data)
+
+        return grouped
+
+    def serialize(self, queryset):
+        return self.serialize_rows(list(self.values(queryset)))
+
+
+@lru_cache(maxsize=None)
+def compile_serializer(serializer_class):
+    """
+    Компилирует класс сериализатора модели. NotCompilable, если результат может отличаться
+    """
+
+    model = getattr(getattr(serializer_class, 'Meta', None), 'model', None)
+    if model is None:
+        raise NotCompilable(f'{serializer_class.__name__}: нет Meta.model')
+
+    return CompiledSerializer(serializer_class(), model)
+
+
+def get_compiled_serializer(serializer_class):
+    try:
+        return compile_serializer(serializer_class)
+    except NotCompilable:
+        return None
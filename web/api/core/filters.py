@@ -0,0 +1,64 @@
+from rest_framework import exceptions as drf_exceptions
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.filters import BaseFilterBackend
+
+from core.geo import haversine_expression, nearby_filter
+
+
+class NearbyFilter(BaseFilterBackend):
+    """
+    Фильтр "рядом": `?near=<широта>,<долгота>&radius=<км>`.
+    Отбирает объекты по геохешу и ограничивающему прямоугольнику, уточняет расстоянием по формуле гаверсинусов
+    и сортирует по удаленности. Путь до адреса задается атрибутом представления `near_address_field`
+    """
+
+    near_param = 'near'
+    radius_param = 'radius'
+    default_radius = 10
+    max_radius = 500
+
+    def get_location(self, request):
+        near = request.query_params.get(self.near_param)
+        if not near:
+            return None
+
+        try:
+            latitude, longitude = (float(value) for value in near.split(','))
+            radius = float(request.query_params.get(self.radius_param, self.default_radius))
+        except ValueError:
+            raise drf_exceptions.ValidationError({self.near_param: 'Ожидается near=<широта>,<долгота>&radius=<км>'})
+
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and 0 < radius <= self.max_radius):
+            raise drf_exceptions.ValidationError({self.near_param: 'Координаты или радиус вне допустимых значений'})
+
+        return latitude, longitude, radius
+
+    def filter_queryset(self, request, queryset, view):
+        location = self.get_location(request)
+        if location is None:
+            return queryset
+
+        latitude, longitude, radius = location
+        prefix = f'{view.near_address_field}__'
+
+        return queryset.filter(nearby_filter(latitude, longitude, radius, prefix)).annotate(
+            distance=haversine_expression(latitude, longitude, prefix)
+        ).filter(distance__lte=radius)
+
+    def get_ordering(self, request, queryset, view):
+        if self.get_location(request) is None:
+            return None
+
+        return 'distance', 'id'
+
+    def get_schema_fields(self, view):
+        return [
+            coreapi.Field(
+                name=self.near_param, required=False, location='query',
+                schema=coreschema.String(description='Координаты точки: <широта>,<долгота>')
+            ),
+            coreapi.Field(
+                name=self.radius_param, required=False, location='query',
+                schema=coreschema.Number(description='Радиус поиска в километрах')
+            ),
+        ]
@@ -0,0 +1,49 @@
+"""
+Быстрое кодирование и разбор JSON через orjson (если установлен и включен настройкой FAST_JSON) с той же семантикой,
+что у стандартного кодировщика DRF: Decimal (в том числе координаты LatitudeField/LongitudeField) как числа,
+datetime в ISO 8601 с 'Z' для UTC, ленивые строки перевода как строки. Все типы, которые orjson не кодирует сам
+или кодирует иначе, передаются в `JSONEncoder.default` из DRF.
+"""
+import json
+
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+
+_default = JSONEncoder().default
+
+
+def is_enabled():
+    return orjson is not None and getattr(settings, 'FAST_JSON', False)
+
+
+def dumps(data):
+    """
+    Кодирует данные в компактный JSON в UTF-8 (bytes)
+    """
+
+    if is_enabled():
+        return orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def loads(content):
+    """
+    Разбирает JSON из str или bytes. Ошибки разбора - ValueError
+    """
+
+    if is_enabled():
+        return orjson.loads(content)
+
+    if isinstance(content, bytes):
+        content = content.decode()
+
+    return json.loads(content)
@@ -1,7 +1,19 @@
+import hashlib
 from typing import Dict
 
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from rest_framework.serializers import Serializer
 
+from api.core.compiled import get_compiled_serializer
+from api.core.prefetch import get_query_plan
+from api.core.serializers import ExportQuerySerializer
+from core.exports import CONTENT_TYPES
+
 
 class MultiSerializerViewSetMixin:
     """
@@ -17,3 +29,137 @@ class MultiSerializerViewSetMixin:
 
         except (KeyError, AttributeError):
             return super().get_serializer_class()
+
+
+class SerializerPrefetchMixin:
+    """
+    Примесь применяет к queryset план select_related/prefetch_related, построенный по сериализатору действия,
+    чтобы список из N объектов загружался постоянным числом запросов
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+
+        if getattr(getattr(serializer_class, 'Meta', None), 'model', None) is None:
+            return queryset
+
+        return get_query_plan(serializer_class).apply(queryset)
+
+
+class CompiledListMixin:
+    """
+    Примесь собирает список без объектов моделей: queryset читается через `.values()` по колонкам
+    скомпилированного сериализатора (см. api.core.compiled). Если сериализатор действия не компилируется,
+    используется обычный list
+    """
+
+    def list(self, request, *args, **kwargs):
+        compiled = get_compiled_serializer(self.get_serializer_class())
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        ordering = [field.lstrip('-') for field in getattr(self, 'keyset_ordering', None) or ()]
+        queryset = compiled.values(self.filter_queryset(self.get_queryset()).prefetch_related(None), *ordering)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(compiled.serialize_rows(page))
+
+        return Response(compiled.serialize_rows(list(queryset)))
+
+
+class StreamingExportMixin:
+    """
+    Примесь потоковой выгрузки отфильтрованного queryset: `GET <список>/export/csv/` или `export/jsonl/`
+    с параметрами status, date_from и date_to. Строки читаются серверным курсором и отдаются по мере чтения
+    (см. core.exports), поэтому ответ начинается сразу и не накапливается в памяти
+    """
+
+    export_class = None
+    export_filename = 'export'
+
+    @action(detail=False, methods=['get'], url_path=r'export/(?P<export_format>csv|jsonl)')
+    def export(self, request, export_format, *args, **kwargs):
+        export = self.export_class(self.filter_queryset(self.get_queryset()).prefetch_related(None))
+
+        serializer = ExportQuerySerializer(data=request.query_params, context={'statuses': export.statuses})
+        serializer.is_valid(raise_exception=True)
+        export = export.filter(**serializer.validated_data)
+
+        response = StreamingHttpResponse(export.stream(export_format), content_type=CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = f'attachment; filename="{self.export_filename}.{export_format}"'
+        # Не буферизовать ответ в обратном прокси, чтобы клиент получал строки по мере чтения
+        response['X-Accel-Buffering'] = 'no'
+
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Примесь условных GET-запросов для list и retrieve. ETag и Last-Modified вычисляются по отфильтрованному
+    queryset агрегатами max(updated_at) и count(): по самой модели и по каждому пути из `conditional_related`
+    до связанных моделей, данные которых входят в ответ. При совпадении If-None-Match или If-Modified-Since
+    ответ 304 возвращается до сериализации
+    """
+
+    conditional_related = ()
+
+    def get_conditional_state(self, queryset):
+        """
+        ETag и время последнего изменения данных queryset
+        """
+
+        queryset = queryset.order_by()
+        states = [queryset.aggregate(updated_at=Max('updated_at'), count=Count('pk'))]
+        for lookup in self.conditional_related:
+            states.append(queryset.aggregate(
+                updated_at=Max(f'{lookup}__updated_at'), count=Count(f'{lookup}__pk')))
+
+        last_modified = max((state['updated_at'] for state in states if state['updated_at']), default=None)
+        fingerprint = repr([
+            self.request.get_full_path(),
+            [(state['updated_at'] and state['updated_at'].isoformat(), state['count']) for state in states],
+        ])
+
+        return quote_etag(hashlib.sha1(fingerprint.encode()).hexdigest()), last_modified
+
+    def is_not_modified(self, request, etag, last_modified):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return '*' in etags or etag in etags or f'W/{etag}' in etags
+
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE') or '')
+        return (
+            if_modified_since is not None and last_modified is not None
+            and int(last_modified.timestamp()) <= if_modified_since
+        )
+
+    def get_conditional_response(self, request, queryset, build_response):
+        etag, last_modified = self.get_conditional_state(queryset)
+
+        if self.is_not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = build_response()
+
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified.timestamp())
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        return self.get_conditional_response(
+            request, queryset, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        queryset = self.get_queryset().model.objects.filter(pk=instance.pk)
+
+        return self.get_conditional_response(
+            request, queryset, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
@@ -0,0 +1,153 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import and_, or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Постраничная навигация по ключу (keyset pagination).
+
+    Курсор хранит значения всех полей сортировки последней записи страницы, поэтому следующая страница
+    выбирается условием `(a, b) > (x, y)` по индексу без OFFSET и без COUNT(*): глубокие страницы стоят столько же,
+    сколько первая. Поля сортировки должны быть NOT NULL, а последнее из них - уникальным (как правило, `id`).
+
+    Представление может задать собственную сортировку атрибутом `keyset_ordering`,
+    а отключить пагинацию - через `pagination_class = None`. Фильтр с методом `get_ordering`
+    (например, поиск с сортировкой по релевантности) имеет приоритет.
+    """
+
+    ordering = ('-id',)
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = bool(self.cursor and self.cursor['r'])
+        ordering = self._invert(self.ordering) if reverse else self.ordering
+
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self._keyset_filter(queryset.model, ordering, self.cursor['v']))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        for filter_class in getattr(view, 'filter_backends', ()):
+            if hasattr(filter_class, 'get_ordering'):
+                ordering = filter_class().get_ordering(request, queryset, view)
+                break
+
+        ordering = ordering or getattr(view, 'keyset_ordering', None) or self.ordering
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+
+        assert ordering[-1].lstrip('-') in ('id', 'pk'), (
+            'Keyset pagination requires the last ordering field to be unique, e.g. "id".'
+        )
+
+        return tuple(ordering)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+
+        return self.encode_cursor({'v': self._get_values(self.page[-1]), 'r': 0})
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+
+        return self.encode_cursor({'v': self._get_values(self.page[0]), 'r': 1})
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            values, reverse = cursor['v'], int(cursor['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return {'v': values, 'r': reverse}
+
+    def encode_cursor(self, cursor):
+        encoded = urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode('ascii')).decode('ascii')
+
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_values(self, instance):
+        values = []
+        for field in self.ordering:
+            field_name = field.lstrip('-')
+            value = instance[field_name] if isinstance(instance, dict) else getattr(instance, field_name)
+            values.append(str(value))
+
+        return values
+
+    def _keyset_filter(self, model, ordering, values):
+        """
+        Строит условие "строго после курсора" для составного ключа сортировки:
+        a > x OR (a = x AND b > y) ..., дополненное `a >= x`, чтобы планировщик использовал индекс по первому полю
+        """
+
+        values = [self._to_python(model, field.lstrip('-'), value) for field, value in zip(ordering, values)]
+
+        conditions = []
+        for index, field in enumerate(ordering):
+            field_name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = [Q(**{ordering[i].lstrip('-'): values[i]}) for i in range(index)]
+            conditions.append(reduce(and_, equal, Q(**{f'{field_name}__{lookup}': values[index]})))
+
+        first = ordering[0]
+        bound = Q(**{f'{first.lstrip("-")}__{"lte" if first.startswith("-") else "gte"}': values[0]})
+
+        return bound & reduce(or_, conditions)
+
+    def _to_python(self, model, field_name, value):
+        try:
+            field = model._meta.pk if field_name == 'pk' else model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            return value
+
+        try:
+            return field.to_python(value)
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _invert(ordering):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
@@ -1,6 +1,28 @@
-import json
-
+from django.conf import settings
 from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from api.core import json
+
+
+class FastJSONParser(parsers.JSONParser):
+    """
+    JSON-парсер на orjson, без orjson работает как стандартный JSONParser
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if not json.is_enabled():
+            return super().parse(stream, media_type=media_type, parser_context=parser_context)
+
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            content = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                content = content.decode(encoding)
+
+            return json.loads(content)
+        except ValueError as error:
+            raise ParseError(f'JSON parse error - {error}')
 
 
 class MultiPartJSONParser(parsers.MultiPartParser):
@@ -8,6 +30,9 @@ class MultiPartJSONParser(parsers.MultiPartParser):
     def parse(self, stream, media_type=None, parser_context=None):
         parsed_data = super().parse(stream, media_type=media_type, parser_context=parser_context)
 
-        data = json.loads(parsed_data.data.get('data', '{}'))
+        try:
+            data = json.loads(parsed_data.data.get('data', '{}'))
+        except ValueError as error:
+            raise ParseError(f'JSON parse error - {error}')
 
         return parsers.DataAndFiles(data=data, files=parsed_data.files)
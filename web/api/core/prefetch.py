@@ -0,0 +1,97 @@
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+class QueryPlan:
+    """
+    План загрузки связанных объектов для сериализатора: пути `select_related`
+    и вложенные планы `prefetch_related` (по одному запросу на каждую связь "ко многим")
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.select = set()
+        self.prefetch = {}
+
+    def apply(self, queryset):
+        if self.select:
+            queryset = queryset.select_related(*sorted(self.select))
+
+        if self.prefetch:
+            queryset = queryset.prefetch_related(*(
+                Prefetch(path, queryset=plan.apply(plan.model._default_manager.all()))
+                for path, plan in sorted(self.prefetch.items())
+            ))
+
+        return queryset
+
+
+def _add_relation(plan, model, prefix, attrs, serializer=None):
+    """
+    Добавляет в план связи, через которые проходит путь `attrs`, и связи вложенного сериализатора
+    """
+
+    for index, attr in enumerate(attrs):
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return
+
+        if not field.is_relation:
+            return
+
+        path = [*prefix, attr]
+
+        if field.many_to_many or field.one_to_many:
+            nested_plan = plan.prefetch.setdefault('__'.join(path), QueryPlan(field.related_model))
+            _add_relation(nested_plan, field.related_model, [], attrs[index + 1:], serializer)
+            return
+
+        plan.select.add('__'.join(path))
+        model, prefix = field.related_model, path
+
+    if serializer is not None:
+        _collect(plan, model, prefix, serializer)
+
+
+def _collect(plan, model, prefix, serializer):
+    """
+    Обходит поля сериализатора. Связи, которые не видны по полям (например, в SerializerMethodField),
+    сериализатор объявляет в `Meta.related_fields`
+    """
+
+    for lookup in getattr(getattr(serializer, 'Meta', None), 'related_fields', ()):
+        _add_relation(plan, model, prefix, lookup.split('__'))
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+
+        if isinstance(field, serializers.ListSerializer):
+            _add_relation(plan, model, prefix, field.source_attrs, field.child)
+        elif isinstance(field, serializers.BaseSerializer):
+            _add_relation(plan, model, prefix, field.source_attrs, field)
+        elif isinstance(field, serializers.ManyRelatedField):
+            _add_relation(plan, model, prefix, field.source_attrs)
+        elif isinstance(field, serializers.PrimaryKeyRelatedField):
+            _add_relation(plan, model, prefix, field.source_attrs[:-1])
+        elif isinstance(field, serializers.RelatedField):
+            _add_relation(plan, model, prefix, field.source_attrs)
+        else:
+            _add_relation(plan, model, prefix, field.source_attrs[:-1])
+
+
+@lru_cache(maxsize=None)
+def get_query_plan(serializer_class):
+    """
+    Строит план загрузки для класса сериализатора модели (один раз на класс)
+    """
+
+    model = serializer_class.Meta.model
+    plan = QueryPlan(model)
+    _collect(plan, model, [], serializer_class())
+
+    return plan
@@ -0,0 +1,21 @@
+from rest_framework.renderers import JSONRenderer
+
+from api.core import json
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON-рендерер на orjson. Запросы с отступом (Accept: application/json; indent=4), данные вне UTF-8
+    и окружение без orjson обрабатываются стандартным JSONRenderer
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if (not json.is_enabled() or self.charset not in (None, 'utf-8')
+                or self.get_indent(accepted_media_type or '', renderer_context)):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return json.dumps(data)
@@ -38,3 +38,26 @@ class SimpleNameSerializer(ReadOnlySerializer):
 
     class Meta:
         fields = ('id', 'name')
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    """
+    Параметры потоковой выгрузки: статус и период дат включительно. Допустимые статусы - в context['statuses']
+    """
+
+    status = serializers.CharField(label='Статус', required=False)
+    date_from = serializers.DateField(label='Дата с', required=False)
+    date_to = serializers.DateField(label='Дата по', required=False)
+
+    def validate_status(self, value):
+        statuses = self.context.get('statuses', ())
+        if value not in statuses:
+            raise serializers.ValidationError(f'Допустимые статусы: {", ".join(statuses)}.')
+
+        return value
+
+    def validate(self, attrs):
+        if attrs.get('date_from') and attrs.get('date_to') and attrs['date_from'] > attrs['date_to']:
+            raise serializers.ValidationError('Дата начала периода позже даты окончания.')
+
+        return attrs
@@ -1,7 +1,10 @@
+from datetime import timedelta
+
 from rest_framework import serializers
 
 from api.core.serializers import ChoiceField, SimpleNameSerializer
 from company.models import Company, RentalPoint, Reservation
+from company.slots import ScheduleError, compile_schedule
 from core.collections import ReservationStatuses
 from offer.models import Offer, Rating, Price
 from reference.models import Address
@@ -29,9 +32,17 @@ class CreateRentalPointSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = RentalPoint
-        fields = ('id', 'phone', 'is_delivery', 'address')
+        fields = ('id', 'phone', 'is_delivery', 'schedule', 'address')
         read_only_fields = ('id',)
 
+    def validate_schedule(self, value):
+        try:
+            compile_schedule(value)
+        except ScheduleError as error:
+            raise serializers.ValidationError(str(error))
+
+        return value
+
     def create(self, validated_data):
         address_data = validated_data.pop('address')
         address = Address.objects.create(**address_data)
@@ -45,9 +56,9 @@ class CreateRentalPointSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         address_data = validated_data.pop('address')
         address = instance.address
-        Address.objects.filter(id=address.id).update(**address_data)
-
-        instance.refresh_from_db()
+        for attr, value in address_data.items():
+            setattr(address, attr, value)
+        address.save()
 
         return super().update(instance, validated_data)
 
@@ -98,14 +109,19 @@ class RentalPointReadOnlySerializer(serializers.ModelSerializer):
 
     address = PointAddressSerializer(label='Адрес')
     general_rating = serializers.SerializerMethodField()
+    distance = serializers.SerializerMethodField()
 
     class Meta:
         model = RentalPoint
-        fields = ('id', 'phone', 'is_delivery', 'address', 'general_rating')
+        fields = ('id', 'phone', 'is_delivery', 'address', 'general_rating', 'distance')
         read_only_fields = ('id',)
 
     def get_general_rating(self, obj):
-        return round(obj.general_rating, 2)
+        return round(obj.rating_avg, 2)
+
+    def get_distance(self, obj):
+        distance = getattr(obj, 'distance', None)
+        return round(distance, 3) if distance is not None else None
 
 
 class RatingReadOnlySerializer(serializers.ModelSerializer):
@@ -124,8 +140,8 @@ class PriceReadOnlySerializer(serializers.ModelSerializer):
     Сериализатор цены
     """
 
-    time_from_unit_display = serializers.SerializerMethodField()
-    price_per_time_unit_display = serializers.SerializerMethodField()
+    time_from_unit_display = serializers.CharField(source='get_time_from_unit_display', read_only=True)
+    price_per_time_unit_display = serializers.CharField(source='get_price_per_time_unit_display', read_only=True)
 
     class Meta:
         model = Price
@@ -133,12 +149,6 @@ class PriceReadOnlySerializer(serializers.ModelSerializer):
                   'price_per_time_unit_display')
         read_only_fields = fields
 
-    def get_time_from_unit_display(self, obj):
-        return obj.get_time_from_unit_display()
-
-    def get_price_per_time_unit_display(self, obj):
-        return obj.get_price_per_time_unit_display()
-
 
 class OfferReadOnlySerializer(serializers.ModelSerializer):
     """
@@ -172,3 +182,50 @@ class ReservationsReadOnlySerializer(ReservationSerializer):
             field.read_only = True
 
         return fields
+
+
+class SlotsQuerySerializer(serializers.Serializer):
+    """
+    Параметры запроса слотов пункта проката на дату
+    """
+
+    rental_point = serializers.PrimaryKeyRelatedField(label='Пункт проката', queryset=RentalPoint.objects.all())
+    date = serializers.DateField(label='Дата')
+
+
+class SlotsRangeSerializer(serializers.Serializer):
+    """
+    Параметры расчета свободных слотов: период с date_from по date_to включительно
+    """
+
+    max_days = 62
+
+    date_from = serializers.DateField(label='С')
+    date_to = serializers.DateField(label='По', required=False)
+    offer = serializers.IntegerField(label='Предложение', required=False)
+
+    def validate(self, data):
+        data.setdefault('date_to', data['date_from'])
+        if data['date_to'] < data['date_from']:
+            raise serializers.ValidationError('Начало периода должно быть не позже его конца.')
+
+        if data['date_to'] - data['date_from'] >= timedelta(days=self.max_days):
+            raise serializers.ValidationError(f'Период не может быть длиннее {self.max_days} дней.')
+
+        return data
+
+
+class AnalyticsQuerySerializer(SlotsRangeSerializer):
+    """
+    Параметры аналитики бронирований компании: период, группировка и необязательные точка выдачи и предложение
+    """
+
+    max_days = 366
+    GROUPS = {
+        'day': (),
+        'rental_point': ('rental_point_id',),
+        'offer': ('rental_point_id', 'offer_id'),
+    }
+
+    group = serializers.ChoiceField(label='Группировка', choices=tuple(GROUPS), default='offer')
+    rental_point = serializers.IntegerField(label='Точка выдачи', required=False)
@@ -3,7 +3,7 @@ from rest_framework.routers import SimpleRouter
 from rest_framework_nested.routers import NestedSimpleRouter
 
 from api.public.company.views import CompanyViewSet, CompanyRentalPointViewSet, BoardCompanyViewSet, \
-    RentalPointViewSet, SlotsAPIView, RentalPointOffersViewSet, RentalPointReservationsViewSet
+    RentalPointViewSet, SlotsAPIView, RentalPointOffersViewSet, RentalPointReservationsViewSet, CompanyAnalyticsViewSet
 
 
 app_name = 'company'
@@ -16,6 +16,7 @@ router.register('', CompanyViewSet)
 
 company_rental_points_nested_router = NestedSimpleRouter(router, '', lookup='company')
 company_rental_points_nested_router.register('rental_points', CompanyRentalPointViewSet)
+company_rental_points_nested_router.register('analytics', CompanyAnalyticsViewSet, basename='company-analytics')
 
 rental_point_offers_nested_router = NestedSimpleRouter(router, 'rental_points', lookup='rental_point')
 rental_point_offers_nested_router.register('offers', RentalPointOffersViewSet)
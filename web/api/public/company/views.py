@@ -1,29 +1,35 @@
-import json
-
-import requests
-
 from django.conf import settings
-from django.db.models import Avg, Value, FloatField
-from django.db.models.functions import Coalesce
+from django.db import transaction
+from django.db.models import Sum
 from django.utils.functional import cached_property
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import mixins, exceptions as drf_exceptions
+from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
 
-from api.core.mixins import MultiSerializerViewSetMixin
+from api.core.cache import ResponseCacheMixin
+from api.core.filters import NearbyFilter
+from api.core.mixins import CompiledListMixin, ConditionalGetMixin, MultiSerializerViewSetMixin, \
+    SerializerPrefetchMixin, StreamingExportMixin
 from api.public.company.serializers import CompanySerializer, CreateRentalPointSerializer, \
     ReservationSerializer, BoardCompanySerializer, RentalPointReadOnlySerializer, OfferReadOnlySerializer, \
-    ReservationsReadOnlySerializer
+    ReservationsReadOnlySerializer, SlotsQuerySerializer, SlotsRangeSerializer, AnalyticsQuerySerializer
 
-from company.models import Company, RentalPoint, Reservation
+from company.exports import OfferExport, ReservationExport
+from company.models import Company, RentalPoint, Reservation, ReservationRollup
+from company.slot_service import SlotServiceBadRequest, SlotServiceError, get_slot_service_client
+from company.slots import get_free_slots
+from company.stock import take_offer_units, return_offer_units
 from core.collections import ReservationStatuses
 from offer.models import Offer
+from reference.models import Address
 
 
-class CompanyViewSet(ModelViewSet):
+class CompanyViewSet(SerializerPrefetchMixin, ModelViewSet):
     """
     Набор представлений компании
     """
@@ -49,7 +55,8 @@ class CompanyViewSet(ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class BoardCompanyViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, GenericViewSet):
+class BoardCompanyViewSet(ResponseCacheMixin, SerializerPrefetchMixin, mixins.ListModelMixin,
+                          mixins.RetrieveModelMixin, GenericViewSet):
     """
     Набор всех компаний
     """
@@ -57,18 +64,10 @@ class BoardCompanyViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, Gene
     permission_classes = (AllowAny,)
     queryset = Company.objects.all()
     serializer_class = BoardCompanySerializer
+    cache_models = (Company, RentalPoint, Address)
 
 
-class RatingMixin:
-    """
-    Примесь для добавления среднего значения рейтинга к компаниям
-    """
-    def get_queryset(self):
-        return super().get_queryset().annotate(
-            general_rating=Coalesce(Avg('offers__ratings__mark'), Value(.0), output_field=FloatField()))
-
-
-class CompanyRentalPointViewSet(MultiSerializerViewSetMixin, RatingMixin, ModelViewSet):
+class CompanyRentalPointViewSet(MultiSerializerViewSetMixin, SerializerPrefetchMixin, ModelViewSet):
     """
     Набор представлений точки
     """
@@ -89,27 +88,76 @@ class CompanyRentalPointViewSet(MultiSerializerViewSetMixin, RatingMixin, ModelV
         serializer.save(company_id=self.kwargs.get('company_pk'))
 
 
-class RentalPointViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, RatingMixin, GenericViewSet):
+class RentalPointViewSet(ConditionalGetMixin, MultiSerializerViewSetMixin, SerializerPrefetchMixin,
+                         mixins.ListModelMixin, mixins.RetrieveModelMixin, GenericViewSet):
     """
     Класс отображения информации о всех филиалах
     """
 
     queryset = RentalPoint.objects.all()
     serializer_class = RentalPointReadOnlySerializer
+    serializer_map = {
+        'slots': SlotsRangeSerializer,
+        'batch_slots': SlotsRangeSerializer,
+    }
     permission_classes = (IsAuthenticated,)
+    filter_backends = [DjangoFilterBackend, NearbyFilter]
+    near_address_field = 'address'
     http_method_names = settings.ALLOWED_HTTP_METHOD_NAMES
+    conditional_related = ('address', 'address__city')
+
+    @staticmethod
+    def serialize_slots(slots):
+        return [{'datetime_from': start, 'datetime_to': end, 'free': free} for start, end, free in slots]
+
+    def get_slots_range(self, request):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        return serializer.validated_data
+
+    @action(detail=True, methods=['get'])
+    def slots(self, request, *args, **kwargs):
+        """
+        Свободные слоты филиала за период по его графику работы за вычетом принятых бронирований
+        """
+
+        rental_point = self.get_object()
+        free_slots = get_free_slots([rental_point], **self.get_slots_range(request))
+
+        return Response({'rental_point': rental_point.id, 'slots': self.serialize_slots(free_slots[rental_point.id])})
+
+    @action(detail=False, methods=['get'], url_path='slots', url_name='batch-slots')
+    def batch_slots(self, request, *args, **kwargs):
+        """
+        Свободные слоты страницы филиалов (с учетом фильтров списка) за период
+        """
+
+        slots_range = self.get_slots_range(request)
+        queryset = self.filter_queryset(self.get_queryset()).only('id', 'schedule', 'reservations_version')
+        rental_points = self.paginate_queryset(queryset)
+        free_slots = get_free_slots(rental_points, **slots_range)
 
+        return self.get_paginated_response([
+            {'rental_point': rental_point.id, 'slots': self.serialize_slots(free_slots[rental_point.id])}
+            for rental_point in rental_points
+        ])
 
-class RentalPointOffersViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, GenericViewSet):
+
+class RentalPointOffersViewSet(ConditionalGetMixin, CompiledListMixin, StreamingExportMixin, SerializerPrefetchMixin,
+                               mixins.ListModelMixin, mixins.RetrieveModelMixin, GenericViewSet):
     """
-    Класс отображения информации о предложениях филиала
+    Класс отображения информации о предложениях филиала и их выгрузки в CSV/JSONL
     """
 
     queryset = Offer.objects.all()
     serializer_class = OfferReadOnlySerializer
     permission_classes = (IsAuthenticated,)
     http_method_names = settings.ALLOWED_HTTP_METHOD_NAMES
+    conditional_related = ('ratings', 'prices', 'product', 'product__category')
     rental_point_pk_field = 'rental_point_pk'
+    export_class = OfferExport
+    export_filename = 'offers'
 
     @cached_property
     def rental_point(self):
@@ -144,33 +192,35 @@ class ReservationViewSet(mixins.RetrieveModelMixin, mixins.ListModelMixin, mixin
 
     def perform_update(self, serializer):
         """
-        Редактирование брони
+        Редактирование брони.
+        Остаток предложения меняется на разницу между забронированным количеством до и после изменения:
+        списание - условным атомарным UPDATE, в одной транзакции со сменой статуса под блокировкой брони
         """
 
-        instance = serializer.instance
-        offer = instance.offer
-        reservation_count = serializer.validated_data.get('count') or instance.count
-        new_status = serializer.validated_data.get('status', ReservationStatuses.NEW)
+        with transaction.atomic():
+            instance = Reservation.objects.select_for_update().get(pk=serializer.instance.pk)
+            new_status = serializer.validated_data.get('status', instance.status)
+            new_count = serializer.validated_data.get('count') or instance.count
+
+            reserved = instance.count if instance.status == ReservationStatuses.ACCEPTED else 0
+            to_reserve = new_count if new_status == ReservationStatuses.ACCEPTED else 0
+            delta = to_reserve - reserved
 
-        if new_status == ReservationStatuses.ACCEPTED:
-            if offer.count >= reservation_count:
-                offer.count -= reservation_count
-                offer.save()
-            else:
+            if delta > 0 and not take_offer_units(instance.offer_id, delta):
                 raise drf_exceptions.ValidationError('Недостаточно в наличии.')
 
-        elif new_status in (ReservationStatuses.NEW, ReservationStatuses.DONE, ReservationStatuses.DECLINED,
-                            ReservationStatuses.CANCELED):
-            if instance.status == ReservationStatuses.ACCEPTED:
-                offer.count += reservation_count
-                offer.save()
+            if delta < 0:
+                return_offer_units(instance.offer_id, -delta)
 
-        serializer.save()
+            serializer.instance = instance
+            serializer.save()
 
 
-class RentalPointReservationsViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, GenericViewSet):
+class RentalPointReservationsViewSet(ConditionalGetMixin, CompiledListMixin, StreamingExportMixin,
+                                     SerializerPrefetchMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                                     GenericViewSet):
     """
-    Класс отображения информации о бронированиях филиала
+    Класс отображения информации о бронированиях филиала и выгрузки истории бронирований в CSV/JSONL
     """
 
     queryset = Reservation.objects.all()
@@ -178,10 +228,17 @@ class RentalPointReservationsViewSet(mixins.ListModelMixin, mixins.RetrieveModel
     permission_classes = (IsAuthenticated,)
     http_method_names = settings.ALLOWED_HTTP_METHOD_NAMES
     rental_point_pk_field = 'rental_point_pk'
+    export_class = ReservationExport
+    export_filename = 'reservations'
 
     @cached_property
     def rental_point(self):
-        return get_object_or_404(RentalPoint.objects.all(), pk=self.kwargs.get(self.rental_point_pk_field))
+        rental_points = RentalPoint.objects.all()
+        # Выгрузка содержит email клиентов, поэтому доступна только владельцу компании точки выдачи и персоналу
+        if self.action == 'export' and not self.request.user.is_staff:
+            rental_points = rental_points.filter(company__user=self.request.user)
+
+        return get_object_or_404(rental_points, pk=self.kwargs.get(self.rental_point_pk_field))
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
@@ -190,21 +247,93 @@ class RentalPointReservationsViewSet(mixins.ListModelMixin, mixins.RetrieveModel
         return super().get_queryset().filter(offer__rental_point=self.rental_point)
 
 
+class CompanyAnalyticsViewSet(GenericViewSet):
+    """
+    Аналитика бронирований компании по дневным агрегатам (см. company.rollups): забронированные единицы,
+    принятые бронирования и оценка выручки за период по дням, по дням и точкам выдачи или по дням и предложениям.
+    Читает только таблицу агрегатов
+    """
+
+    queryset = ReservationRollup.objects.all()
+    serializer_class = AnalyticsQuerySerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = None
+    http_method_names = settings.ALLOWED_HTTP_METHOD_NAMES
+
+    @cached_property
+    def company(self):
+        companies = Company.objects.all()
+        if not self.request.user.is_staff:
+            companies = companies.filter(user=self.request.user)
+
+        return get_object_or_404(companies, pk=self.kwargs.get('company_pk'))
+
+    def get_queryset(self):
+        return super().get_queryset().filter(rental_point__company=self.company)
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        queryset = self.get_queryset().filter(date__gte=params['date_from'], date__lte=params['date_to'])
+        if 'rental_point' in params:
+            queryset = queryset.filter(rental_point_id=params['rental_point'])
+        if 'offer' in params:
+            queryset = queryset.filter(offer_id=params['offer'])
+
+        totals = {
+            'reserved_units': Sum('reserved_units'),
+            'accepted_count': Sum('accepted_count'),
+            'revenue': Sum('revenue'),
+        }
+        group_fields = AnalyticsQuerySerializer.GROUPS[params['group']]
+        rows = queryset.values('date', *group_fields).annotate(**totals).order_by('date', *group_fields)
+
+        return Response({
+            'date_from': params['date_from'],
+            'date_to': params['date_to'],
+            'group': params['group'],
+            'totals': {name: value or 0 for name, value in queryset.aggregate(**totals).items()},
+            'rows': list(rows),
+        })
+
+
+class SlotServiceUnavailable(drf_exceptions.APIException):
+    status_code = 503
+    default_detail = 'Сервис слотов временно недоступен.'
+    default_code = 'slot_service_unavailable'
+
+
 # TODO: Изменить прокси-представление после готовности сервиса расписания
 class SlotsAPIView(APIView):
     """
-    Представление для проксирования запросов по слотам к сервису слотов
+    Представление для проксирования запросов по слотам к сервису слотов.
+    GET принимает параметры `rental_point` и `date`, POST передает тело запроса в сервис без изменений
     """
 
     http_method_names = settings.ALLOWED_HTTP_METHOD_NAMES
 
     def get(self, request, *args, **kwargs):
-        response = requests.get(url=f'{settings.HOST_OFFER}/api/slots/12/2021-05-22')
+        serializer = SlotsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
 
-        return Response(data=response.json())
+        try:
+            data = get_slot_service_client().get_slots(
+                serializer.validated_data['rental_point'].id, serializer.validated_data['date'])
+        except SlotServiceBadRequest as error:
+            raise drf_exceptions.ValidationError(error.detail) from error
+        except SlotServiceError as error:
+            raise SlotServiceUnavailable() from error
 
-    def post(self, request, *args, **kwargs):
-        data = json.loads(request.body)
-        response = requests.post(url=f'{settings.HOST_OFFER}/resolveSlots', json=data)
+        return Response(data=data)
 
-        return Response(data=response)
+    def post(self, request, *args, **kwargs):
+        try:
+            data = get_slot_service_client().resolve_slots(request.data)
+        except SlotServiceBadRequest as error:
+            raise drf_exceptions.ValidationError(error.detail) from error
+        except SlotServiceError as error:
+            raise SlotServiceUnavailable() from error
+
+        return Response(data=data)
@@ -1,6 +1,12 @@
 import django_filters as filters
+from rest_framework.filters import BaseFilterBackend, SearchFilter
 
+from api.public.offer.serializers import AvailabilityFilterSerializer
+from company.availability import filter_available
 from offer.models import Offer
+from offer.search import search_offers
+from reference.categories import descendants
+from reference.models import Category
 
 
 class OfferFilterSet(filters.FilterSet):
@@ -8,10 +14,66 @@ class OfferFilterSet(filters.FilterSet):
     Набор фильтров предложений
     """
 
-    category = filters.CharFilter(label='Категория', lookup_expr='icontains', field_name='product__category__name')
+    category = filters.CharFilter(label='Категория', method='filter_category')
+    category_id = filters.NumberFilter(label='Идентификатор категории', method='filter_category_id')
     city = filters.CharFilter(label='Город', lookup_expr='icontains', field_name='rental_point__address__city__name')
     company = filters.CharFilter(label='Компания', lookup_expr='icontains', field_name='rental_point__company__name')
 
     class Meta:
         model = Offer
-        fields = ('category', 'city', 'company')
+        fields = ('category', 'category_id', 'city', 'company')
+
+    def filter_subtree(self, queryset, categories):
+        """
+        Предложения в категориях `categories` и всех их подкатегориях
+        """
+
+        return queryset.filter(product__category__in=Category.objects.filter(descendants(categories)))
+
+    def filter_category(self, queryset, name, value):
+        return self.filter_subtree(queryset, Category.objects.filter(name__icontains=value).only('path'))
+
+    def filter_category_id(self, queryset, name, value):
+        return self.filter_subtree(queryset, Category.objects.filter(pk=value).only('path'))
+
+
+class OfferSearchFilter(SearchFilter):
+    """
+    Поиск предложений по поисковому документу с сортировкой по релевантности
+    """
+
+    def get_search_text(self, request):
+        return ' '.join(self.get_search_terms(request))
+
+    def filter_queryset(self, request, queryset, view):
+        search_text = self.get_search_text(request)
+        if not search_text:
+            return queryset
+
+        return search_offers(queryset, search_text)
+
+    def get_ordering(self, request, queryset, view):
+        if self.get_search_text(request):
+            return '-search_rank', '-id'
+
+        return None
+
+
+class AvailabilityFilter(BaseFilterBackend):
+    """
+    Фильтр предложений, свободных в окне: `?datetime_from=...&datetime_to=...&count=<минимум единиц>`
+    """
+
+    window_params = {'datetime_from', 'datetime_to'}
+
+    def is_active(self, request):
+        return bool(self.window_params.intersection(request.query_params))
+
+    def filter_queryset(self, request, queryset, view):
+        if not self.is_active(request):
+            return queryset
+
+        serializer = AvailabilityFilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        return filter_available(queryset, **serializer.validated_data)
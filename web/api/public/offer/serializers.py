@@ -1,9 +1,17 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.text import get_valid_filename
 from rest_framework import serializers
 
 from api.core.serializers import ChoiceField
 from api.public.company.serializers import CreateRentalPointSerializer
-from core.collections import TimeUnits
-from offer.models import Offer, Price, Rating, OfferImage
+from core.collections import ImportFormats, ImportStatuses, TimeUnits, UploadStatuses
+from offer.catalog import get_format
+from offer.images import get_variant_urls
+from offer.models import CatalogImport, ImageUpload, Offer, Price, Rating, OfferImage
 
 
 class PriceSerializer(serializers.ModelSerializer):
@@ -37,16 +45,22 @@ class BoardOfferSerializer(serializers.ModelSerializer):
     """
 
     rental_point = serializers.SerializerMethodField()
+    distance = serializers.SerializerMethodField()
 
     class Meta:
         model = Offer
-        fields = ('id', 'is_active', 'description', 'count', 'product', 'rental_point')
+        fields = ('id', 'is_active', 'description', 'count', 'product', 'rental_point', 'distance')
         read_only_fields = fields
+        related_fields = ('rental_point__address__city',)
 
     def get_rental_point(self, obj):
 
         return f'{obj.rental_point.address}'
 
+    def get_distance(self, obj):
+        distance = getattr(obj, 'distance', None)
+        return round(distance, 3) if distance is not None else None
+
 
 class OfferSerializer(serializers.ModelSerializer):
     """
@@ -64,26 +78,107 @@ class OfferSerializer(serializers.ModelSerializer):
         fields = ('id', 'is_active', 'description', 'count', 'is_for_child', 'is_female', 'is_male', 'is_unisex',
                   'product', 'price', 'rental_point', 'general_rating', 'rating')
         read_only_fields = fields
+        related_fields = ('product',)
 
     def get_general_rating(self, obj):
-        return round(obj.general_rating, 2)
+        return round(obj.rating_avg, 2)
 
     def get_product(self, obj):
         return obj.product.name if obj.product else None
 
 
+def check_uploads_owner(request, uploads):
+    """
+    Изображения предложения можно брать только из собственных завершенных загрузок пользователя
+    """
+
+    if any(upload.user_id != request.user.id for upload in uploads):
+        raise serializers.ValidationError('Загрузка не найдена.')
+
+    return uploads
+
+
 class OfferImageSerializer(serializers.ModelSerializer):
     """
     Сериализатор изображения
     """
 
     image_url = serializers.URLField(label='URL изображения', source='image.url', read_only=True)
+    variants = serializers.SerializerMethodField(label='Уменьшенные копии и WebP')
 
     class Meta:
         model = OfferImage
-        fields = ('id', 'name', 'image_url')
+        fields = ('id', 'name', 'image_url', 'variants')
         read_only_fields = fields
 
+    def get_variants(self, obj):
+        """
+        URL вариантов изображения. Для еще не созданного варианта - адрес, по которому он будет создан
+        при первом обращении
+        """
+
+        urls = get_variant_urls(obj.image.name)
+        for variant, url in urls.items():
+            if url is None:
+                urls[variant] = reverse(
+                    'api:public:offer:offer-image-variant', kwargs={'pk': obj.pk, 'variant': variant})
+
+        return urls
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор загрузки изображения по частям
+    """
+
+    image = OfferImageSerializer(label='Изображение', read_only=True)
+
+    class Meta:
+        model = ImageUpload
+        fields = ('id', 'name', 'size', 'received', 'status', 'image')
+        read_only_fields = ('id', 'received', 'status', 'image')
+
+    def validate_name(self, value):
+        name = get_valid_filename(os.path.basename(value))
+        if not name:
+            raise serializers.ValidationError('Неверное имя файла.')
+
+        return name
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.IMAGE_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f'Размер файла должен быть от 1 до {settings.IMAGE_UPLOAD_MAX_SIZE} байт.')
+
+        return value
+
+
+class CatalogImportSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор задания импорта каталога
+    """
+
+    file = serializers.FileField(label='Файл', write_only=True)
+    format = ChoiceField(choices=ImportFormats.CHOICES, required=False)
+    status = ChoiceField(choices=ImportStatuses.CHOICES, read_only=True)
+
+    class Meta:
+        model = CatalogImport
+        fields = ('id', 'company', 'file', 'source', 'format', 'status', 'rows_processed', 'offers_created',
+                  'prices_created', 'error_count', 'errors', 'last_error', 'date_created', 'updated_at')
+        read_only_fields = ('id', 'source', 'rows_processed', 'offers_created', 'prices_created', 'error_count',
+                            'errors', 'last_error', 'date_created', 'updated_at')
+
+    def validate_file(self, value):
+        if not value.name.lower().endswith(('.csv', '.jsonl', '.ndjson')):
+            raise serializers.ValidationError('Ожидается файл .csv или .jsonl.')
+
+        return value
+
+    def validate(self, attrs):
+        attrs.setdefault('format', get_format(attrs['file'].name))
+        return attrs
+
 
 class OfferCreateSerializer(serializers.ModelSerializer):
     """
@@ -91,24 +186,27 @@ class OfferCreateSerializer(serializers.ModelSerializer):
     """
 
     images = OfferImageSerializer(label='Изображения', many=True, read_only=True)
+    uploads = serializers.PrimaryKeyRelatedField(
+        label='Завершенные загрузки изображений', many=True, write_only=True, required=False,
+        queryset=ImageUpload.objects.filter(status=UploadStatuses.COMPLETED, image__isnull=False).select_related(
+            'image'))
 
     class Meta:
         model = Offer
         fields = ('id', 'is_active', 'description', 'count', 'is_for_child', 'is_female', 'is_male', 'is_unisex',
-                  'product', 'rental_point', 'images')
+                  'product', 'rental_point', 'images', 'uploads')
         read_only_fields = ('id',)
 
+    def validate_uploads(self, value):
+        return check_uploads_owner(self.context['request'], value)
+
     def create(self, validated_data):
+        uploads = validated_data.pop('uploads', None)
 
         instance = super().create(validated_data)
 
-        images_data = self.initial_data.get('images')
-
-        if images_data:
-            images = OfferImage.objects.bulk_create([
-                OfferImage(image=image, name=image.name) for image in images_data
-            ])
-            instance.images.set(images)
+        if uploads:
+            instance.images.set([upload.image for upload in uploads])
 
         return instance
 
@@ -119,26 +217,79 @@ class OfferUpdateSerializer(serializers.ModelSerializer):
     """
 
     images = OfferImageSerializer(label='Изображения', many=True, read_only=True)
+    uploads = serializers.PrimaryKeyRelatedField(
+        label='Завершенные загрузки изображений', many=True, write_only=True, required=False,
+        queryset=ImageUpload.objects.filter(status=UploadStatuses.COMPLETED, image__isnull=False).select_related(
+            'image'))
 
     class Meta:
         model = Offer
         fields = ('id', 'is_active', 'description', 'count', 'is_for_child', 'is_female', 'is_male', 'is_unisex',
-                  'product', 'rental_point', 'images')
+                  'product', 'rental_point', 'images', 'uploads')
         read_only_fields = ('id',)
         extra_kwargs = {
             'count': {'required': False},
             'rental_point': {'required': False}
         }
 
-    def update(self, instance, validated_data):
+    def validate_uploads(self, value):
+        return check_uploads_owner(self.context['request'], value)
 
-        images_data = self.initial_data.get('images')
+    def update(self, instance, validated_data):
+        uploads = validated_data.pop('uploads', None)
 
-        if images_data:
-            images = OfferImage.objects.bulk_create([
-                OfferImage(image=image, name=image.name) for image in images_data
-            ])
-            instance.images.set(images)
+        if uploads:
+            instance.images.set([upload.image for upload in uploads])
 
         return super().update(instance, validated_data)
 
+
+class AvailabilityWindowSerializer(serializers.Serializer):
+    """
+    Сериализатор окна проверки доступности [datetime_from, datetime_to)
+    """
+
+    datetime_from = serializers.DateTimeField(label='С')
+    datetime_to = serializers.DateTimeField(label='До')
+
+    def validate(self, data):
+        if data['datetime_from'] >= data['datetime_to']:
+            raise serializers.ValidationError('Начало окна должно быть раньше его конца.')
+
+        return data
+
+
+class AvailabilityFilterSerializer(AvailabilityWindowSerializer):
+    """
+    Сериализатор параметров фильтрации доски объявлений по доступности
+    """
+
+    count = serializers.IntegerField(label='Количество', min_value=1, default=1)
+
+
+class BatchAvailabilitySerializer(AvailabilityWindowSerializer):
+    """
+    Сериализатор пакетной проверки доступности предложений
+    """
+
+    offers = serializers.ListField(label='Предложения', child=serializers.IntegerField(), max_length=1000)
+
+
+class QuoteSerializer(serializers.Serializer):
+    """
+    Сериализатор запроса стоимости аренды на срок
+    """
+
+    duration = serializers.DurationField(label='Срок аренды', min_value=timedelta(minutes=1))
+
+
+class BatchQuoteSerializer(serializers.Serializer):
+    """
+    Сериализатор пакетного расчета стоимости набора предложений на набор сроков
+    """
+
+    offers = serializers.ListField(label='Предложения', child=serializers.IntegerField(), max_length=1000)
+    durations = serializers.ListField(
+        label='Сроки аренды', child=serializers.DurationField(min_value=timedelta(minutes=1)), min_length=1,
+        max_length=100,
+    )
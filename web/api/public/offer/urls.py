@@ -2,13 +2,18 @@ from rest_framework import routers
 from rest_framework_nested.routers import NestedSimpleRouter
 
 from api.public.company.views import ReservationViewSet
-from api.public.offer.views import OfferViewSet, PriceViewSet, RatingViewSet, BoardOfferViewSet
+from api.public.offer.views import OfferViewSet, PriceViewSet, RatingViewSet, BoardOfferViewSet, \
+    OfferImageViewSet, ImageUploadViewSet, CatalogImportViewSet
 
 
 app_name = 'offer'
 
 router = routers.SimpleRouter()
 
+router.register('board', BoardOfferViewSet, basename='offer-board')
+router.register('images', OfferImageViewSet, basename='offer-image')
+router.register('uploads', ImageUploadViewSet, basename='offer-upload')
+router.register('imports', CatalogImportViewSet, basename='offer-import')
 router.register('', OfferViewSet, basename='offer')
 
 
@@ -17,8 +22,6 @@ nested_router.register('rating', RatingViewSet)
 nested_router.register('price', PriceViewSet)
 nested_router.register('reservation', ReservationViewSet)
 
-router.register('board', BoardOfferViewSet, basename='offer')
-
 urlpatterns = [
     *nested_router.urls,
     *router.urls,
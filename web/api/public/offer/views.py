@@ -1,18 +1,41 @@
 from django.conf import settings
-from django.db.models import Avg, Value, FloatField
-from django.db.models.functions import Coalesce
-from rest_framework.viewsets import ModelViewSet
-from rest_framework.filters import SearchFilter
-from rest_framework.parsers import JSONParser
-
-from api.core.mixins import MultiSerializerViewSetMixin
-from api.core.parsers import MultiPartJSONParser
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.functions import Now
+from django.http import HttpResponseRedirect
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import mixins, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet, ModelViewSet
+
+from api.core.cache import ResponseCacheMixin
+from api.core.filters import NearbyFilter
+from api.core.mixins import MultiSerializerViewSetMixin, SerializerPrefetchMixin
+from api.core.parsers import FastJSONParser, MultiPartJSONParser
+from api.public.offer.filters import AvailabilityFilter, OfferFilterSet, OfferSearchFilter
 from api.public.offer.serializers import OfferSerializer, RatingSerializer, PriceSerializer, \
-    OfferCreateSerializer, OfferUpdateSerializer, BoardOfferSerializer
-from offer.models import Offer, Price, Rating
+    OfferCreateSerializer, OfferUpdateSerializer, BoardOfferSerializer, AvailabilityWindowSerializer, \
+    BatchAvailabilitySerializer, QuoteSerializer, BatchQuoteSerializer, OfferImageSerializer, \
+    ImageUploadSerializer, CatalogImportSerializer
+from company.availability import get_free_count, get_free_counts
+from company.models import Company, RentalPoint, Reservation
+from core.blobs import hash_file
+from core.collections import ImportStatuses
+from offer.images import VARIANTS, ImageVariantError, generate_variant
+from offer.models import CatalogImport, ImageUpload, Offer, OfferImage, Price, Rating
+from offer import pricing
+from offer.ratings import apply_rating_change, rebuild_rental_point_ratings
+from offer.tasks import import_catalog
+from offer.uploads import UploadError, UploadOffsetMismatch, write_chunk
+from product.models import Product
+from reference.models import Address, Category, City
 
 
-class OfferViewSet(MultiSerializerViewSetMixin, ModelViewSet):
+class OfferViewSet(MultiSerializerViewSetMixin, SerializerPrefetchMixin, ModelViewSet):
     """
     Класс для отображения информации о предложении (объявлении) в личном кабинете
     """
@@ -21,26 +44,111 @@ class OfferViewSet(MultiSerializerViewSetMixin, ModelViewSet):
     serializer_class = OfferSerializer
     serializer_map = {
         'create': OfferCreateSerializer,
-        'update': OfferUpdateSerializer
+        'update': OfferUpdateSerializer,
+        'availability': AvailabilityWindowSerializer,
+        'batch_availability': BatchAvailabilitySerializer,
+        'quote': QuoteSerializer,
+        'batch_quote': BatchQuoteSerializer,
     }
-    filter_backends = [SearchFilter]
-    search_fields = ['product__category__name', 'rental_point__address__city__name', 'rental_point__company__name']
-    parser_classes = (MultiPartJSONParser, JSONParser)
+    filter_backends = [OfferSearchFilter]
+    parser_classes = (MultiPartJSONParser, FastJSONParser)
     http_method_names = settings.ALLOWED_HTTP_METHOD_NAMES
 
-    def get_queryset(self):
-        return super().get_queryset().annotate(
-            general_rating=Coalesce(Avg('ratings__mark'), Value(.0), output_field=FloatField()))
+    def perform_update(self, serializer):
+        """
+        При переносе предложения в другую точку выдачи пересчитываются агрегаты рейтинга обеих точек
+        """
+
+        rental_point_id = serializer.instance.rental_point_id
+
+        with transaction.atomic():
+            instance = serializer.save()
+            if instance.rental_point_id != rental_point_id:
+                rental_point_ids = (rental_point_id, instance.rental_point_id)
+                rebuild_rental_point_ratings(rental_point_ids=rental_point_ids)
+                RentalPoint.objects.filter(id__in=rental_point_ids).update(updated_at=Now())
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            rebuild_rental_point_ratings(rental_point_ids=(instance.rental_point_id,))
+            RentalPoint.objects.filter(id=instance.rental_point_id).update(updated_at=Now())
+
+    @action(detail=True, methods=['get'])
+    def availability(self, request, *args, **kwargs):
+        """
+        Количество свободных единиц предложения в окне [datetime_from, datetime_to)
+        """
+
+        offer = self.get_object()
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        return Response({'offer': offer.id, 'free': get_free_count(offer.id, **serializer.validated_data)})
+
+    @action(detail=False, methods=['post'], url_path='availability', url_name='batch-availability')
+    def batch_availability(self, request, *args, **kwargs):
+        """
+        Пакетная проверка доступности набора предложений в одном окне
+        """
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        free_counts = get_free_counts(data['offers'], data['datetime_from'], data['datetime_to'])
+
+        return Response([{'offer': offer_id, 'free': free} for offer_id, free in free_counts.items()])
+
+    @action(detail=True, methods=['get'])
+    def quote(self, request, *args, **kwargs):
+        """
+        Стоимость аренды предложения на срок `duration` по его ценовым ступеням
+        """
+
+        offer = self.get_object()
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+
+        return Response({'offer': offer.id, 'price': pricing.quote(offer.id, serializer.validated_data['duration'])})
+
+    @action(detail=False, methods=['post'], url_path='quote', url_name='batch-quote')
+    def batch_quote(self, request, *args, **kwargs):
+        """
+        Пакетный расчет стоимости набора предложений на набор сроков
+        """
 
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
 
-class BoardOfferViewSet(ModelViewSet):
+        quotes = pricing.quote_many(data['offers'], data['durations'])
+
+        return Response({
+            'durations': serializer.data['durations'],
+            'results': [{'offer': offer_id, 'prices': prices} for offer_id, prices in quotes.items()],
+        })
+
+
+class BoardOfferViewSet(ResponseCacheMixin, SerializerPrefetchMixin, ModelViewSet):
     """
     Класс для отображения информации о предложении (объявлении) на доске объявлений
     """
 
     queryset = Offer.objects.all()
     serializer_class = BoardOfferSerializer
+    filter_backends = [DjangoFilterBackend, AvailabilityFilter, NearbyFilter]
+    filterset_class = OfferFilterSet
+    near_address_field = 'rental_point__address'
     http_method_names = settings.ALLOWED_HTTP_METHOD_NAMES
+    cache_models = (Offer, RentalPoint, Company, Address, City, Category, Product)
+
+    def get_cache_models(self):
+        # Фильтр доступности зависит от бронирований, остальные ответы доски от них не зависят
+        if AvailabilityFilter().is_active(self.request):
+            return (*self.cache_models, Reservation)
+
+        return self.cache_models
 
     def get_queryset(self):
         return super().get_queryset().filter(is_active=True)
@@ -58,6 +166,11 @@ class PriceViewSet(ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(offer_id=self.kwargs.get('offer_pk'))
 
+    def perform_update(self, serializer):
+        previous_offer_id = serializer.instance.offer_id
+        serializer.save()
+        pricing.invalidate_price_tiers(previous_offer_id)
+
 
 class RatingViewSet(ModelViewSet):
     """
@@ -72,4 +185,125 @@ class RatingViewSet(ModelViewSet):
         return super().get_queryset().filter(offer_id=self.kwargs.get('offer_pk'))
 
     def perform_create(self, serializer):
-        serializer.save(offer_id=self.kwargs.get('offer_pk'))
+        with transaction.atomic():
+            instance = serializer.save(offer_id=self.kwargs.get('offer_pk'))
+            apply_rating_change(instance.offer_id, added=instance.mark)
+
+    def perform_update(self, serializer):
+        offer_id, mark = serializer.instance.offer_id, serializer.instance.mark
+
+        with transaction.atomic():
+            instance = serializer.save()
+            if (instance.offer_id, instance.mark) != (offer_id, mark):
+                apply_rating_change(offer_id, removed=mark)
+                apply_rating_change(instance.offer_id, added=instance.mark)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            apply_rating_change(instance.offer_id, removed=instance.mark)
+
+
+class OfferImageViewSet(mixins.RetrieveModelMixin, GenericViewSet):
+    """
+    Класс для отображения изображений предложений и их вариантов
+    """
+
+    queryset = OfferImage.objects.all()
+    serializer_class = OfferImageSerializer
+    permission_classes = (AllowAny,)
+    http_method_names = settings.ALLOWED_HTTP_METHOD_NAMES
+
+    @action(detail=True, methods=['get'], url_path=r'(?P<variant>[a-z_]+)')
+    def variant(self, request, *args, **kwargs):
+        """
+        Перенаправление на файл варианта изображения. Еще не созданный вариант создается при первом обращении
+        """
+
+        if kwargs['variant'] not in VARIANTS:
+            raise NotFound('Неизвестный вариант изображения.')
+
+        image = self.get_object()
+        try:
+            variant_name = generate_variant(image.image.name, kwargs['variant'])
+        except (ImageVariantError, OSError):
+            raise NotFound('Вариант изображения не может быть создан.')
+
+        return HttpResponseRedirect(default_storage.url(variant_name))
+
+
+class ImageUploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, GenericViewSet):
+    """
+    Класс загрузки изображений предложений по частям (см. offer.uploads).
+    POST создает загрузку, GET возвращает полученное смещение для продолжения, PUT принимает очередную часть
+    """
+
+    queryset = ImageUpload.objects.select_related('image')
+    serializer_class = ImageUploadSerializer
+    permission_classes = (IsAuthenticated,)
+    http_method_names = settings.ALLOWED_HTTP_METHOD_NAMES
+
+    def get_queryset(self):
+        return super().get_queryset().filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def update(self, request, *args, **kwargs):
+        """
+        Прием части: тело запроса читается из потока и дописывается во временный файл без разбора парсерами
+        """
+
+        upload = self.get_object()
+
+        with transaction.atomic():
+            upload = self.get_queryset().select_for_update(of=('self',)).get(pk=upload.pk)
+            try:
+                write_chunk(upload, request.stream, request.META.get('HTTP_CONTENT_RANGE'))
+            except UploadOffsetMismatch as error:
+                return Response(
+                    {'detail': str(error), 'received': error.received}, status=status.HTTP_409_CONFLICT)
+            except UploadError as error:
+                return Response(
+                    {'detail': str(error), 'received': upload.received}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(self.get_serializer(upload).data)
+
+
+class CatalogImportViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, GenericViewSet):
+    """
+    Класс импорта каталога предложений компании для администраторов (см. offer.catalog).
+    POST принимает файл и ставит импорт в очередь фоновых задач, GET возвращает прогресс задания
+    """
+
+    queryset = CatalogImport.objects.order_by('-id')
+    serializer_class = CatalogImportSerializer
+    permission_classes = (IsAdminUser,)
+    parser_classes = (MultiPartParser,)
+    http_method_names = settings.ALLOWED_HTTP_METHOD_NAMES
+
+    def perform_create(self, serializer):
+        file = serializer.validated_data['file']
+
+        with transaction.atomic():
+            instance = serializer.save(user=self.request.user, source=file.name, checksum=hash_file(file))
+            import_catalog.delay(instance.id)
+
+    @action(detail=True, methods=['post'])
+    def resume(self, request, *args, **kwargs):
+        """
+        Повторно ставит в очередь прерванный импорт: он продолжится с первой необработанной строки
+        """
+
+        with transaction.atomic():
+            job = self.get_queryset().select_for_update().get(pk=self.get_object().pk)
+            if job.status != ImportStatuses.FAILED:
+                return Response(
+                    {'detail': 'Продолжить можно только импорт, завершившийся ошибкой.'},
+                    status=status.HTTP_400_BAD_REQUEST)
+
+            job.status = ImportStatuses.PENDING
+            job.save(update_fields=('status', 'updated_at'))
+            import_catalog.delay(job.id)
+
+        return Response(self.get_serializer(job).data)
@@ -2,11 +2,12 @@ from django.conf import settings
 from rest_framework import mixins
 from rest_framework.viewsets import GenericViewSet
 
+from api.core.mixins import SerializerPrefetchMixin
 from api.public.product.serializers import ProductSerializer
 from product.models import Product
 
 
-class ProductViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, GenericViewSet):
+class ProductViewSet(SerializerPrefetchMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, GenericViewSet):
     """
     Класс отображает инфомрацию о предмете аренды
     """
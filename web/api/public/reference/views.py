@@ -1,13 +1,17 @@
 from django.conf import settings
 from django.utils.functional import cached_property
 from rest_framework import mixins
+from rest_framework.decorators import action
 from rest_framework.generics import ListAPIView, get_object_or_404
 from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from api.core.cache import ResponseCacheMixin
 from api.core.serializers import SimpleNameSerializer
 from api.public.reference.serializers import UserAddressSerializer, CitySerializer, CategorySerializer
 from product.models import Product
+from reference.categories import get_category_tree
 from reference.models import Address, City, Category
 
 
@@ -22,7 +26,7 @@ class UserAddressListApiView(ListAPIView):
     permission_classes = (AllowAny,)
 
 
-class CityListApiView(ListAPIView):
+class CityListApiView(ResponseCacheMixin, ListAPIView):
     """
     Класс возвращает список городов
     """
@@ -31,9 +35,11 @@ class CityListApiView(ListAPIView):
     serializer_class = CitySerializer
     http_method_names = settings.ALLOWED_HTTP_METHOD_NAMES
     permission_classes = (AllowAny,)
+    pagination_class = None
+    cache_models = (City,)
 
 
-class CategoryViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, GenericViewSet):
+class CategoryViewSet(ResponseCacheMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, GenericViewSet):
     """
     Класс отображает информацию о категориях
     """
@@ -42,6 +48,16 @@ class CategoryViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, GenericV
     serializer_class = CategorySerializer
     http_method_names = settings.ALLOWED_HTTP_METHOD_NAMES
     permission_classes = (AllowAny,)
+    pagination_class = None
+    cache_models = (Category,)
+
+    @action(detail=False, methods=['get'])
+    def tree(self, request, *args, **kwargs):
+        """
+        Полное дерево категорий с вложенными подкатегориями
+        """
+
+        return Response(get_category_tree())
 
 
 class ProductViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, GenericViewSet):
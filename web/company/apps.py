@@ -5,3 +5,6 @@ class CompanyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'company'
     verbose_name = 'Компании'
+
+    def ready(self):
+        from company import signals  # noqa: F401
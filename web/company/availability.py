@@ -0,0 +1,112 @@
+"""
+Доступность предложений во временном окне.
+
+Полный запас предложения равен `Offer.count` (остаток после принятых бронирований) плюс количество по всем
+принятым бронированиям. Свободно в окне [from, to) столько единиц, сколько остается от полного запаса
+за вычетом пиковой одновременной загрузки принятыми бронированиями, пересекающими окно. Пересекающие бронирования
+выбираются по частичному индексу (offer, datetime_from, datetime_to) WHERE status = 'accepted',
+пик считается заметающей прямой по отсортированным концам интервалов.
+"""
+from collections import defaultdict
+
+from django.apps import apps
+from django.db.models import F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from core.collections import ReservationStatuses
+
+
+def accepted_total():
+    """
+    Выражение для аннотации предложений: сумма количества по принятым бронированиям
+    """
+
+    Reservation = apps.get_model('company', 'Reservation')
+
+    totals = Reservation.objects.filter(offer=OuterRef('pk'), status=ReservationStatuses.ACCEPTED).order_by()
+    return Coalesce(Subquery(totals.values('offer').annotate(total=Sum('count')).values('total')), Value(0))
+
+
+def overlapping(reservations, datetime_from, datetime_to):
+    """
+    Принятые бронирования, пересекающие окно [datetime_from, datetime_to).
+    Бронирование без начала или конца считается открытым с этой стороны
+    """
+
+    return reservations.filter(
+        Q(datetime_from__lt=datetime_to) | Q(datetime_from__isnull=True),
+        Q(datetime_to__gt=datetime_from) | Q(datetime_to__isnull=True),
+        status=ReservationStatuses.ACCEPTED,
+    )
+
+
+def peak_load(intervals, datetime_from, datetime_to):
+    """
+    Максимальное суммарное количество одновременно занятых единиц в окне.
+    `intervals` - последовательность (начало, конец, количество)
+    """
+
+    events = []
+    for start, end, count in intervals:
+        start = max(start, datetime_from) if start is not None else datetime_from
+        end = min(end, datetime_to) if end is not None else datetime_to
+        if start < end:
+            events.append((start, 1, count))
+            events.append((end, 0, -count))
+
+    # При совпадении времени сначала освобождение, затем занятие: интервалы полуоткрытые
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    peak = load = 0
+    for _, _, delta in events:
+        load += delta
+        peak = max(peak, load)
+
+    return peak
+
+
+def get_free_counts(offer_ids, datetime_from, datetime_to):
+    """
+    Количество свободных единиц в окне для набора предложений: {offer_id: количество}.
+    Два запроса независимо от числа предложений
+    """
+
+    Offer = apps.get_model('offer', 'Offer')
+    Reservation = apps.get_model('company', 'Reservation')
+
+    capacities = Offer.objects.filter(id__in=offer_ids).annotate(
+        capacity=F('count') + accepted_total()).values_list('id', 'capacity')
+
+    intervals = defaultdict(list)
+    reservations = overlapping(Reservation.objects.filter(offer_id__in=offer_ids), datetime_from, datetime_to)
+    for offer_id, start, end, count in reservations.values_list('offer_id', 'datetime_from', 'datetime_to', 'count'):
+        intervals[offer_id].append((start, end, count))
+
+    return {
+        offer_id: max(capacity - peak_load(intervals[offer_id], datetime_from, datetime_to), 0)
+        for offer_id, capacity in capacities
+    }
+
+
+def get_free_count(offer_id, datetime_from, datetime_to):
+    return get_free_counts((offer_id,), datetime_from, datetime_to).get(offer_id, 0)
+
+
+def filter_available(queryset, datetime_from, datetime_to, count=1):
+    """
+    Оставляет в queryset предложения, у которых в окне свободно не меньше `count` единиц.
+    Точный расчет выполняется только для предложений с пересекающими окно бронированиями,
+    для остальных достаточно сравнить полный запас
+    """
+
+    Reservation = apps.get_model('company', 'Reservation')
+
+    busy_reservations = overlapping(
+        Reservation.objects.filter(offer__in=queryset.values('id')), datetime_from, datetime_to)
+    busy_ids = set(busy_reservations.values_list('offer_id', flat=True).distinct())
+
+    free_counts = get_free_counts(busy_ids, datetime_from, datetime_to) if busy_ids else {}
+    unavailable_ids = [offer_id for offer_id, free in free_counts.items() if free < count]
+
+    return queryset.annotate(capacity=F('count') + accepted_total()).filter(
+        capacity__gte=count).exclude(id__in=unavailable_ids)
@@ -0,0 +1,78 @@
+"""
+Выгрузки бронирований и предложений пунктов проката (см. core.exports).
+
+Фильтры по статусу и периоду накладываются на индексированные колонки: бронирования - по индексу
+(offer, date_created), предложения - по updated_at. Колонки выгрузки предложений совпадают с колонками импорта
+каталога (см. offer.catalog), поэтому выгрузку можно загрузить обратно.
+"""
+from collections import defaultdict
+
+from core.collections import ReservationStatuses
+from core.exports import Export
+from offer.models import Price
+
+
+OFFER_STATUSES = {'active': True, 'inactive': False}
+
+
+class ReservationExport(Export):
+    """
+    Выгрузка истории бронирований
+    """
+
+    columns = (
+        ('id', 'id'),
+        ('date_created', 'date_created'),
+        ('status', 'status'),
+        ('count', 'count'),
+        ('datetime_from', 'datetime_from'),
+        ('datetime_to', 'datetime_to'),
+        ('offer', 'offer_id'),
+        ('product', 'offer__product__name'),
+        ('rental_point', 'offer__rental_point_id'),
+        ('user', 'user_id'),
+        ('user_email', 'user__email'),
+    )
+    date_field = 'date_created'
+    statuses = sorted(status for status, _ in ReservationStatuses.CHOICES)
+
+    def get_status_lookup(self, status):
+        return {'status': status}
+
+
+class OfferExport(Export):
+    """
+    Выгрузка предложений с ценами в формате импорта каталога
+    """
+
+    columns = (
+        ('id', 'id'),
+        ('rental_point', 'rental_point_id'),
+        ('product', 'product__name'),
+        ('category', 'product__category__name'),
+        ('description', 'description'),
+        ('count', 'count'),
+        ('is_active', 'is_active'),
+        ('is_for_child', 'is_for_child'),
+        ('is_female', 'is_female'),
+        ('is_male', 'is_male'),
+        ('is_unisex', 'is_unisex'),
+        ('updated_at', 'updated_at'),
+    )
+    related_columns = ('prices',)
+    date_field = 'updated_at'
+    statuses = sorted(OFFER_STATUSES)
+    price_columns = ('time_from', 'time_from_unit', 'price_per_time', 'price_per_time_unit')
+
+    def get_status_lookup(self, status):
+        return {'is_active': OFFER_STATUSES[status]}
+
+    def add_related(self, rows):
+        prices = defaultdict(list)
+        queryset = Price.objects.filter(offer_id__in=[row['id'] for row in rows])
+        for offer_id, *values in queryset.order_by('offer_id', 'time_from', 'id').values_list(
+                'offer_id', *self.price_columns):
+            prices[offer_id].append(dict(zip(self.price_columns, values)))
+
+        for row in rows:
+            row['prices'] = prices.get(row['id'], [])
@@ -0,0 +1,112 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.core.compiled import compile_serializer
+from api.core.prefetch import get_query_plan
+from api.public.company.serializers import OfferReadOnlySerializer, ReservationsReadOnlySerializer
+from company.models import Company, RentalPoint, Reservation
+from core.collections import ReservationStatuses, TimeUnits
+from offer.models import Offer, Price, Rating
+from product.models import Product
+from reference.models import Address, Category, City
+from user.models import User
+
+
+class Command(BaseCommand):
+    """
+    Сравнение обычного и скомпилированного режима сериализаторов предложений и бронирований филиала:
+    совпадение JSON и время от запроса до списка словарей. Данные создаются внутри транзакции,
+    которая откатывается по завершении
+    """
+
+    help = 'Бенчмарк скомпилированных сериализаторов только на чтение'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Количество предложений и бронирований')
+        parser.add_argument('--repeat', type=int, default=3, help='Количество повторов каждого режима')
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+
+        with transaction.atomic():
+            rental_point = self.seed(options['rows'])
+            for serializer_class, queryset in (
+                    (OfferReadOnlySerializer, Offer.objects.filter(rental_point=rental_point).order_by('-id')),
+                    (ReservationsReadOnlySerializer,
+                     Reservation.objects.filter(offer__rental_point=rental_point).order_by('-id'))):
+                self.compare(serializer_class, queryset, options['repeat'])
+            transaction.set_rollback(True)
+
+    def compare(self, serializer_class, queryset, repeat):
+        plan = get_query_plan(serializer_class)
+        compiled = compile_serializer(serializer_class)
+
+        standard, standard_time = self.measure(
+            lambda: serializer_class(plan.apply(queryset), many=True).data, repeat)
+        fast, fast_time = self.measure(lambda: compiled.serialize(queryset), repeat)
+
+        renderer = JSONRenderer()
+        if renderer.render(standard) != renderer.render(fast):
+            raise CommandError(f'{serializer_class.__name__}: результаты режимов различаются')
+
+        self.stdout.write(
+            f'{serializer_class.__name__:32} {len(fast):6} строк   '
+            f'обычный {standard_time:8.1f} мс   скомпилированный {fast_time:8.1f} мс   '
+            f'ускорение {standard_time / fast_time:4.1f}x'
+        )
+
+    def measure(self, serialize, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = serialize()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        return data, statistics.median(timings)
+
+    def seed(self, count):
+        city = City.objects.create(name='Москва')
+        category = Category.objects.create(name='Велосипеды')
+        products = [
+            Product.objects.create(name='Горный велосипед', category=category),
+            Product.objects.create(name='Самокат'),
+        ]
+        address = Address.objects.create(address='ул. Лесная, 1', city=city)
+        rental_point = RentalPoint.objects.create(
+            address=address, company=Company.objects.create(name='Прокат'), phone='+79990000000')
+        user = User.objects.create(email='bench-compiled@example.com')
+
+        offers = Offer.objects.bulk_create([
+            Offer(count=random.randint(1, 20), description='Прокат с шлемом и замком', product=random.choice(products),
+                  rental_point=rental_point, is_for_child=random.random() < 0.2)
+            for _ in range(count)
+        ])
+        units = [unit for unit, _ in TimeUnits.CHOICES]
+        Price.objects.bulk_create([
+            Price(offer=offer, time_from=time_from, time_from_unit=random.choice(units),
+                  price_per_time=random.randint(100, 500), price_per_time_unit=random.choice(units))
+            for offer in offers for time_from in (1, 3)
+        ])
+        Rating.objects.bulk_create([
+            Rating(offer=offer, user=user, mark=random.randint(1, 5), comment='Все отлично')
+            for offer in offers if random.random() < 0.7
+        ])
+
+        now = timezone.now()
+        statuses = [status for status, _ in ReservationStatuses.CHOICES]
+        Reservation.objects.bulk_create([
+            Reservation(offer=random.choice(offers), user=user, count=random.randint(1, 3),
+                        status=random.choice(statuses), datetime_from=now + timedelta(hours=index),
+                        datetime_to=now + timedelta(hours=index + 2) if index % 10 else None)
+            for index in range(count)
+        ])
+
+        return rental_point
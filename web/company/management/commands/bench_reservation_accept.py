@@ -0,0 +1,107 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from company.models import Company, RentalPoint, Reservation
+from core.collections import ReservationStatuses
+from offer.models import Offer
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочная проверка подтверждения бронирований: параллельные подтверждения по одному "горячему" предложению.
+    Проверяет, что подтверждено ровно min(остаток, бронирования) и остаток не ушел в минус, и измеряет подтверждения
+    в секунду. Режим --legacy воспроизводит прежнюю схему "прочитать, сравнить, сохранить" для сравнения.
+    Потоки работают в своих соединениях и не видят незафиксированных данных, поэтому данные прогона создаются
+    в базе и удаляются после него
+    """
+
+    help = 'Бенчмарк параллельного подтверждения бронирований одного предложения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=100, help='Остаток предложения')
+        parser.add_argument('--reservations', type=int, default=300, help='Количество бронирований')
+        parser.add_argument('--workers', type=int, default=16, help='Количество параллельных потоков')
+        parser.add_argument('--legacy', action='store_true', help='Прежняя схема без атомарного списания')
+
+    def handle(self, *args, **options):
+        user, user_created = User.objects.get_or_create(email='bench-accept@example.com')
+        company = Company.objects.create(name='Бенчмарк подтверждений')
+        rental_point = RentalPoint.objects.create(company=company)
+        offer = Offer.objects.create(rental_point=rental_point, count=options['stock'], description='bench')
+        reservations = Reservation.objects.bulk_create([
+            Reservation(offer=offer, user=user, count=1) for _ in range(options['reservations'])
+        ])
+
+        accept = self.accept_legacy if options['legacy'] else self.accept
+
+        try:
+            started = time.perf_counter()
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), \
+                    ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                results = list(executor.map(lambda reservation: accept(user, reservation), reservations))
+            elapsed = time.perf_counter() - started
+
+            offer.refresh_from_db()
+            accepted = Reservation.objects.filter(offer=offer, status=ReservationStatuses.ACCEPTED).count()
+            expected = min(options['stock'], options['reservations'])
+
+            self.stdout.write(
+                f'Успешных ответов: {sum(results)}, принято в БД: {accepted}, остаток: {offer.count}, '
+                f'ожидалось принять: {expected}'
+            )
+            self.stdout.write(f'{len(reservations) / elapsed:.0f} подтверждений/с ({elapsed:.2f} с)')
+        finally:
+            company.delete()
+            if user_created:
+                self.delete_user(user)
+
+        if accepted == 0:
+            raise CommandError('Ни одно бронирование не подтверждено: проверьте ответы API')
+        if accepted != expected or accepted + offer.count != options['stock'] or offer.count < 0:
+            raise CommandError('Остаток не сходится с подтвержденными бронированиями')
+        self.stdout.write(self.style.SUCCESS('Перепродажи нет'))
+
+    def delete_user(self, user):
+        """
+        Удаляет пользователя прогона. Его бронирования уже удалены вместе с компанией. Удаление через ORM
+        после запросов к API обходит связь с allauth SocialAccount, модель которой загружается
+        rest_auth.registration, хотя приложение не установлено и таблицы нет
+        """
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {User._meta.db_table} WHERE id = %s', (user.id,))
+
+    def accept(self, user, reservation):
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            response = client.put(
+                f'/api/v1/offer/{reservation.offer_id}/reservation/{reservation.id}/',
+                {'status': ReservationStatuses.ACCEPTED}, format='json',
+            )
+            return response.status_code == 200
+        finally:
+            connection.close()
+
+    def accept_legacy(self, user, reservation):
+        try:
+            offer = Offer.objects.get(id=reservation.offer_id)
+            if offer.count < reservation.count:
+                return False
+
+            offer.count -= reservation.count
+            offer.save()
+            Reservation.objects.filter(id=reservation.id).update(status=ReservationStatuses.ACCEPTED)
+            return True
+        finally:
+            connection.close()
@@ -0,0 +1,86 @@
+import statistics
+import time
+from datetime import date, timedelta
+
+import requests
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from company.slot_service import CircuitBreakerOpen, SlotServiceClient, SlotServiceError
+from company.slot_stub import start_stub_server
+
+
+class Command(BaseCommand):
+    """
+    Сравнение прежних вызовов requests.get без сессии с клиентом сервиса слотов на локальной заглушке:
+    новое соединение на каждый запрос, пул соединений, пул с кэшем, а также поведение выключателя при отказах
+    """
+
+    help = 'Бенчмарк клиента сервиса слотов на локальной заглушке'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Количество запросов в каждом режиме')
+        parser.add_argument('--days', type=int, default=10, help='Количество различных дат в запросах')
+        parser.add_argument('--latency', type=float, default=0.0, help='Задержка ответа заглушки в секундах')
+
+    def handle(self, *args, **options):
+        server = start_stub_server(latency=options['latency'])
+        queries = [(12, date(2021, 5, 22) + timedelta(days=index % options['days']))
+                   for index in range(options['requests'])]
+
+        try:
+            def legacy(rental_point_id, day):
+                return requests.get(f'{server.url}/api/slots/{rental_point_id}/{day.isoformat()}').json()
+
+            pooled = SlotServiceClient(server.url, cache_ttl=0)
+            cached = SlotServiceClient(server.url, cache_ttl=60)
+            cache.delete_many([cached.get_cache_key('GET', f'/api/slots/{rental_point_id}/{day.isoformat()}', None)
+                               for rental_point_id, day in set(queries)])
+
+            for title, call in (('requests.get без сессии', legacy), ('пул соединений', pooled.get_slots),
+                                ('пул и кэш', cached.get_slots)):
+                self.report(title, self.measure(call, queries))
+
+            self.check_breaker()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def measure(self, call, queries):
+        timings = []
+        started = time.perf_counter()
+        for rental_point_id, day in queries:
+            request_started = time.perf_counter()
+            call(rental_point_id, day)
+            timings.append((time.perf_counter() - request_started) * 1000)
+
+        return time.perf_counter() - started, timings
+
+    def report(self, title, result):
+        elapsed, timings = result
+        timings.sort()
+        self.stdout.write(
+            f'{title:24} всего {elapsed * 1000:8.1f} мс, медиана {statistics.median(timings):6.2f} мс, '
+            f'p99 {timings[int(len(timings) * 0.99) - 1]:6.2f} мс'
+        )
+
+    def check_breaker(self):
+        server = start_stub_server(failure_rate=1.0)
+        client = SlotServiceClient(server.url, retries=0, cache_ttl=0, failure_threshold=3, reset_timeout=60)
+
+        try:
+            outcomes = []
+            for _ in range(6):
+                started = time.perf_counter()
+                try:
+                    client.get_slots(1, date(2021, 5, 22))
+                except CircuitBreakerOpen:
+                    outcomes.append(('разомкнут', time.perf_counter() - started))
+                except SlotServiceError:
+                    outcomes.append(('ошибка 503', time.perf_counter() - started))
+
+            self.stdout.write('Выключатель при постоянных отказах: ' + ', '.join(
+                f'{outcome} ({elapsed * 1000:.2f} мс)' for outcome, elapsed in outcomes))
+        finally:
+            server.shutdown()
+            server.server_close()
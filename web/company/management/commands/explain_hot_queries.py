@@ -0,0 +1,89 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from company.models import RentalPoint, Reservation
+from company.rollups import get_reservations
+from core.collections import ReservationStatuses
+from offer.models import Offer, Price, Rating
+from user.models import User
+
+
+EXECUTION_TIME = re.compile(r'Execution Time: ([\d.]+) ms')
+SCAN = re.compile(r'Index (?:Only )?Scan (?:Backward )?using (\w+)|Bitmap Index Scan on (\w+)|Seq Scan on (\w+)')
+
+
+class Command(BaseCommand):
+    """
+    Команда печатает планы (EXPLAIN ANALYZE) горячих запросов к предложениям, ценам, оценкам и бронированиям,
+    чтобы проверять выбор индексов на заполненной базе
+    """
+
+    help = 'Печатает EXPLAIN ANALYZE горячих запросов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shape', action='append', help='Только запрос с этим именем (можно несколько)')
+        parser.add_argument('--no-analyze', action='store_true', help='Только план, без выполнения запросов')
+        parser.add_argument('--summary', action='store_true', help='Только время выполнения каждого запроса')
+
+    def get_shapes(self):
+        rental_point = RentalPoint.objects.filter(offers__isnull=False).order_by('-id').first()
+        offer = Offer.objects.filter(reservations__isnull=False).order_by('-id').first()
+        user = User.objects.filter(reservations__isnull=False).order_by('-id').first()
+        if rental_point is None or offer is None or user is None:
+            raise CommandError('Нет данных: заполните базу предложениями и бронированиями.')
+
+        rental_point_ids = list(RentalPoint.objects.order_by('-id').values_list('id', flat=True)[:20])
+        offer_ids = list(Offer.objects.order_by('-id').values_list('id', flat=True)[:50])
+        last_reservation = Reservation.objects.filter(offer=offer).order_by('-datetime_from').first()
+        day = (last_reservation.datetime_from or last_reservation.date_created).date()
+
+        return {
+            # Слоты и доступность: активные предложения страницы точек выдачи
+            'slots_offers': Offer.objects.filter(rental_point__in=rental_point_ids, is_active=True).values('id'),
+            # Первая страница доски объявлений
+            'board_page': Offer.objects.filter(is_active=True).order_by('-id').values('id')[:50],
+            # Активные предложения точки выдачи
+            'rental_point_active_offers': Offer.objects.filter(rental_point=rental_point, is_active=True).values('id'),
+            # Незакрытые брони предложения
+            'offer_open_reservations': Reservation.objects.filter(
+                offer=offer, status__in=(ReservationStatuses.NEW, ReservationStatuses.ACCEPTED)).values('id', 'count'),
+            # Новые брони точки выдачи, ожидающие решения
+            'rental_point_new_reservations': Reservation.objects.filter(
+                offer__rental_point=rental_point, status=ReservationStatuses.NEW).order_by('-id').values('id')[:50],
+            # История бронирований пользователя
+            'user_reservations': Reservation.objects.filter(user=user).order_by('-date_created').values('id')[:50],
+            # Пересчет дневных агрегатов предложения за день
+            'rollup_refresh': get_reservations((offer.id,), day, day),
+            # Гистограмма оценок предложения
+            'offer_rating_histogram': Rating.objects.filter(offer=offer).values('mark').annotate(
+                count=Count('mark')).order_by('mark'),
+            # Ступени цен страницы предложений (offer.pricing)
+            'price_tiers': Price.objects.filter(offer_id__in=offer_ids).order_by('id').values_list(
+                'offer_id', 'time_from', 'time_from_unit', 'price_per_time', 'price_per_time_unit'),
+            # Цены пачки выгрузки предложений (company.exports)
+            'export_prices': Price.objects.filter(offer_id__in=offer_ids).order_by(
+                'offer_id', 'time_from', 'id').values_list('offer_id', 'time_from'),
+        }
+
+    def handle(self, *args, **options):
+        shapes = self.get_shapes()
+        if options['shape']:
+            unknown = set(options['shape']) - shapes.keys()
+            if unknown:
+                raise CommandError(f'Неизвестные запросы: {", ".join(sorted(unknown))}. Есть: {", ".join(shapes)}')
+            shapes = {name: queryset for name, queryset in shapes.items() if name in options['shape']}
+
+        explain_options = {} if options['no_analyze'] else {'analyze': True, 'buffers': True}
+        for name, queryset in shapes.items():
+            plan = queryset.explain(**explain_options)
+            if options['summary']:
+                match = EXECUTION_TIME.search(plan)
+                scans = sorted({index or bitmap or f'seq {table}' for index, bitmap, table in SCAN.findall(plan)})
+                used = ', '.join(scans)
+                self.stdout.write(f'{name:32} {match.group(1) if match else "-":>10} мс   {used}')
+            else:
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.stdout.write(plan)
+                self.stdout.write('')
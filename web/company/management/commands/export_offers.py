@@ -0,0 +1,17 @@
+from company.exports import OfferExport
+from company.management.commands.export_reservations import Command as ExportReservationsCommand
+from offer.models import Offer
+
+
+class Command(ExportReservationsCommand):
+    """
+    Команда потоковой выгрузки предложений пунктов проката с ценами в формате импорта каталога
+    """
+
+    help = 'Выгружает предложения пунктов проката в CSV или JSON Lines'
+
+    export_class = OfferExport
+    rental_point_field = 'rental_point'
+
+    def get_queryset(self):
+        return Offer.objects.all()
@@ -0,0 +1,69 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from company.exports import ReservationExport
+from company.models import Reservation
+from core.exports import CSV, EXPORT_CHUNK_SIZE, JSONL
+
+
+def date_argument(value):
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(value)
+
+    return parsed
+
+
+class Command(BaseCommand):
+    """
+    Команда потоковой выгрузки истории бронирований пунктов проката в CSV или JSON Lines (см. core.exports)
+    """
+
+    help = 'Выгружает бронирования пунктов проката в CSV или JSON Lines'
+
+    export_class = ReservationExport
+    rental_point_field = 'offer__rental_point'
+
+    def get_queryset(self):
+        return Reservation.objects.all()
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rental-point', type=int, action='append', help='Пункт проката (можно несколько)')
+        parser.add_argument('--company', type=int, help='Все пункты проката компании')
+        parser.add_argument('--status', choices=self.export_class.statuses, help='Статус')
+        parser.add_argument('--date-from', type=date_argument, help='Дата с (ГГГГ-ММ-ДД)')
+        parser.add_argument('--date-to', type=date_argument, help='Дата по включительно (ГГГГ-ММ-ДД)')
+        parser.add_argument('--format', choices=(CSV, JSONL), default=CSV, help='Формат')
+        parser.add_argument('--output', help='Файл, по умолчанию стандартный вывод')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Строк в пачке курсора')
+
+    def handle(self, *args, **options):
+        if not options['rental_point'] and not options['company']:
+            raise CommandError('Нужно указать --rental-point или --company.')
+
+        queryset = self.get_queryset()
+        if options['rental_point']:
+            queryset = queryset.filter(**{f'{self.rental_point_field}__in': options['rental_point']})
+        if options['company']:
+            queryset = queryset.filter(**{f'{self.rental_point_field}__company': options['company']})
+
+        export = self.export_class(queryset).filter(
+            status=options['status'], date_from=options['date_from'], date_to=options['date_to'])
+
+        started = time.monotonic()
+        size = 0
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in export.stream(options['format'], options['chunk_size']):
+                output.write(chunk)
+                size += len(chunk)
+        finally:
+            if options['output']:
+                output.close()
+            else:
+                output.flush()
+
+        self.stderr.write(f'Выгружено {size} байт за {time.monotonic() - started:.2f} с')
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from company.rollups import rebuild_rollups
+from offer.models import Offer
+
+
+class Command(BaseCommand):
+    """
+    Команда полного пересчета дневных агрегатов бронирований (см. company.rollups), например после загрузки
+    истории бронирований или изменения правил расчета
+    """
+
+    help = 'Пересчитывает дневные агрегаты бронирований предложений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Только предложения компании')
+        parser.add_argument('--offer', type=int, action='append', help='Только предложение (можно несколько)')
+        parser.add_argument('--batch-size', type=int, default=200, help='Предложений в одной транзакции')
+
+    def handle(self, *args, **options):
+        offers = Offer.objects.order_by('id')
+        if options['company']:
+            offers = offers.filter(rental_point__company_id=options['company'])
+        if options['offer']:
+            offers = offers.filter(id__in=options['offer'])
+
+        started = time.monotonic()
+        offer_count = rollup_count = 0
+        for batch_offers, batch_rollups in rebuild_rollups(
+                offers.values_list('id', flat=True).iterator(), options['batch_size']):
+            offer_count += batch_offers
+            rollup_count += batch_rollups
+            self.stdout.write(f'  предложений {offer_count}, строк агрегатов {rollup_count}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Агрегаты пересчитаны: предложений {offer_count}, строк {rollup_count}, '
+            f'{time.monotonic() - started:.1f} с'
+        ))
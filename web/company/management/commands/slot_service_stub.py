@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from company.slot_stub import SlotStubServer
+
+
+class Command(BaseCommand):
+    """
+    Локальная заглушка сервиса слотов. Для работы с ней задайте HOST_OFFER=http://<host>:<port>
+    """
+
+    help = 'Запуск локальной заглушки сервиса слотов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Адрес прослушивания')
+        parser.add_argument('--port', type=int, default=8080, help='Порт прослушивания')
+        parser.add_argument('--latency', type=float, default=0.0, help='Задержка каждого ответа в секундах')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Доля ответов 503 (от 0 до 1)')
+
+    def handle(self, *args, **options):
+        server = SlotStubServer(
+            (options['host'], options['port']), latency=options['latency'], failure_rate=options['failure_rate'],
+            verbose=options['verbosity'] > 1,
+        )
+        self.stdout.write(f'Заглушка сервиса слотов слушает {server.url}')
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,52 @@
+# Generated by Django 3.2.3 on 2026-10-18 12:01
+
+from django.db import migrations, models
+
+import offer.ratings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0003_alter_company_user'),
+        ('offer', '0005_offer_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rentalpoint',
+            name='rating_avg',
+            field=models.FloatField(default=0, verbose_name='Средняя оценка'),
+        ),
+        migrations.AddField(
+            model_name='rentalpoint',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество оценок'),
+        ),
+        migrations.AddField(
+            model_name='rentalpoint',
+            name='rating_mark_1',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество оценок «1»'),
+        ),
+        migrations.AddField(
+            model_name='rentalpoint',
+            name='rating_mark_2',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество оценок «2»'),
+        ),
+        migrations.AddField(
+            model_name='rentalpoint',
+            name='rating_mark_3',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество оценок «3»'),
+        ),
+        migrations.AddField(
+            model_name='rentalpoint',
+            name='rating_mark_4',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество оценок «4»'),
+        ),
+        migrations.AddField(
+            model_name='rentalpoint',
+            name='rating_mark_5',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество оценок «5»'),
+        ),
+        migrations.RunPython(offer.ratings.rebuild_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-18 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0004_rentalpoint_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('status', 'accepted')), fields=['offer', 'datetime_from', 'datetime_to'], name='reservation_accepted_window'),
+        ),
+    ]
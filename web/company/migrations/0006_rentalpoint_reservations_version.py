@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 12:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0005_reservation_accepted_window'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rentalpoint',
+            name='reservations_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия бронирований'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-18 12:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0007_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['offer', 'date_created'], name='reservation_offer_created'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.3 on 2026-10-18 12:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offer', '0010_catalog_import'),
+        ('company', '0008_reservation_offer_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('reserved_units', models.PositiveIntegerField(default=0, verbose_name='Забронировано единиц')),
+                ('accepted_count', models.PositiveIntegerField(default=0, verbose_name='Принятых бронирований')),
+                ('revenue', models.FloatField(default=0, verbose_name='Оценка выручки')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+                ('offer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='offer.offer', verbose_name='Предложение')),
+                ('rental_point', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='company.rentalpoint', verbose_name='Точка выдачи')),
+            ],
+            options={
+                'verbose_name': 'Агрегат бронирований за день',
+                'verbose_name_plural': 'Агрегаты бронирований за день',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reservationrollup',
+            index=models.Index(fields=['rental_point', 'date'], name='reservation_rollup_point_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='reservationrollup',
+            constraint=models.UniqueConstraint(fields=('offer', 'date'), name='reservation_rollup_offer_date'),
+        ),
+    ]
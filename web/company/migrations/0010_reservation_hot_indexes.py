@@ -0,0 +1,35 @@
+# Generated by Django 3.2.3 on 2026-10-18 12:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('offer', '0010_catalog_import'),
+        ('company', '0009_reservation_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('status__in', ('new', 'accepted'))), fields=['offer', 'status'], name='reservation_offer_open'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['user', 'date_created'], name='reservation_user_created'),
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='offer',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='offer.offer', verbose_name='Предложение'),
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='user',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+    ]
@@ -1,9 +1,10 @@
 from django.db import models
 
 from core.collections import ReservationStatuses
+from core.models import AbstractRatingAggregate, AbstractUpdatedAt
 
 
-class Company(models.Model):
+class Company(AbstractUpdatedAt):
     """
     Модель компании
     """
@@ -21,7 +22,7 @@ class Company(models.Model):
         return self.name
 
 
-class RentalPoint(models.Model):
+class RentalPoint(AbstractRatingAggregate, AbstractUpdatedAt):
     """
     Модель точки выдачи
     """
@@ -33,6 +34,7 @@ class RentalPoint(models.Model):
         'reference.Address', verbose_name='адрес', on_delete=models.SET_NULL, null=True, blank=True)
     company = models.ForeignKey(
         'company.Company', verbose_name='Компания', related_name='rental_points', on_delete=models.CASCADE, null=True)
+    reservations_version = models.PositiveIntegerField('Версия бронирований', default=0, editable=False)
 
     class Meta:
         verbose_name = 'Точка выдачи'
@@ -43,7 +45,7 @@ class RentalPoint(models.Model):
         return f'{self.id}: {self.phone}'
 
 
-class Reservation(models.Model):
+class Reservation(AbstractUpdatedAt):
     """
     Модель бронирования
     """
@@ -55,14 +57,59 @@ class Reservation(models.Model):
     status = models.CharField(
         'Статус', max_length=10, choices=ReservationStatuses.CHOICES, default=ReservationStatuses.NEW)
     offer = models.ForeignKey(
-        'offer.Offer', verbose_name='Предложение', related_name='reservations', on_delete=models.CASCADE, null=True)
+        'offer.Offer', verbose_name='Предложение', related_name='reservations', on_delete=models.CASCADE, null=True,
+        db_index=False)
     user = models.ForeignKey(
-        'user.User', verbose_name='Пользователь', related_name='reservations', on_delete=models.CASCADE, null=True)
+        'user.User', verbose_name='Пользователь', related_name='reservations', on_delete=models.CASCADE, null=True,
+        db_index=False)
 
     class Meta:
         verbose_name = 'Брование'
         verbose_name_plural = 'Бронирования'
+        indexes = [
+            models.Index(
+                fields=('offer', 'datetime_from', 'datetime_to'), name='reservation_accepted_window',
+                condition=models.Q(status=ReservationStatuses.ACCEPTED),
+            ),
+            # Заменяет индекс внешнего ключа offer
+            models.Index(fields=('offer', 'date_created'), name='reservation_offer_created'),
+            # Незакрытые брони предложения и новые брони точки выдачи: малая доля таблицы
+            models.Index(
+                fields=('offer', 'status'), name='reservation_offer_open',
+                condition=models.Q(status__in=(ReservationStatuses.NEW, ReservationStatuses.ACCEPTED)),
+            ),
+            # Заменяет индекс внешнего ключа user: история бронирований пользователя
+            models.Index(fields=('user', 'date_created'), name='reservation_user_created'),
+        ]
 
     def __str__(self):
 
         return f'{self.date_created.strftime("%d-%m-%Y %H:%m")} - {self.get_status_display()}'
+
+
+class ReservationRollup(models.Model):
+    """
+    Модель дневного агрегата бронирований предложения для аналитики (см. company.rollups)
+    """
+
+    date = models.DateField('Дата')
+    offer = models.ForeignKey('offer.Offer', verbose_name='Предложение', related_name='+', on_delete=models.CASCADE)
+    rental_point = models.ForeignKey(
+        'company.RentalPoint', verbose_name='Точка выдачи', related_name='+', on_delete=models.CASCADE)
+    reserved_units = models.PositiveIntegerField('Забронировано единиц', default=0)
+    accepted_count = models.PositiveIntegerField('Принятых бронирований', default=0)
+    revenue = models.FloatField('Оценка выручки', default=0)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Агрегат бронирований за день'
+        verbose_name_plural = 'Агрегаты бронирований за день'
+        constraints = [
+            models.UniqueConstraint(fields=('offer', 'date'), name='reservation_rollup_offer_date'),
+        ]
+        indexes = [
+            models.Index(fields=('rental_point', 'date'), name='reservation_rollup_point_date'),
+        ]
+
+    def __str__(self):
+        return f'{self.offer_id} {self.date}: {self.reserved_units}'
@@ -0,0 +1,201 @@
+"""
+Дневные агрегаты бронирований для аналитики загрузки и выручки.
+
+Строка `ReservationRollup` - итоги предложения за день: забронировано единиц (новые, принятые и выполненные брони),
+число принятых броней и оценка выручки. Бронь учитывается в каждом дне, который пересекает ее период
+[datetime_from, datetime_to), а бронь без периода - в дне создания. Выручка принятой брони - стоимость аренды
+на ее срок по текущим ступеням цен предложения (см. offer.pricing), умноженная на количество и разделенная
+между днями пропорционально времени брони в каждом дне. Дни считаются в часовом поясе проекта.
+
+Агрегаты обновляются инкрементально: при сохранении или удалении брони в очередь фоновых задач ставится
+пересчет только тех дней предложения, которые бронь занимала до и после изменения (см. company.signals).
+Пересчет заново агрегирует брони предложения за эти дни, поэтому результат не зависит от порядка задач.
+Полный пересчет истории - команда `rebuild_reservation_rollups`.
+"""
+import itertools
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.collections import ReservationStatuses
+from offer.pricing import duration_minutes, get_price_tiers
+
+
+RESERVED_STATUSES = (ReservationStatuses.NEW, ReservationStatuses.ACCEPTED, ReservationStatuses.DONE)
+ACCEPTED_STATUSES = (ReservationStatuses.ACCEPTED, ReservationStatuses.DONE)
+ROLLUP_LOCK_NAMESPACE = 0x726f6c6c
+RESERVATION_COLUMNS = ('offer_id', 'offer__rental_point_id', 'status', 'count', 'datetime_from', 'datetime_to',
+                       'date_created')
+
+
+def get_day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def get_rollup_span(datetime_from, datetime_to, date_created):
+    """
+    Первый и последний день (включительно), в которых учитывается бронь
+    """
+
+    if datetime_from is None or datetime_to is None or datetime_to <= datetime_from:
+        day = timezone.localdate(date_created) if date_created is not None else timezone.localdate()
+        return day, day
+
+    return timezone.localdate(datetime_from), timezone.localdate(datetime_to - timedelta(microseconds=1))
+
+
+def split_by_days(datetime_from, datetime_to):
+    """
+    Дни периода и доля периода, приходящаяся на каждый день
+    """
+
+    total = (datetime_to - datetime_from).total_seconds()
+    first_day, last_day = get_rollup_span(datetime_from, datetime_to, None)
+
+    day = first_day
+    while day <= last_day:
+        start = max(datetime_from, get_day_start(day))
+        end = min(datetime_to, get_day_start(day + timedelta(days=1)))
+        yield day, (end - start).total_seconds() / total
+        day += timedelta(days=1)
+
+
+def aggregate_reservations(offer_ids, rows, first_day=None, last_day=None):
+    """
+    Дневные итоги предложений по строкам их броней (RESERVATION_COLUMNS): {(offer_id, день): [точка выдачи,
+    единиц, принятых, выручка]}. Дни вне [first_day, last_day] отбрасываются
+    """
+
+    tiers = get_price_tiers(offer_ids)
+    totals = {}
+
+    for offer_id, rental_point_id, status, count, datetime_from, datetime_to, date_created in rows:
+        accepted = status in ACCEPTED_STATUSES
+        first, last = get_rollup_span(datetime_from, datetime_to, date_created)
+
+        if first == last:
+            days = ((first, 1.0),)
+        else:
+            days = split_by_days(datetime_from, datetime_to)
+
+        revenue = 0.0
+        if accepted and datetime_from is not None and datetime_to is not None and datetime_to > datetime_from:
+            revenue = (tiers[offer_id].quote(duration_minutes(datetime_to - datetime_from)) or 0.0) * count
+
+        for day, share in days:
+            if (first_day is not None and day < first_day) or (last_day is not None and day > last_day):
+                continue
+
+            total = totals.setdefault((offer_id, day), [rental_point_id, 0, 0, 0.0])
+            total[1] += count
+            total[2] += accepted
+            total[3] += revenue * share
+
+    return totals
+
+
+def get_reservations(offer_ids, first_day=None, last_day=None):
+    """
+    Брони предложений, учитываемые в днях [first_day, last_day]
+    """
+
+    Reservation = apps.get_model('company', 'Reservation')
+
+    queryset = Reservation.objects.filter(offer_id__in=offer_ids, status__in=RESERVED_STATUSES)
+    if first_day is not None and last_day is not None:
+        start, end = get_day_start(first_day), get_day_start(last_day + timedelta(days=1))
+        without_period = Q(datetime_from__isnull=True) | Q(datetime_to__isnull=True) | Q(
+            datetime_to__lte=F('datetime_from'))
+        queryset = queryset.filter(
+            (Q(datetime_from__lt=end, datetime_to__gt=start) & Q(datetime_to__gt=F('datetime_from')))
+            | (without_period & Q(date_created__gte=start, date_created__lt=end))
+        )
+
+    return queryset.values_list(*RESERVATION_COLUMNS)
+
+
+def save_rollups(offer_ids, totals, first_day=None, last_day=None):
+    """
+    Заменяет агрегаты предложений за дни [first_day, last_day] (или за все дни) итогами `totals`
+    """
+
+    ReservationRollup = apps.get_model('company', 'ReservationRollup')
+
+    stale = ReservationRollup.objects.filter(offer_id__in=offer_ids)
+    if first_day is not None and last_day is not None:
+        stale = stale.filter(date__gte=first_day, date__lte=last_day)
+    stale.delete()
+
+    ReservationRollup.objects.bulk_create([
+        ReservationRollup(
+            offer_id=offer_id, date=day, rental_point_id=rental_point_id, reserved_units=units,
+            accepted_count=accepted, revenue=round(revenue, 2),
+        )
+        for (offer_id, day), (rental_point_id, units, accepted, revenue) in sorted(totals.items())
+    ], batch_size=1000)
+
+
+def lock_offer(offer_id):
+    """
+    Блокировка пересчета агрегатов предложения до конца транзакции
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', (ROLLUP_LOCK_NAMESPACE, offer_id & 0x3fffffff))
+
+
+def refresh_rollups(offer_id, first_day, last_day):
+    """
+    Пересчитывает агрегаты предложения за дни [first_day, last_day]
+    """
+
+    with transaction.atomic():
+        lock_offer(offer_id)
+        totals = aggregate_reservations(
+            (offer_id,), get_reservations((offer_id,), first_day, last_day), first_day, last_day)
+        save_rollups((offer_id,), totals, first_day, last_day)
+
+    return len(totals)
+
+
+def rebuild_rollups(offer_ids, batch_size=200):
+    """
+    Пересчитывает все агрегаты предложений пачками по `batch_size` предложений. Возвращает пары
+    (число предложений, число строк агрегатов) по каждой пачке
+    """
+
+    offer_ids = iter(offer_ids)
+    while True:
+        batch = sorted(itertools.islice(offer_ids, batch_size))
+        if not batch:
+            return
+
+        with transaction.atomic():
+            # Блокировки в порядке возрастания id, чтобы пересчет не взаимоблокировался с другим
+            for offer_id in batch:
+                lock_offer(offer_id)
+            totals = aggregate_reservations(batch, get_reservations(batch).iterator(chunk_size=5000))
+            save_rollups(batch, totals)
+
+        yield len(batch), len(totals)
+
+
+def get_changed_spans(previous, current):
+    """
+    Дни предложений, агрегаты которых нужно пересчитать после изменения брони: {offer_id: (первый, последний день)}.
+    `previous` и `current` - (offer_id, datetime_from, datetime_to, date_created) до и после изменения или None
+    """
+
+    spans = defaultdict(list)
+    for state in (previous, current):
+        if state is not None and state[0] is not None:
+            spans[state[0]].append(get_rollup_span(*state[1:]))
+
+    return {
+        offer_id: (min(first for first, _ in offer_spans), max(last for _, last in offer_spans))
+        for offer_id, offer_spans in spans.items()
+    }
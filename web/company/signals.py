@@ -0,0 +1,83 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from company.models import Reservation, ReservationRollup
+from company.slots import touch_rental_points
+from company.tasks import schedule_rollup_refresh
+from offer.models import Offer
+
+
+ROLLUP_FIELDS = ('offer_id', 'datetime_from', 'datetime_to', 'date_created')
+ROLLUP_STATE_FIELDS = {'offer', 'offer_id', 'status', 'count', 'datetime_from', 'datetime_to'}
+
+
+def get_rollup_state(reservation):
+    return tuple(getattr(reservation, field) for field in ROLLUP_FIELDS)
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def touch_reservation_rental_point(sender, instance, **kwargs):
+    if instance.offer_id is not None:
+        touch_rental_points(offers=instance.offer_id)
+
+
+@receiver(pre_save, sender=Reservation)
+def remember_reservation_rollup_state(sender, instance, update_fields=None, **kwargs):
+    """
+    Запоминает дни брони до изменения: их агрегаты тоже нужно пересчитать
+    """
+
+    instance._rollup_previous = None
+    if instance.pk is None or (update_fields is not None and not ROLLUP_STATE_FIELDS.intersection(update_fields)):
+        return
+
+    instance._rollup_previous = Reservation.objects.filter(pk=instance.pk).values_list(*ROLLUP_FIELDS).first()
+
+
+@receiver(post_save, sender=Reservation)
+def refresh_reservation_rollups(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not ROLLUP_STATE_FIELDS.intersection(update_fields):
+        return
+
+    schedule_rollup_refresh(getattr(instance, '_rollup_previous', None), get_rollup_state(instance))
+
+
+@receiver(post_delete, sender=Reservation)
+def refresh_deleted_reservation_rollups(sender, instance, **kwargs):
+    schedule_rollup_refresh(get_rollup_state(instance), None)
+
+
+@receiver(pre_save, sender=Offer)
+def remember_offer_rental_point(sender, instance, update_fields=None, **kwargs):
+    """
+    Запоминает точку выдачи предложения до изменения: при переносе слоты старой точки тоже нужно пересчитать
+    """
+
+    instance._previous_rental_point_id = None
+    if instance.pk is None or (update_fields is not None and not {'rental_point', 'rental_point_id'}.intersection(
+            update_fields)):
+        return
+
+    instance._previous_rental_point_id = Offer.objects.filter(pk=instance.pk).values_list(
+        'rental_point_id', flat=True).first()
+
+
+@receiver(post_save, sender=Offer)
+@receiver(post_delete, sender=Offer)
+def touch_offer_rental_point(sender, instance, **kwargs):
+    previous_rental_point_id = getattr(instance, '_previous_rental_point_id', None)
+    touch_rental_points(pk__in={instance.rental_point_id, previous_rental_point_id} - {None})
+
+
+@receiver(post_save, sender=Offer)
+def move_offer_rollups(sender, instance, created=False, update_fields=None, **kwargs):
+    """
+    Агрегаты предложения, перенесенного в другую точку выдачи, переходят вместе с ним
+    """
+
+    if created or (update_fields is not None and not {'rental_point', 'rental_point_id'}.intersection(update_fields)):
+        return
+
+    ReservationRollup.objects.filter(offer_id=instance.pk).exclude(rental_point_id=instance.rental_point_id).update(
+        rental_point_id=instance.rental_point_id)
@@ -0,0 +1,179 @@
+"""
+Клиент внешнего сервиса слотов.
+
+Один процесс держит одну HTTP-сессию с пулом соединений, все запросы ограничены таймаутами подключения и чтения,
+временные ошибки повторяются с экспоненциальной задержкой, одинаковые запросы на короткое время кэшируются,
+а при серии отказов (ошибки соединения, таймауты, ответы 5xx) автоматический выключатель (circuit breaker)
+перестает обращаться к сервису до истечения паузы. Ответы 4xx отказом не считаются и отдаются клиенту как 400.
+"""
+import hashlib
+import json
+import threading
+import time
+from functools import lru_cache
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class SlotServiceError(Exception):
+    """
+    Сервис слотов недоступен или вернул ошибку
+    """
+
+
+class SlotServiceBadRequest(SlotServiceError):
+    """
+    Сервис отклонил запрос (ответ 4xx): ошибка в данных запроса, а не отказ сервиса
+    """
+
+    def __init__(self, status_code, detail):
+        super().__init__(f'Сервис слотов отклонил запрос ({status_code}).')
+        self.status_code = status_code
+        self.detail = detail
+
+
+class CircuitBreakerOpen(SlotServiceError):
+    """
+    Выключатель разомкнут: обращения к сервису временно не выполняются
+    """
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель: после `failure_threshold` отказов подряд размыкается на `reset_timeout` секунд,
+    затем пропускает один пробный запрос и по его результату замыкается или снова размыкается
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class SlotServiceClient:
+    """
+    Клиент сервиса слотов с пулом соединений, таймаутами, повторами, кэшем и выключателем
+    """
+
+    cache_prefix = 'slot_service'
+
+    def __init__(self, base_url, connect_timeout=1.0, read_timeout=5.0, retries=2, backoff_factor=0.2,
+                 pool_size=10, cache_ttl=30, failure_threshold=5, reset_timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.cache_ttl = cache_ttl
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        # Расчет слотов не меняет состояние сервиса, поэтому повторять можно и POST
+        retry = Retry(
+            total=retries, connect=retries, read=retries, status=retries, backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504), allowed_methods=frozenset(('GET', 'POST')), raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_slots(self, rental_point_id, date):
+        return self.request('GET', f'/api/slots/{rental_point_id}/{date.isoformat()}')
+
+    def resolve_slots(self, payload):
+        return self.request('POST', '/resolveSlots', payload)
+
+    def get_cache_key(self, method, path, payload):
+        body = json.dumps(payload, sort_keys=True, default=str)
+        digest = hashlib.sha1(f'{method} {path} {body}'.encode()).hexdigest()
+
+        return f'{self.cache_prefix}:{digest}'
+
+    def request(self, method, path, payload=None):
+        cache_key = self.get_cache_key(method, path, payload)
+        if self.cache_ttl:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if not self.breaker.allow():
+            raise CircuitBreakerOpen('Сервис слотов временно недоступен.')
+
+        # Выключатель считает только отказы сервиса: ошибки соединения, таймауты, ответы 5xx и неверный JSON.
+        # Ответ 4xx вызван данными запроса, иначе несколько неверных запросов отключили бы сервис для всех
+        try:
+            response = self.session.request(method, f'{self.base_url}{path}', json=payload, timeout=self.timeout)
+            if 400 <= response.status_code < 500:
+                self.breaker.record_success()
+                raise SlotServiceBadRequest(response.status_code, self.get_error_detail(response))
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as error:
+            self.breaker.record_failure()
+            raise SlotServiceError(f'Ошибка сервиса слотов: {error}') from error
+
+        self.breaker.record_success()
+        if self.cache_ttl:
+            cache.set(cache_key, data, self.cache_ttl)
+
+        return data
+
+    @staticmethod
+    def get_error_detail(response):
+        try:
+            return response.json()
+        except ValueError:
+            return response.text[:1000]
+
+
+@lru_cache(maxsize=None)
+def get_slot_service_client():
+    """
+    Клиент сервиса слотов процесса (одна сессия и один выключатель на процесс)
+    """
+
+    options = settings.SLOT_SERVICE
+
+    return SlotServiceClient(
+        settings.HOST_OFFER,
+        connect_timeout=options['CONNECT_TIMEOUT'],
+        read_timeout=options['READ_TIMEOUT'],
+        retries=options['RETRIES'],
+        backoff_factor=options['BACKOFF_FACTOR'],
+        pool_size=options['POOL_SIZE'],
+        cache_ttl=options['CACHE_TTL'],
+        failure_threshold=options['FAILURE_THRESHOLD'],
+        reset_timeout=options['RESET_TIMEOUT'],
+    )
@@ -0,0 +1,118 @@
+"""
+Локальная заглушка сервиса слотов для разработки и бенчмарков без внешней сети.
+
+Отвечает на GET /api/slots/<пункт проката>/<дата> и POST /resolveSlots, умеет добавлять задержку
+и отвечать 503 с заданной вероятностью, чтобы проверять таймауты, повторы и выключатель клиента.
+"""
+import json
+import random
+import re
+import threading
+import time
+from datetime import date, datetime, time as datetime_time, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+SLOTS_PATH = re.compile(r'^/api/slots/(?P<rental_point>\d+)/(?P<date>\d{4}-\d{2}-\d{2})/?$')
+
+
+def build_slots(rental_point_id, day, slot_minutes=60, opening=9, closing=21):
+    """
+    Детерминированное расписание слотов пункта проката на день
+    """
+
+    start = datetime.combine(day, datetime_time(opening))
+    slots = []
+    for index in range((closing - opening) * 60 // slot_minutes):
+        slot_start = start + timedelta(minutes=index * slot_minutes)
+        slots.append({
+            'datetime_from': slot_start.isoformat(),
+            'datetime_to': (slot_start + timedelta(minutes=slot_minutes)).isoformat(),
+            'free': (rental_point_id + index) % 5,
+        })
+
+    return {'rental_point': rental_point_id, 'date': day.isoformat(), 'slots': slots}
+
+
+class SlotStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if not self.simulate():
+            return
+
+        match = SLOTS_PATH.match(self.path)
+        if match is None:
+            return self.send_json(404, {'detail': 'Не найдено.'})
+
+        try:
+            day = date.fromisoformat(match['date'])
+        except ValueError:
+            return self.send_json(400, {'detail': 'Неверная дата.'})
+
+        self.send_json(200, build_slots(int(match['rental_point']), day))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        if not self.simulate():
+            return
+
+        if self.path.rstrip('/') != '/resolveSlots':
+            return self.send_json(404, {'detail': 'Не найдено.'})
+
+        try:
+            payload = json.loads(body or b'null')
+        except ValueError:
+            return self.send_json(400, {'detail': 'Неверный JSON.'})
+
+        self.send_json(200, {'resolved': payload})
+
+    def simulate(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.server.failure_rate and random.random() < self.server.failure_rate:
+            self.send_json(503, {'detail': 'Сервис недоступен.'})
+            return False
+
+        return True
+
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class SlotStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, failure_rate=0.0, verbose=False):
+        super().__init__(address, SlotStubHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.verbose = verbose
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+def start_stub_server(host='127.0.0.1', port=0, **options):
+    """
+    Запускает заглушку в фоновом потоке, port=0 - любой свободный порт. Остановка: server.shutdown()
+    """
+
+    server = SlotStubServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
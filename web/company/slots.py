@@ -0,0 +1,301 @@
+"""
+Расчет свободных слотов пунктов проката по графику работы.
+
+График (`RentalPoint.schedule`) компилируется в компактное представление: для каждого дня недели кортеж смещений
+начала слотов в минутах от полуночи, плюс исключения на конкретные даты. Компиляция выполняется один раз
+на каждую версию графика. Формат графика:
+
+    {
+        "slot": 60,
+        "days": {"mon": [["09:00", "13:00"], ["14:00", "20:00"]], "sat": ["10:00-16:00"], "sun": []},
+        "exceptions": {"2021-12-31": [{"from": "10:00", "to": "15:00"}], "2022-01-01": []}
+    }
+
+`slot` - длительность слота в минутах (по умолчанию 60). Дни недели задаются ключами mon..sun, monday..sunday,
+пн..вс или 0..6 (0 - понедельник), ключ "days" можно опустить и перечислить дни на верхнем уровне.
+Конец интервала не позже начала означает работу после полуночи.
+
+Свободные единицы в слоте - сумма по активным предложениям пункта полного запаса за вычетом пиковой загрузки
+принятыми бронированиями внутри слота. Результат для пункта кэшируется по ключу из хеша графика
+и `RentalPoint.reservations_version`, которая увеличивается при изменении бронирований и предложений пункта.
+"""
+import hashlib
+import json
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from company.availability import accepted_total, overlapping
+
+
+SLOTS_CACHE_PREFIX = 'rental_point_slots'
+SLOTS_CACHE_TIMEOUT = 60 * 60
+DEFAULT_SLOT_MINUTES = 60
+MINUTES_PER_DAY = 24 * 60
+
+WEEKDAY_KEYS = (
+    ('mon', 'monday', 'пн', 'понедельник', '0'),
+    ('tue', 'tuesday', 'вт', 'вторник', '1'),
+    ('wed', 'wednesday', 'ср', 'среда', '2'),
+    ('thu', 'thursday', 'чт', 'четверг', '3'),
+    ('fri', 'friday', 'пт', 'пятница', '4'),
+    ('sat', 'saturday', 'сб', 'суббота', '5'),
+    ('sun', 'sunday', 'вс', 'воскресенье', '6'),
+)
+WEEKDAYS = {key: weekday for weekday, keys in enumerate(WEEKDAY_KEYS) for key in keys}
+
+
+class ScheduleError(ValueError):
+    """
+    График работы не соответствует формату
+    """
+
+
+class CompiledSchedule:
+    """
+    Скомпилированный график: смещения начала слотов в минутах по дням недели и исключениям
+    """
+
+    __slots__ = ('slot', 'weekly', 'exceptions')
+
+    def __init__(self, slot, weekly, exceptions):
+        self.slot = slot
+        self.weekly = weekly
+        self.exceptions = exceptions
+
+    def slots(self, date_from, date_to):
+        """
+        Слоты (начало, конец) с date_from по date_to включительно в текущем часовом поясе
+        """
+
+        tz = timezone.get_current_timezone()
+        length = timedelta(minutes=self.slot)
+        result = []
+
+        day = date_from
+        while day <= date_to:
+            offsets = self.exceptions.get(day)
+            if offsets is None:
+                offsets = self.weekly[day.weekday()]
+
+            if offsets:
+                midnight = timezone.make_aware(datetime.combine(day, time.min), tz)
+                for offset in offsets:
+                    start = midnight + timedelta(minutes=offset)
+                    # Ночной интервал предыдущего дня может перекрыть утро следующего: перекрытые слоты пропускаются
+                    if not result or start >= result[-1][1]:
+                        result.append((start, start + length))
+
+            day += timedelta(days=1)
+
+        return result
+
+
+def parse_minutes(value):
+    try:
+        hours, minutes = str(value).strip().split(':')
+        hours, minutes = int(hours), int(minutes)
+    except ValueError:
+        raise ScheduleError(f'Неверное время {value!r}, ожидается ЧЧ:ММ.')
+
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > MINUTES_PER_DAY:
+        raise ScheduleError(f'Неверное время {value!r}.')
+
+    return hours * 60 + minutes
+
+
+def parse_interval(value):
+    if isinstance(value, str):
+        value = value.split('-')
+    elif isinstance(value, dict):
+        value = (value.get('from'), value.get('to'))
+
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise ScheduleError(f'Неверный интервал {value!r}, ожидается ["ЧЧ:ММ", "ЧЧ:ММ"].')
+
+    start, end = parse_minutes(value[0]), parse_minutes(value[1])
+    if end <= start:
+        end += MINUTES_PER_DAY
+
+    return start, end
+
+
+def compile_offsets(intervals, slot):
+    if intervals is None:
+        return ()
+
+    if not isinstance(intervals, (list, tuple)):
+        raise ScheduleError('Интервалы работы задаются списком.')
+
+    merged = []
+    for start, end in sorted(parse_interval(interval) for interval in intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    return tuple(offset for start, end in merged for offset in range(start, end - slot + 1, slot))
+
+
+@lru_cache(maxsize=1024)
+def compile_schedule_document(document):
+    schedule = json.loads(document) or {}
+    if not isinstance(schedule, dict):
+        raise ScheduleError('График задается объектом.')
+
+    slot = schedule.get('slot', DEFAULT_SLOT_MINUTES)
+    if not isinstance(slot, int) or not 0 < slot <= MINUTES_PER_DAY:
+        raise ScheduleError('Длительность слота задается целым числом минут от 1 до 1440.')
+
+    days = schedule.get('days', schedule)
+    if not isinstance(days, dict):
+        raise ScheduleError('Дни недели задаются объектом.')
+
+    weekly = [()] * 7
+    for key, intervals in days.items():
+        weekday = WEEKDAYS.get(str(key).lower())
+        if weekday is not None:
+            weekly[weekday] = compile_offsets(intervals, slot)
+
+    exception_days = schedule.get('exceptions') or {}
+    if not isinstance(exception_days, dict):
+        raise ScheduleError('Исключения задаются объектом.')
+
+    exceptions = {}
+    for key, intervals in exception_days.items():
+        try:
+            day = datetime.strptime(key, '%Y-%m-%d').date()
+        except ValueError:
+            raise ScheduleError(f'Неверная дата исключения {key!r}, ожидается ГГГГ-ММ-ДД.')
+        exceptions[day] = compile_offsets(intervals, slot)
+
+    return CompiledSchedule(slot, tuple(weekly), exceptions)
+
+
+def get_schedule_document(schedule):
+    return json.dumps(schedule, sort_keys=True, ensure_ascii=False)
+
+
+def compile_schedule(schedule):
+    """
+    Компилирует график. Результат кэшируется в процессе по содержимому графика
+    """
+
+    return compile_schedule_document(get_schedule_document(schedule))
+
+
+def get_schedule_version(schedule):
+    return hashlib.sha1(get_schedule_document(schedule).encode()).hexdigest()[:16]
+
+
+def slot_loads(slots, events):
+    """
+    Пиковая загрузка в каждом слоте. `slots` упорядочены и не пересекаются, `events` - отсортированные пары
+    (время, изменение загрузки), при совпадении времени освобождение идет раньше занятия
+    """
+
+    loads = []
+    index, load = 0, 0
+    for start, end in slots:
+        while index < len(events) and events[index][0] <= start:
+            load += events[index][1]
+            index += 1
+
+        peak = load
+        while index < len(events) and events[index][0] < end:
+            load += events[index][1]
+            index += 1
+            peak = max(peak, load)
+
+        loads.append(peak)
+
+    return loads
+
+
+def get_cache_key(rental_point, date_from, date_to, offer_id=None):
+    return (
+        f'{SLOTS_CACHE_PREFIX}:{rental_point.id}:{get_schedule_version(rental_point.schedule)}:'
+        f'{rental_point.reservations_version}:{date_from.isoformat()}:{date_to.isoformat()}:{offer_id or ""}'
+    )
+
+
+def compute_slots(rental_points, date_from, date_to, offer_id=None):
+    """
+    Свободные слоты без кэша: {rental_point_id: [(начало, конец, свободно), ...]}. Три запроса на любой набор пунктов
+    """
+
+    Offer = apps.get_model('offer', 'Offer')
+    Reservation = apps.get_model('company', 'Reservation')
+
+    tz = timezone.get_current_timezone()
+    range_start = timezone.make_aware(datetime.combine(date_from, time.min), tz)
+    range_end = timezone.make_aware(datetime.combine(date_to + timedelta(days=2), time.min), tz)
+
+    offers = Offer.objects.filter(rental_point__in=[rental_point.id for rental_point in rental_points], is_active=True)
+    if offer_id is not None:
+        offers = offers.filter(id=offer_id)
+
+    capacities = defaultdict(dict)
+    for offer, rental_point_id, capacity in offers.annotate(
+            capacity=F('count') + accepted_total()).values_list('id', 'rental_point_id', 'capacity'):
+        capacities[rental_point_id][offer] = capacity
+
+    events = defaultdict(list)
+    reservations = overlapping(Reservation.objects.filter(offer__in=offers.values('id')), range_start, range_end)
+    for offer, start, end, count in reservations.values_list('offer_id', 'datetime_from', 'datetime_to', 'count'):
+        events[offer].append((max(start, range_start) if start else range_start, count))
+        events[offer].append((min(end, range_end) if end else range_end, -count))
+
+    result = {}
+    for rental_point in rental_points:
+        try:
+            slots = compile_schedule(rental_point.schedule).slots(date_from, date_to)
+        except ScheduleError:
+            slots = []
+
+        point_capacities = capacities.get(rental_point.id, {})
+        free = [sum(capacity for offer, capacity in point_capacities.items() if offer not in events)] * len(slots)
+        for offer, capacity in point_capacities.items():
+            if offer in events:
+                loads = slot_loads(slots, sorted(events[offer]))
+                free = [total + max(capacity - load, 0) for total, load in zip(free, loads)]
+
+        result[rental_point.id] = [(start, end, count) for (start, end), count in zip(slots, free) if count > 0]
+
+    return result
+
+
+def get_free_slots(rental_points, date_from, date_to, offer_id=None):
+    """
+    Свободные слоты пунктов проката за период с учетом кэша: {rental_point_id: [(начало, конец, свободно), ...]}.
+    Пересчитываются только пункты, для текущих версий графика и бронирований которых нет записи в кэше
+    """
+
+    keys = {
+        rental_point.id: get_cache_key(rental_point, date_from, date_to, offer_id) for rental_point in rental_points
+    }
+    cached = cache.get_many(keys.values())
+
+    result = {rental_point_id: cached[key] for rental_point_id, key in keys.items() if key in cached}
+    missing = [rental_point for rental_point in rental_points if rental_point.id not in result]
+    if missing:
+        computed = compute_slots(missing, date_from, date_to, offer_id)
+        cache.set_many({keys[rental_point_id]: slots for rental_point_id, slots in computed.items()},
+                       SLOTS_CACHE_TIMEOUT)
+        result.update(computed)
+
+    return result
+
+
+def touch_rental_points(**lookup):
+    """
+    Увеличивает версию бронирований пунктов проката, сбрасывая кэш их слотов
+    """
+
+    RentalPoint = apps.get_model('company', 'RentalPoint')
+    RentalPoint.objects.filter(**lookup).update(reservations_version=F('reservations_version') + 1)
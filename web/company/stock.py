@@ -0,0 +1,39 @@
+"""
+Атомарное списание и возврат остатка предложения (`Offer.count`).
+
+Списание выполняется условным UPDATE ... SET count = count - n WHERE count >= n: проверка и изменение происходят
+в одном операторе под блокировкой строки, поэтому параллельные подтверждения не могут продать больше остатка,
+а остальные колонки предложения не перезаписываются. UPDATE не вызывает сигналов, поэтому поколение предложений
+для кэша ответов увеличивается явно.
+"""
+from django.apps import apps
+from django.db.models import F
+from django.db.models.functions import Now
+
+from core.cache import bump_generations
+
+
+def take_offer_units(offer_id, count):
+    """
+    Списывает `count` единиц, если они есть в наличии. Возвращает True при успехе
+    """
+
+    Offer = apps.get_model('offer', 'Offer')
+
+    taken = Offer.objects.filter(id=offer_id, count__gte=count).update(
+        count=F('count') - count, updated_at=Now()) == 1
+    if taken:
+        bump_generations(Offer)
+
+    return taken
+
+
+def return_offer_units(offer_id, count):
+    """
+    Возвращает `count` единиц в остаток
+    """
+
+    Offer = apps.get_model('offer', 'Offer')
+
+    Offer.objects.filter(id=offer_id).update(count=F('count') + count, updated_at=Now())
+    bump_generations(Offer)
@@ -0,0 +1,22 @@
+from datetime import date
+
+from company.rollups import get_changed_spans, refresh_rollups
+from core.tasks import task
+
+
+@task(name='company.refresh_reservation_rollups', queue='analytics', max_attempts=5, retry_delay=10)
+def refresh_reservation_rollups(offer_id, first_day, last_day):
+    """
+    Пересчитывает дневные агрегаты бронирований предложения за дни [first_day, last_day]
+    """
+
+    refresh_rollups(offer_id, date.fromisoformat(first_day), date.fromisoformat(last_day))
+
+
+def schedule_rollup_refresh(previous, current):
+    """
+    Ставит в очередь пересчет дней, которые бронь занимала до и после изменения, в текущей транзакции
+    """
+
+    for offer_id, (first_day, last_day) in get_changed_spans(previous, current).items():
+        refresh_reservation_rollups.delay(offer_id, first_day.isoformat(), last_day.isoformat())
@@ -1,3 +1,255 @@
+from datetime import date, datetime, timedelta
+from urllib.parse import parse_qs, urlparse
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.core.pagination import KeysetPagination
+from company.availability import filter_available, get_free_count, get_free_counts, peak_load
+from company.models import Company, RentalPoint, Reservation, ReservationRollup
+from company.rollups import aggregate_reservations, get_changed_spans, get_rollup_span, refresh_rollups, split_by_days
+from company.slots import ScheduleError, compile_schedule, compute_slots, get_free_slots
+from company.stock import return_offer_units, take_offer_units
+from core.collections import ReservationStatuses, TimeUnits
+from offer.models import Offer, Price
+from product.models import Product
+
+
+def moment(day, hour=0):
+    return timezone.make_aware(datetime(2021, 5, day, hour))
+
+
+def create_offer(count=5, company=None):
+    company = company or Company.objects.create(name='Прокат')
+    rental_point = RentalPoint.objects.create(company=company, phone='+70000000000')
+    return Offer.objects.create(
+        rental_point=rental_point, product=Product.objects.create(name='Велосипед'), count=count)
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Постраничная навигация по ключу: страницы без пропусков и повторов при одинаковых значениях сортировки
+    """
+
+    factory = APIRequestFactory()
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('b', 'a', 'b', 'c', 'a', 'b', 'c'):
+            Company.objects.create(name=name)
+
+    def paginate(self, params, ordering=('name', 'id')):
+        paginator = KeysetPagination()
+        view = type('View', (), {'keyset_ordering': ordering})()
+        request = Request(self.factory.get('/companies/', params))
+        page = paginator.paginate_queryset(Company.objects.all(), request, view)
+        return [company.id for company in page], paginator.get_next_link(), paginator.get_previous_link()
+
+    @staticmethod
+    def get_cursor(link):
+        return parse_qs(urlparse(link).query)['cursor'][0]
+
+    def test_pages_follow_ordering_with_duplicate_values(self):
+        expected = list(Company.objects.order_by('name', 'id').values_list('id', flat=True))
+
+        ids, next_link, previous_link = self.paginate({'page_size': 3})
+        self.assertIsNone(previous_link)
+        pages = [ids]
+        while next_link:
+            ids, next_link, previous_link = self.paginate({'page_size': 3, 'cursor': self.get_cursor(next_link)})
+            self.assertIsNotNone(previous_link)
+            pages.append(ids)
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_previous_link_returns_preceding_page(self):
+        first, next_link, _ = self.paginate({'page_size': 3})
+        second, next_link, _ = self.paginate({'page_size': 3, 'cursor': self.get_cursor(next_link)})
+        _, _, previous_link = self.paginate({'page_size': 3, 'cursor': self.get_cursor(next_link)})
+
+        ids, _, _ = self.paginate({'page_size': 3, 'cursor': self.get_cursor(previous_link)})
+        self.assertEqual(ids, second)
+
+        _, _, previous_link = self.paginate({'page_size': 3, 'cursor': self.get_cursor(previous_link)})
+        ids, _, _ = self.paginate({'page_size': 3, 'cursor': self.get_cursor(previous_link)})
+        self.assertEqual(ids, first)
+
+    def test_descending_default_ordering(self):
+        ids, next_link, _ = self.paginate({'page_size': 4}, ordering=('-id',))
+        rest, next_link, _ = self.paginate({'page_size': 4, 'cursor': self.get_cursor(next_link)}, ordering=('-id',))
+
+        self.assertEqual(ids + rest, list(Company.objects.order_by('-id').values_list('id', flat=True)))
+        self.assertIsNone(next_link)
+
+
+class AvailabilityTests(TestCase):
+    """
+    Свободные единицы предложения в окне: запас минус пиковая загрузка принятыми бронированиями
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.offer = create_offer(count=5)
+        for count, start, end, status in (
+                (2, 10, 12, ReservationStatuses.ACCEPTED),
+                (1, 11, 13, ReservationStatuses.ACCEPTED),
+                (3, 10, 13, ReservationStatuses.NEW)):
+            Reservation.objects.create(
+                offer=cls.offer, count=count, datetime_from=moment(22, start), datetime_to=moment(22, end),
+                status=status)
+
+    def test_peak_load_treats_intervals_as_half_open(self):
+        intervals = [(moment(22, 10), moment(22, 12), 2), (moment(22, 12), moment(22, 14), 3)]
+
+        self.assertEqual(peak_load(intervals, moment(22, 9), moment(22, 15)), 3)
+        self.assertEqual(peak_load(intervals, moment(22, 14), moment(22, 15)), 0)
+        self.assertEqual(peak_load([(None, moment(22, 11), 4)], moment(22, 9), moment(22, 10)), 4)
+
+    def test_free_count_subtracts_peak_of_accepted_reservations(self):
+        # Полный запас: остаток 5 плюс 3 единицы в принятых бронированиях, новые бронирования не учитываются
+        self.assertEqual(get_free_count(self.offer.id, moment(22, 10), moment(22, 13)), 5)
+        self.assertEqual(get_free_count(self.offer.id, moment(22, 12), moment(22, 14)), 7)
+        self.assertEqual(get_free_count(self.offer.id, moment(22, 13), moment(22, 14)), 8)
+        self.assertEqual(get_free_counts((self.offer.id, 0), moment(22, 9), moment(22, 10)), {self.offer.id: 8})
+
+    def test_filter_available_by_count(self):
+        offers = Offer.objects.filter(id=self.offer.id)
+
+        self.assertTrue(filter_available(offers, moment(22, 10), moment(22, 13), count=5).exists())
+        self.assertFalse(filter_available(offers, moment(22, 10), moment(22, 13), count=6).exists())
+        self.assertTrue(filter_available(offers, moment(22, 13), moment(22, 14), count=8).exists())
+
+
+class ScheduleTests(TestCase):
+    """
+    Компиляция графика работы и свободные слоты точки выдачи
+    """
+
+    def test_exceptions_override_weekdays(self):
+        schedule = compile_schedule({
+            'slot': 60,
+            'days': {'sat': [['10:00', '12:00']]},
+            'exceptions': {'2021-05-22': [['15:00', '16:00']], '2021-05-29': []},
+        })
+
+        self.assertEqual(schedule.slots(date(2021, 5, 22), date(2021, 5, 22)), [(moment(22, 15), moment(22, 16))])
+        self.assertEqual(schedule.slots(date(2021, 5, 29), date(2021, 5, 29)), [])
+        self.assertEqual(len(schedule.slots(date(2021, 5, 15), date(2021, 5, 15))), 2)
+
+    def test_invalid_exceptions(self):
+        for exceptions in (['2021-01-01'], 'x', {'01.01.2021': []}, {'2021-01-01': 'x'}):
+            with self.subTest(exceptions=exceptions), self.assertRaises(ScheduleError):
+                compile_schedule({'days': {}, 'exceptions': exceptions})
+
+    def test_invalid_stored_schedule_has_no_slots(self):
+        offer = create_offer()
+        RentalPoint.objects.filter(id=offer.rental_point_id).update(schedule={'exceptions': ['2021-01-01']})
+        rental_point = RentalPoint.objects.get(id=offer.rental_point_id)
+
+        self.assertEqual(compute_slots([rental_point], date(2021, 5, 22), date(2021, 5, 22)), {rental_point.id: []})
+
+
+    def test_moved_offer_leaves_cached_slots_of_previous_point(self):
+        cache.clear()
+        offer = create_offer(count=3)
+        schedule = {'slot': 60, 'days': {'sat': [['10:00', '11:00']]}}
+        RentalPoint.objects.filter(id=offer.rental_point_id).update(schedule=schedule)
+        previous = RentalPoint.objects.get(id=offer.rental_point_id)
+        day = date(2021, 5, 22)
+        self.assertEqual(get_free_slots([previous], day, day), {previous.id: [(moment(22, 10), moment(22, 11), 3)]})
+
+        offer.rental_point = RentalPoint.objects.create(company=previous.company)
+        offer.save()
+
+        previous.refresh_from_db()
+        self.assertEqual(get_free_slots([previous], day, day), {previous.id: []})
+
+
+class StockTests(TestCase):
+    """
+    Атомарное списание и возврат остатка предложения
+    """
+
+    def test_take_and_return_units(self):
+        offer = create_offer(count=5)
+
+        self.assertTrue(take_offer_units(offer.id, 3))
+        self.assertFalse(take_offer_units(offer.id, 3))
+        offer.refresh_from_db()
+        self.assertEqual(offer.count, 2)
+
+        return_offer_units(offer.id, 3)
+        offer.refresh_from_db()
+        self.assertEqual(offer.count, 5)
+        self.assertTrue(take_offer_units(offer.id, 5))
+        self.assertFalse(take_offer_units(offer.id, 1))
+
+
+class RollupTests(TestCase):
+    """
+    Дневные агрегаты бронирований: дни брони, доли выручки и пересчет
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.offer = create_offer()
+        Price.objects.create(
+            offer=self.offer, time_from=0, time_from_unit=TimeUnits.HOUR, price_per_time=100,
+            price_per_time_unit=TimeUnits.HOUR)
+
+    def test_rollup_span(self):
+        self.assertEqual(get_rollup_span(moment(22, 22), moment(24), None), (date(2021, 5, 22), date(2021, 5, 23)))
+        self.assertEqual(get_rollup_span(moment(22, 10), moment(22, 12), None), (date(2021, 5, 22),) * 2)
+        # Бронь без периода или с пустым периодом учитывается в дне создания
+        self.assertEqual(get_rollup_span(None, moment(25), moment(20, 15)), (date(2021, 5, 20),) * 2)
+        self.assertEqual(get_rollup_span(moment(25), moment(25), moment(20, 15)), (date(2021, 5, 20),) * 2)
+
+    def test_split_by_days(self):
+        self.assertEqual(list(split_by_days(moment(22, 22), moment(23, 2))), [
+            (date(2021, 5, 22), 0.5), (date(2021, 5, 23), 0.5)])
+        self.assertEqual(list(split_by_days(moment(22, 12), moment(24))), [
+            (date(2021, 5, 22), 1 / 3), (date(2021, 5, 23), 2 / 3)])
+
+    def test_aggregate_reservations(self):
+        rental_point_id = self.offer.rental_point_id
+        rows = [
+            (self.offer.id, rental_point_id, ReservationStatuses.ACCEPTED, 2, moment(22, 22), moment(23, 2), None),
+            (self.offer.id, rental_point_id, ReservationStatuses.NEW, 1, moment(23, 10), moment(23, 11), None),
+            (self.offer.id, rental_point_id, ReservationStatuses.CANCELED, 1, None, None, moment(21, 9)),
+        ]
+
+        totals = aggregate_reservations((self.offer.id,), rows, date(2021, 5, 22), date(2021, 5, 23))
+
+        self.assertEqual(totals, {
+            (self.offer.id, date(2021, 5, 22)): [rental_point_id, 2, 1, 400.0],
+            (self.offer.id, date(2021, 5, 23)): [rental_point_id, 3, 1, 400.0],
+        })
+
+    def test_changed_spans_cover_previous_and_current_days(self):
+        previous = (self.offer.id, moment(22, 10), moment(22, 12), None)
+        current = (self.offer.id, moment(25, 10), moment(26, 12), None)
+
+        self.assertEqual(get_changed_spans(previous, current), {self.offer.id: (date(2021, 5, 22), date(2021, 5, 26))})
+        self.assertEqual(get_changed_spans(None, (None, None, None, None)), {})
+
+    def test_refresh_rollups_replaces_days(self):
+        reservation = Reservation.objects.create(
+            offer=self.offer, count=1, datetime_from=moment(22, 10), datetime_to=moment(22, 13),
+            status=ReservationStatuses.ACCEPTED)
+        refresh_rollups(self.offer.id, date(2021, 5, 22), date(2021, 5, 22))
+
+        rollup = ReservationRollup.objects.get(offer=self.offer)
+        self.assertEqual((rollup.date, rollup.reserved_units, rollup.accepted_count, rollup.revenue),
+                         (date(2021, 5, 22), 1, 1, 300.0))
+
+        reservation.datetime_from += timedelta(days=1)
+        reservation.datetime_to += timedelta(days=1)
+        reservation.save()
+        refresh_rollups(self.offer.id, date(2021, 5, 22), date(2021, 5, 23))
 
-# Create your tests here.
+        self.assertEqual(list(ReservationRollup.objects.filter(offer=self.offer).values_list('date', flat=True)),
+                         [date(2021, 5, 23)])
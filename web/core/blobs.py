@@ -0,0 +1,84 @@
+"""
+Хранение файлов по содержимому.
+
+Файл сохраняется под именем из SHA-256 его содержимого: `images/ab/cd/abcd…ef.jpg`. Одинаковое содержимое
+хранится один раз, а файл по имени никогда не меняется, поэтому его URL можно кэшировать без ограничения срока.
+Хеш считается потоково блоками фиксированного размера, файл целиком в память не читается.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+
+BLOB_BLOCK_SIZE = 64 * 1024
+BLOB_PREFIX = 'images'
+BLOB_NAME = re.compile(rf'^{BLOB_PREFIX}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/(?P<checksum>[0-9a-f]{{64}})(__\w+)?\.\w+$')
+
+# Заголовок для неизменяемых файлов: год и признак immutable
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def hash_file(file):
+    """
+    SHA-256 содержимого файла. Позиция файла возвращается в начало
+    """
+
+    digest = hashlib.sha256()
+    file.seek(0)
+    for block in iter(lambda: file.read(BLOB_BLOCK_SIZE), b''):
+        digest.update(block)
+    file.seek(0)
+
+    return digest.hexdigest()
+
+
+def get_blob_name(checksum, name):
+    """
+    Имя файла в хранилище по хешу содержимого. Из исходного имени берется только расширение
+    """
+
+    extension = os.path.splitext(name)[1].lower()
+    return f'{BLOB_PREFIX}/{checksum[:2]}/{checksum[2:4]}/{checksum}{extension}'
+
+
+def is_blob_name(name):
+    """
+    Имя принадлежит файлу по содержимому или производному от него файлу (`<хеш>__<вариант>.<расширение>`)
+    """
+
+    return BLOB_NAME.match(name.replace(os.sep, '/')) is not None
+
+
+def store_blob(file, checksum, name, storage=default_storage):
+    """
+    Сохраняет файл под именем по хешу, если файла с таким содержимым еще нет, и возвращает это имя
+    """
+
+    blob_name = get_blob_name(checksum, name)
+    if storage.exists(blob_name):
+        return blob_name
+
+    saved_name = storage.save(blob_name, File(file))
+    # Тот же файл параллельно сохранил другой процесс: хранилище дало копии новое имя
+    if saved_name != blob_name:
+        storage.delete(saved_name)
+
+    return blob_name
+
+
+def walk_files(directory, storage=default_storage):
+    """
+    Имена всех файлов каталога хранилища, включая вложенные каталоги
+    """
+
+    if not storage.exists(directory):
+        return
+
+    directories, files = storage.listdir(directory)
+    for file_name in files:
+        yield f'{directory}/{file_name}'
+    for directory_name in directories:
+        yield from walk_files(f'{directory}/{directory_name}', storage)
@@ -0,0 +1,113 @@
+"""
+Счетчики поколений моделей для точной инвалидации кэша.
+
+У каждой отслеживаемой модели в базе (`core.CacheGeneration`) хранится номер поколения, который увеличивается
+после фиксации транзакции, изменившей ее строки. Ключ кэшированного значения включает поколения всех моделей,
+от которых оно зависит, поэтому после изменения любой из них старые записи просто перестают находиться
+и вытесняются по времени жизни. Поколения лежат в базе, а не в кэше: кэш в памяти процесса (locmemcache://,
+по умолчанию) у каждого процесса gunicorn свой, и увеличение поколения в одном процессе не видели бы остальные.
+Отсутствующий счетчик инициализируется текущим временем в миллисекундах, а не нулем, чтобы после очистки таблицы
+не совпасть с поколением, под которым уже сохранены записи.
+
+Счетчики попаданий и промахов хранятся в кэше и ведутся только для общего для процессов кэша.
+"""
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import F
+
+from core.models import CacheGeneration
+
+
+STATS_PREFIX = 'response_cache_stats'
+
+_registered_names = set()
+
+
+def get_label(model):
+    return model if isinstance(model, str) else model._meta.label_lower
+
+
+def is_process_local():
+    """
+    Кэш по умолчанию хранится в памяти процесса и не виден другим процессам приложения
+    """
+
+    return isinstance(caches['default'], LocMemCache)
+
+
+def _create_missing(labels):
+    initial = int(time.time() * 1000)
+    CacheGeneration.objects.bulk_create(
+        [CacheGeneration(label=label, generation=initial) for label in labels], ignore_conflicts=True)
+
+
+def get_generations(models):
+    """
+    Текущие поколения моделей в порядке `models`
+    """
+
+    labels = [get_label(model) for model in models]
+    generations = dict(CacheGeneration.objects.filter(label__in=labels).values_list('label', 'generation'))
+
+    missing = [label for label in labels if label not in generations]
+    if missing:
+        _create_missing(missing)
+        generations.update(CacheGeneration.objects.filter(label__in=missing).values_list('label', 'generation'))
+
+    return [generations[label] for label in labels]
+
+
+def _bump(labels):
+    updated = CacheGeneration.objects.filter(label__in=labels).update(generation=F('generation') + 1)
+    if updated < len(labels):
+        _create_missing(labels)
+
+
+def bump_generations(*models):
+    """
+    Увеличивает поколения моделей после фиксации текущей транзакции (или сразу вне транзакции)
+    """
+
+    labels = sorted({get_label(model) for model in models})
+    transaction.on_commit(lambda: _bump(labels))
+
+
+def record_hit(name, hit):
+    if is_process_local():
+        return
+
+    key = f'{STATS_PREFIX}:{name}:{"hits" if hit else "misses"}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+    if name not in _registered_names:
+        stats_key = f'{STATS_PREFIX}:names'
+        cache.set(stats_key, cache.get(stats_key, set()) | {name}, None)
+        _registered_names.add(name)
+
+
+def get_stats():
+    """
+    Счетчики попаданий и промахов по кэшам: {имя: {'hits': n, 'misses': n}}
+    """
+
+    names = sorted(cache.get(f'{STATS_PREFIX}:names', set()))
+    values = cache.get_many([f'{STATS_PREFIX}:{name}:{kind}' for name in names for kind in ('hits', 'misses')])
+
+    return {
+        name: {kind: values.get(f'{STATS_PREFIX}:{name}:{kind}', 0) for kind in ('hits', 'misses')}
+        for name in names
+    }
+
+
+def reset_stats():
+    names = cache.get(f'{STATS_PREFIX}:names', set())
+    cache.delete_many([f'{STATS_PREFIX}:{name}:{kind}' for name in names for kind in ('hits', 'misses')])
+    cache.delete(f'{STATS_PREFIX}:names')
+    _registered_names.clear()
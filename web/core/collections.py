@@ -32,3 +32,67 @@ class ReservationStatuses:
         (DECLINED, 'Отклонена'),
         (DONE, 'Выполнена')
     )
+
+
+class UploadStatuses:
+    """
+    Класс-коллекция статусов загрузки файла по частям
+    """
+
+    PENDING = 'pending'
+    COMPLETED = 'completed'
+
+    CHOICES = (
+        (PENDING, 'Загружается'),
+        (COMPLETED, 'Загружен')
+    )
+
+
+class TaskStatuses:
+    """
+    Класс-коллекция статусов фоновой задачи
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    CHOICES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка')
+    )
+
+
+class ImportStatuses:
+    """
+    Класс-коллекция статусов импорта каталога
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    CHOICES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнен'),
+        (FAILED, 'Ошибка')
+    )
+
+
+class ImportFormats:
+    """
+    Класс-коллекция форматов файла импорта каталога
+    """
+
+    CSV = 'csv'
+    JSONL = 'jsonl'
+
+    CHOICES = (
+        (CSV, 'CSV'),
+        (JSONL, 'JSON Lines')
+    )
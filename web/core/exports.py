@@ -0,0 +1,146 @@
+"""
+Потоковая выгрузка строк queryset в CSV и JSON Lines.
+
+Строки читаются серверным курсором (`.iterator(chunk_size=...)`) кортежами `.values_list()` без объектов моделей
+и сразу кодируются: заголовок CSV отдается до первого запроса к данным, затем по одному куску байт на пачку
+строк. Память не зависит от числа строк, поэтому генератор подходит и для StreamingHttpResponse, и для записи в файл.
+Выгрузки конкретных моделей описываются подклассами Export (см. company.exports).
+"""
+import csv
+import io
+import itertools
+import json
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+EXPORT_CHUNK_SIZE = 2000
+CSV = 'csv'
+JSONL = 'jsonl'
+CONTENT_TYPES = {
+    CSV: 'text/csv; charset=utf-8',
+    JSONL: 'application/x-ndjson; charset=utf-8',
+}
+
+
+def get_period_bounds(date_from=None, date_to=None):
+    """
+    Границы периода по датам включительно как [начало, конец) в текущем часовом поясе. Сравнение колонки
+    с границами, а не по `__date`, использует индекс
+    """
+
+    bounds = {}
+    if date_from is not None:
+        bounds['gte'] = timezone.make_aware(datetime.combine(date_from, time.min))
+    if date_to is not None:
+        bounds['lt'] = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+
+    return bounds
+
+
+def format_value(value):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+    return value
+
+
+class Export:
+    """
+    Описание выгрузки: колонки (имя, путь для `.values_list()`), колонки связанных записей, порядок строк,
+    статусы и колонка даты для фильтров. Фильтры должны попадать в индекс, иначе выгрузка читает всю таблицу
+    """
+
+    columns = ()
+    statuses = ()
+    related_columns = ()
+    ordering = ('id',)
+    date_field = None
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    @property
+    def fieldnames(self):
+        return [*(name for name, _ in self.columns), *self.related_columns]
+
+    def get_status_lookup(self, status):
+        return {}
+
+    def filter(self, status=None, date_from=None, date_to=None):
+        """
+        Выгрузка строк со статусом `status`, измененных или созданных в период дат включительно
+        """
+
+        queryset = self.queryset
+        if status:
+            queryset = queryset.filter(**self.get_status_lookup(status))
+
+        bounds = get_period_bounds(date_from, date_to)
+        if bounds:
+            queryset = queryset.filter(**{f'{self.date_field}__{lookup}': value for lookup, value in bounds.items()})
+
+        return self.__class__(queryset)
+
+    def add_related(self, rows):
+        """
+        Дополняет пачку строк данными связанных записей одним запросом на пачку
+        """
+
+    def iter_chunks(self, chunk_size=EXPORT_CHUNK_SIZE):
+        """
+        Пачки строк-словарей, прочитанные серверным курсором
+        """
+
+        names = [name for name, _ in self.columns]
+        values = self.queryset.order_by(*self.ordering).values_list(*(path for _, path in self.columns))
+        values = values.iterator(chunk_size=chunk_size)
+
+        while True:
+            rows = [
+                {name: format_value(value) for name, value in zip(names, row)}
+                for row in itertools.islice(values, chunk_size)
+            ]
+            if not rows:
+                return
+            self.add_related(rows)
+            yield rows
+
+    def stream(self, format, chunk_size=EXPORT_CHUNK_SIZE):
+        """
+        Выгрузка кусками байт в UTF-8
+        """
+
+        if format == CSV:
+            return self.stream_csv(chunk_size)
+
+        return self.stream_jsonl(chunk_size)
+
+    def stream_csv(self, chunk_size):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        # BOM нужен табличным редакторам для распознавания UTF-8, импорт каталога его пропускает
+        writer.writerow(self.fieldnames)
+        yield ('\ufeff' + buffer.getvalue()).encode()
+
+        for rows in self.iter_chunks(chunk_size):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([self.format_csv_value(value) for value in row.values()] for row in rows)
+            yield buffer.getvalue().encode()
+
+    def stream_jsonl(self, chunk_size):
+        for rows in self.iter_chunks(chunk_size):
+            yield ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows).encode()
+
+    @staticmethod
+    def format_csv_value(value):
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if isinstance(value, (list, dict)):
+            return json.dumps(value, ensure_ascii=False)
+
+        return value
@@ -0,0 +1,140 @@
+"""
+Геохеш и расстояния без PostGIS.
+
+Поиск "рядом" выполняется в три шага: отбор по префиксам геохеша (B-tree индекс), отсечение по ограничивающему
+прямоугольнику и точное расстояние по формуле гаверсинусов.
+"""
+import math
+
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 12
+MAX_COVER_CELLS = 16
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    latitude_range, longitude_range = [-90.0, 90.0], [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    geohash, bits, bit_count, even = [], 0, 0, True
+
+    while len(geohash) < precision:
+        value, value_range = (longitude, longitude_range) if even else (latitude, latitude_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+
+    return ''.join(geohash)
+
+
+def geohash_cell_size(precision):
+    """
+    Размер ячейки геохеша заданной точности в градусах (широта, долгота)
+    """
+
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Прямоугольник (min_lat, max_lat, min_lon, max_lon), гарантированно содержащий круг радиуса `radius_km`
+    """
+
+    latitude_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_latitude = math.cos(math.radians(min(abs(latitude) + latitude_delta, 89.9)))
+    longitude_delta = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_latitude)), 180.0)
+
+    return (
+        max(latitude - latitude_delta, -90.0), min(latitude + latitude_delta, 90.0),
+        max(longitude - longitude_delta, -180.0), min(longitude + longitude_delta, 180.0),
+    )
+
+
+def geohash_cover(box):
+    """
+    Набор префиксов геохеша, ячейки которых покрывают прямоугольник. Точность выбирается максимальной,
+    при которой число ячеек не превышает MAX_COVER_CELLS
+    """
+
+    min_latitude, max_latitude, min_longitude, max_longitude = box
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        latitude_step, longitude_step = geohash_cell_size(precision)
+        rows = math.floor(max_latitude / latitude_step) - math.floor(min_latitude / latitude_step) + 1
+        columns = math.floor(max_longitude / longitude_step) - math.floor(min_longitude / longitude_step) + 1
+        if rows * columns <= MAX_COVER_CELLS:
+            break
+    else:
+        return set()
+
+    cells = set()
+    for row in range(rows):
+        latitude = min(min_latitude + row * latitude_step, max_latitude)
+        for column in range(columns):
+            longitude = min(min_longitude + column * longitude_step, max_longitude)
+            cells.add(encode_geohash(latitude, longitude, precision))
+
+    return cells
+
+
+def haversine_km(latitude, longitude, other_latitude, other_longitude):
+    latitude, longitude, other_latitude, other_longitude = map(
+        math.radians, (float(latitude), float(longitude), float(other_latitude), float(other_longitude)))
+    a = (math.sin((other_latitude - latitude) / 2) ** 2
+         + math.cos(latitude) * math.cos(other_latitude) * math.sin((other_longitude - longitude) / 2) ** 2)
+
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_expression(latitude, longitude, prefix=''):
+    """
+    Выражение ORM: расстояние в километрах от точки до адреса по пути `prefix`
+    """
+
+    address_latitude = Radians(Cast(F(f'{prefix}latitude'), FloatField()))
+    address_longitude = Radians(Cast(F(f'{prefix}longitude'), FloatField()))
+    latitude, longitude = math.radians(latitude), math.radians(longitude)
+
+    a = (
+        Power(Sin((address_latitude - latitude) / 2), 2)
+        + Cos(address_latitude) * math.cos(latitude) * Power(Sin((address_longitude - longitude) / 2), 2)
+    )
+
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a), output_field=FloatField())
+
+
+def nearby_filter(latitude, longitude, radius_km, prefix=''):
+    """
+    Условие предварительного отбора: префиксы геохеша и ограничивающий прямоугольник
+    """
+
+    box = bounding_box(latitude, longitude, radius_km)
+    min_latitude, max_latitude, min_longitude, max_longitude = box
+
+    condition = Q(**{
+        f'{prefix}latitude__gte': min_latitude, f'{prefix}latitude__lte': max_latitude,
+        f'{prefix}longitude__gte': min_longitude, f'{prefix}longitude__lte': max_longitude,
+    })
+
+    cells = geohash_cover(box)
+    if cells:
+        prefixes = Q()
+        for cell in sorted(cells):
+            prefixes |= Q(**{f'{prefix}geohash__startswith': cell})
+        condition &= prefixes
+
+    return condition
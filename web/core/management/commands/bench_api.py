@@ -0,0 +1,113 @@
+import json
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+
+from api.core.benchmarks import CASES, PERCENTILES, BenchError, BenchFixtures, BenchRunner, compare_results, \
+    get_api_routes
+
+
+class Command(BaseCommand):
+    """
+    Команда нагрузочного прогона маршрутов api/public и api/auth тестовым клиентом (см. api.core.benchmarks)
+    на заполненной базе (см. seed_bench): перцентили времени ответа, число SQL-запросов и пиковая память по каждому
+    маршруту. Результат можно сохранить (`--json`) и сравнить со следующим прогоном (`--baseline`).
+    Все изменения данных откатываются
+    """
+
+    help = 'Бенчмарк маршрутов API: перцентили времени ответа, SQL-запросы и пиковая память'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Замеров на каждый маршрут')
+        parser.add_argument('--warmup', type=int, default=2, help='Прогревочных запросов на каждый маршрут')
+        parser.add_argument('--case', action='append', help='Только случаи, в названии которых есть строка')
+        parser.add_argument('--cold', action='store_true', help='Очищать кэш перед каждым запросом')
+        parser.add_argument('--external', action='store_true', help='Включить маршруты внешнего сервиса слотов')
+        parser.add_argument('--json', metavar='PATH', help='Сохранить результаты в файл')
+        parser.add_argument('--baseline', metavar='PATH', help='Сравнить с сохраненными результатами')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Допустимый рост p50 (доля)')
+        parser.add_argument('--fail-on-regression', action='store_true', help='Ошибка при регрессиях')
+
+    def handle(self, *args, **options):
+        cases = [case for case in CASES if options['external'] or not case.external]
+        if options['case']:
+            cases = [case for case in cases if any(part.lower() in case.name.lower() for part in options['case'])]
+            if not cases:
+                raise CommandError('Нет случаев с такими названиями.')
+
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = {result['name']: result for result in json.load(file)['results']}
+
+        # Метрики запросов (core.middleware) отключены: прогон сам считает SQL-запросы, а строки журнала
+        # на каждый запрос смешивались бы с таблицей результатов
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], MEDIA_ROOT=media_root,
+                IMAGE_UPLOAD_TEMP_DIR=media_root, REQUEST_METRICS=False,
+                EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'), transaction.atomic():
+            try:
+                fixtures = BenchFixtures()
+            except BenchError as error:
+                raise CommandError(str(error))
+
+            runner = BenchRunner(fixtures, options['repeat'], options['warmup'], options['cold'])
+            self.stdout.write(
+                f'Предложение {fixtures.offer.id}, точка выдачи {fixtures.rental_point.id}, '
+                f'компания {fixtures.company.id}; {options["repeat"]} замеров на маршрут'
+            )
+            self.stdout.write(self.format_header())
+
+            results = []
+            for case in cases:
+                result = runner.run(case)
+                results.append(result)
+                self.stdout.write(self.format_result(result))
+
+            uncovered = sorted(get_api_routes() - {runner.get_route(case) for case in CASES})
+            transaction.set_rollback(True)
+
+        if uncovered:
+            self.stdout.write(self.style.WARNING('Маршруты без случаев прогона:'))
+            for method, route in uncovered:
+                self.stdout.write(f'  {method.upper():6} {route}')
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as file:
+                json.dump({'options': {'repeat': options['repeat'], 'cold': options['cold']}, 'results': results},
+                          file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["json"]}')
+
+        unexpected = [result for result in results if result['status'] != result['expected']]
+        for result in unexpected:
+            self.stdout.write(self.style.ERROR(
+                f'  {result["name"]}: код {result["status"]}, ожидался {result["expected"]}'))
+
+        if options['baseline']:
+            regressions = compare_results(results, baseline, options['threshold'])
+            if regressions:
+                self.stdout.write(self.style.ERROR(f'Регрессии относительно {options["baseline"]}:'))
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(f'  {regression}'))
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'Регрессий: {len(regressions)}')
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS('Регрессий относительно базового прогона нет'))
+
+        # Замеры ответов с неожиданным кодом (например, страниц ошибок) не отражают работу маршрутов
+        if unexpected:
+            raise CommandError(f'Неожиданных кодов ответа: {len(unexpected)}')
+
+    def format_header(self):
+        percentiles = ''.join(f'{f"p{percent}, мс":>11}' for percent in PERCENTILES)
+        return f'{"Маршрут":44} {"код":>4}{percentiles}{"запросов":>10}{"память, КБ":>12}{"ответ, КБ":>11}'
+
+    def format_result(self, result):
+        percentiles = ''.join(f'{result[f"p{percent}"]:11.2f}' for percent in PERCENTILES)
+        line = (f'{result["name"][:44]:44} {result["status"]:>4}{percentiles}{result["queries"]:10}'
+                f'{result["peak_kb"]:12.0f}{result["size"] / 1024:11.1f}')
+
+        return line if result['status'] == result['expected'] else self.style.ERROR(line)
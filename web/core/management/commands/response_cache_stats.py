@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from core.cache import get_stats, is_process_local, reset_stats
+
+
+class Command(BaseCommand):
+    """
+    Счетчики попаданий и промахов кэша ответов. Счетчики ведутся только при файловом или внешнем кэше,
+    общем для всех процессов: кэш в памяти процесса команда не видит
+    """
+
+    help = 'Статистика кэша ответов публичных представлений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Сбросить счетчики после вывода')
+
+    def handle(self, *args, **options):
+        if is_process_local():
+            self.stdout.write(self.style.WARNING(
+                'Кэш хранится в памяти процесса (CACHE_URL=locmemcache://), счетчики не ведутся. '
+                'Задайте общий кэш, например CACHE_URL=filecache:///var/tmp/rental_platform_cache'))
+            return
+
+        for name, stats in get_stats().items():
+            total = stats['hits'] + stats['misses']
+            ratio = stats['hits'] / total * 100 if total else 0
+            self.stdout.write(f'{name:28} попаданий {stats["hits"]:8}   промахов {stats["misses"]:8}   {ratio:5.1f}%')
+
+        if options['reset']:
+            reset_stats()
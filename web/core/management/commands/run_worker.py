@@ -0,0 +1,101 @@
+import os
+import signal
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.tasks import DEFAULT_QUEUE, autodiscover, claim_task, has_due_tasks, purge_finished_tasks, registry, \
+    run_task
+
+
+# Пауза между удалениями старых выполненных задач, с
+PURGE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    """
+    Исполнитель очереди фоновых задач (core.tasks). Каждый поток забирает задачи запросом с SKIP LOCKED, поэтому
+    можно запускать несколько процессов исполнителя. По SIGINT/SIGTERM новые задачи не забираются,
+    текущие выполняются до конца. Раз в час удаляет выполненные задачи старше TASK_RETENTION_DAYS дней
+    """
+
+    help = 'Выполняет фоновые задачи из очереди в базе данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='append', help='Очередь (можно указать несколько), по умолчанию все')
+        parser.add_argument('--concurrency', type=int, default=settings.TASK_WORKER_CONCURRENCY,
+                            help='Количество потоков')
+        parser.add_argument('--poll-interval', type=float, default=settings.TASK_POLL_INTERVAL,
+                            help='Пауза опроса пустой очереди в секундах')
+        parser.add_argument('--burst', action='store_true', help='Завершиться, когда готовых задач не останется')
+
+    def handle(self, *args, **options):
+        autodiscover()
+
+        queues = options['queue'] or sorted({DEFAULT_QUEUE, *(registered.queue for registered in registry.values())})
+        self.stop = threading.Event()
+        self.processed = 0
+        self.lock = threading.Lock()
+        self.purge_at = time.monotonic()
+
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signal_number, self.request_stop)
+
+        self.stdout.write(
+            f'Исполнитель {socket.gethostname()}:{os.getpid()}: очереди {", ".join(queues)}, '
+            f'потоков {options["concurrency"]}, задач зарегистрировано {len(registry)}'
+        )
+
+        threads = [
+            threading.Thread(target=self.work, args=(index, queues, options), name=f'task-worker-{index}')
+            for index in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.stdout.write(self.style.SUCCESS(f'Исполнитель остановлен, выполнено попыток: {self.processed}'))
+
+    def request_stop(self, signal_number, frame):
+        self.stop.set()
+
+    def work(self, index, queues, options):
+        worker = f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+        try:
+            while not self.stop.is_set():
+                if index == 0:
+                    self.purge()
+
+                claimed = claim_task(worker, queues, settings.TASK_VISIBILITY_TIMEOUT)
+                if claimed is None:
+                    if options['burst'] and not has_due_tasks(queues):
+                        break
+                    self.stop.wait(options['poll_interval'])
+                    continue
+
+                if run_task(claimed) is None:
+                    continue
+
+                with self.lock:
+                    self.processed += 1
+                self.stdout.write(
+                    f'{claimed.name} #{claimed.id}: {claimed.status}, попытка {claimed.attempts}, '
+                    f'{claimed.duration or 0:.3f} с'
+                )
+        finally:
+            connection.close()
+
+    def purge(self):
+        if not settings.TASK_RETENTION_DAYS or time.monotonic() < self.purge_at:
+            return
+
+        self.purge_at = time.monotonic() + PURGE_INTERVAL
+        deleted = purge_finished_tasks(settings.TASK_RETENTION_DAYS)
+        if deleted:
+            self.stdout.write(f'Удалено выполненных задач: {deleted}')
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from core.seeding import DEFAULT_SIZES, BenchSeeder, get_sizes
+from offer.models import Offer
+
+
+class Command(BaseCommand):
+    """
+    Команда заполнения базы синтетическими данными для нагрузочных проверок (см. core.seeding).
+    По умолчанию создает 1 млн предложений, 5 млн оценок и 10 млн бронирований; `--scale 0.01` - сотую часть
+    """
+
+    help = 'Заполняет базу синтетическими справочниками, компаниями, предложениями, оценками и бронированиями'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help='Множитель размеров по умолчанию')
+        for name, size in DEFAULT_SIZES.items():
+            parser.add_argument(f'--{name.replace("_", "-")}', type=int, help=f'Количество ({size} при --scale 1)')
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора')
+        parser.add_argument('--rollups', action='store_true', help='Пересчитать дневные агрегаты бронирований')
+        parser.add_argument('--append', action='store_true', help='Добавить данные в непустую базу')
+
+    def handle(self, *args, **options):
+        if not options['append'] and Offer.objects.exists():
+            raise CommandError('В базе уже есть предложения. Для добавления данных укажите --append.')
+
+        sizes = get_sizes(options['scale'], **{name: options[name] for name in DEFAULT_SIZES})
+        self.stdout.write(', '.join(f'{name} {size}' for name, size in sizes.items()))
+
+        self.started = self.step_started = time.monotonic()
+        BenchSeeder(sizes, options['seed'], progress=self.report).run()
+
+        if options['rollups']:
+            self.stdout.write('Пересчет дневных агрегатов бронирований...')
+            call_command('rebuild_reservation_rollups', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(f'База заполнена за {time.monotonic() - self.started:.0f} с'))
+        if not options['rollups']:
+            self.stdout.write('Аналитика читает дневные агрегаты: для них выполните rebuild_reservation_rollups')
+
+    def report(self, name, count):
+        now = time.monotonic()
+        elapsed = now - self.step_started
+        self.step_started = now
+        self.stdout.write(f'  {name}: {count} строк, {elapsed:.1f} с ({count / elapsed if elapsed else 0:.0f} строк/с)')
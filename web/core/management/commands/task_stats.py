@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, ExpressionWrapper, F, FloatField, Max, Q
+from django.db.models.functions import Extract
+from django.utils import timezone
+
+from core.collections import TaskStatuses
+from core.models import Task
+from core.tasks import purge_finished_tasks
+
+
+class Command(BaseCommand):
+    """
+    Метрики очереди фоновых задач по каждой задаче: количество по статусам, длительность выполнения,
+    ожидание в очереди от назначенного времени до начала и число повторов
+    """
+
+    help = 'Статистика очереди фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Учитывать задачи, созданные за последние часы')
+        parser.add_argument('--purge-days', type=int, help='Удалить выполненные задачи старше стольких дней')
+
+    def handle(self, *args, **options):
+        tasks = Task.objects.filter(date_created__gte=timezone.now() - timedelta(hours=options['hours']))
+        wait = ExpressionWrapper(Extract(F('started_at') - F('run_at'), 'epoch'), output_field=FloatField())
+
+        rows = tasks.values('name').annotate(
+            pending=Count('id', filter=Q(status=TaskStatuses.PENDING)),
+            running=Count('id', filter=Q(status=TaskStatuses.RUNNING)),
+            done=Count('id', filter=Q(status=TaskStatuses.DONE)),
+            failed=Count('id', filter=Q(status=TaskStatuses.FAILED)),
+            retried=Count('id', filter=Q(attempts__gt=1)),
+            avg_duration=Avg('duration', filter=Q(status=TaskStatuses.DONE)),
+            max_duration=Max('duration', filter=Q(status=TaskStatuses.DONE)),
+            avg_wait=Avg(wait, filter=Q(started_at__isnull=False)),
+        ).order_by('name')
+
+        for row in rows:
+            self.stdout.write(
+                f'{row["name"]:40} ожидают {row["pending"]:6} выполняются {row["running"]:4} '
+                f'выполнены {row["done"]:7} ошибки {row["failed"]:5} с повторами {row["retried"]:5}   '
+                f'длительность ср. {row["avg_duration"] or 0:7.3f} с, макс. {row["max_duration"] or 0:7.3f} с   '
+                f'ожидание ср. {row["avg_wait"] or 0:7.3f} с'
+            )
+
+        if options['purge_days'] is not None:
+            deleted = purge_finished_tasks(options['purge_days'])
+            self.stdout.write(self.style.SUCCESS(f'Удалено выполненных задач: {deleted}'))
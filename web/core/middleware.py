@@ -0,0 +1,166 @@
+"""
+Метрики запроса: число и время SQL-запросов, время кода представления и отрисовки ответа.
+
+`RequestMetricsMiddleware` подключает к соединению с базой обертку `connection.execute_wrapper`, которая считает
+запросы и их время. Фазы запроса разделяются хуками middleware: `process_view` - начало представления,
+`process_template_response` - представление вернуло ответ DRF, дальше идет отрисовка рендерером. Время фазы
+считается без SQL, выполненного в ней, поэтому `view` - это код представления вне базы (у представлений DRF
+в основном сериализация), а `render` - кодирование ответа.
+
+Метрики пишутся строкой журнала `core.middleware` вида `key=value` (те же значения передаются в `extra` записи
+для структурированных обработчиков). Заголовок `Server-Timing` раскрывает число и время SQL-запросов, поэтому
+отдается только персоналу, при DEBUG или при включенной настройке SERVER_TIMING. Медленные запросы (дольше
+`SLOW_QUERY_MS`) и ответы с числом запросов больше `REQUEST_QUERY_LIMIT` пишутся предупреждением с именем
+представления (`OfferViewSet.list`) и самым частым SQL, чтобы N+1 были видны в журнале.
+
+Потоковые ответы (выгрузки) формируются после выхода из middleware: их метрики покрывают только подготовку ответа.
+"""
+import logging
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+# Сколько символов SQL попадает в журнал
+SQL_LOG_LENGTH = 500
+
+
+def get_view_name(request, view_func):
+    """
+    Имя представления для журнала: `Класс.действие` для наборов DRF, `Класс.метод` для классов, иначе имя функции
+    """
+
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{getattr(view_func, "__qualname__", type(view_func).__name__)}'
+
+    method = request.method.lower()
+    action = (getattr(view_func, 'actions', None) or {}).get(method, method)
+    return f'{view_class.__name__}.{action}'
+
+
+class RequestMetrics:
+    """
+    Метрики одного запроса. Экземпляр - обертка выполнения SQL для `connection.execute_wrapper`
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.view_name = None
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_finished = None
+        self.view_db_time = 0.0
+        self.query_count = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.query_count += 1
+            self.db_time += duration
+            # Текст запроса без параметров одинаков у всех запросов цикла N+1
+            self.statements[sql] += 1
+            if duration * 1000 >= settings.SLOW_QUERY_MS:
+                logger.warning(
+                    'Slow query %.1f ms in %s: %s', duration * 1000, self.view_name or self.request.path,
+                    sql[:SQL_LOG_LENGTH],
+                )
+
+    def start_view(self, view_name):
+        self.view_name = view_name
+        self.view_started = time.perf_counter()
+        self.view_db_time = self.db_time
+
+    def finish_view(self):
+        if self.view_started is not None and self.view_finished is None:
+            self.view_finished = time.perf_counter()
+            self.view_db_time = self.db_time - self.view_db_time
+
+    def get_timings(self):
+        """
+        Длительности фаз в миллисекундах: total, db, view (без SQL) и render (без SQL)
+        """
+
+        finished = time.perf_counter()
+        self.finish_view()
+        timings = {'total': finished - self.started, 'db': self.db_time}
+        if self.view_started is not None:
+            timings['view'] = self.view_finished - self.view_started - self.view_db_time
+            # Отрисовка идет только у ответов DRF и шаблонов, после process_template_response
+            render_db_time = self.db_time - self.view_db_time
+            timings['render'] = max(finished - self.view_finished - render_db_time, 0.0)
+
+        return {name: value * 1000 for name, value in timings.items()}
+
+    def get_server_timing(self, timings):
+        parts = [f'db;dur={timings["db"]:.1f};desc="SQL ({self.query_count})"']
+        if 'view' in timings:
+            parts.append(f'view;dur={timings["view"]:.1f}')
+            parts.append(f'render;dur={timings["render"]:.1f}')
+        parts.append(f'total;dur={timings["total"]:.1f}')
+        return ', '.join(parts)
+
+
+class RequestMetricsMiddleware:
+    """
+    Считает SQL-запросы и время фаз запроса, добавляет заголовок Server-Timing и пишет строку журнала.
+    Отключается настройкой REQUEST_METRICS
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics(request)
+        request.request_metrics = metrics
+        with connection.execute_wrapper(metrics):
+            response = self.get_response(request)
+
+        timings = metrics.get_timings()
+        if self.show_server_timing(request):
+            response['Server-Timing'] = metrics.get_server_timing(timings)
+        self.log(request, response, metrics, timings)
+        return response
+
+    def show_server_timing(self, request):
+        # Пользователь, аутентифицированный DRF (например, по токену), тоже записывается в request.user
+        user = getattr(request, 'user', None)
+        return settings.SERVER_TIMING or settings.DEBUG or bool(user and user.is_staff)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.request_metrics.start_view(get_view_name(request, view_func))
+
+    def process_template_response(self, request, response):
+        request.request_metrics.finish_view()
+        return response
+
+    def log(self, request, response, metrics, timings):
+        view_name = metrics.view_name or '-'
+        values = {
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'queries': metrics.query_count,
+            **{f'{name}_ms': round(value, 1) for name, value in timings.items()},
+        }
+        logger.info(' '.join(f'{key}={value}' for key, value in values.items()), extra={'request_metrics': values})
+
+        if metrics.query_count > settings.REQUEST_QUERY_LIMIT:
+            sql, count = metrics.statements.most_common(1)[0]
+            logger.warning(
+                '%s made %s queries (%s %s), most repeated %s times: %s', view_name, metrics.query_count,
+                request.method, request.path, count, sql[:SQL_LOG_LENGTH],
+            )
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.3 on 2026-10-18 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheGeneration',
+            fields=[
+                ('label', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Модель')),
+                ('generation', models.BigIntegerField(verbose_name='Поколение')),
+            ],
+            options={
+                'verbose_name': 'Поколение кэша',
+                'verbose_name_plural': 'Поколения кэша',
+            },
+        ),
+    ]
@@ -1,5 +1,9 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.utils import timezone
+
+from core.collections import TaskStatuses
 
 
 class LatitudeField(models.DecimalField):
@@ -28,10 +32,92 @@ class AbstractImage(models.Model):
     """Абстрактрая модель изображения"""
 
     name = models.CharField('Название', max_length=2000, blank=True)
-    image = models.FileField('Файл', upload_to='images')
+    image = models.FileField('Файл', upload_to='images', max_length=255)
+    checksum = models.CharField('SHA-256 содержимого', max_length=64, blank=True, default='', editable=False)
 
     class Meta:
         abstract = True
 
     def __str__(self):
         return f'{self.image.url}'
+
+
+class AbstractRatingAggregate(models.Model):
+    """Абстрактная модель хранимых агрегатов рейтинга"""
+
+    rating_avg = models.FloatField('Средняя оценка', default=0)
+    rating_count = models.PositiveIntegerField('Количество оценок', default=0)
+    rating_mark_1 = models.PositiveIntegerField('Количество оценок «1»', default=0)
+    rating_mark_2 = models.PositiveIntegerField('Количество оценок «2»', default=0)
+    rating_mark_3 = models.PositiveIntegerField('Количество оценок «3»', default=0)
+    rating_mark_4 = models.PositiveIntegerField('Количество оценок «4»', default=0)
+    rating_mark_5 = models.PositiveIntegerField('Количество оценок «5»', default=0)
+
+    class Meta:
+        abstract = True
+
+
+class AbstractUpdatedAt(models.Model):
+    """Абстрактная модель с временем последнего изменения для условных запросов (ETag/Last-Modified)"""
+
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True, db_index=True)
+
+    class Meta:
+        abstract = True
+
+
+class Task(models.Model):
+    """
+    Модель фоновой задачи очереди в базе данных (см. core.tasks)
+    """
+
+    name = models.CharField('Задача', max_length=255)
+    queue = models.CharField('Очередь', max_length=50, default='default')
+    args = models.JSONField('Позиционные аргументы', default=list, encoder=DjangoJSONEncoder)
+    kwargs = models.JSONField('Именованные аргументы', default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField('Статус', max_length=10, choices=TaskStatuses.CHOICES, default=TaskStatuses.PENDING)
+    priority = models.SmallIntegerField('Приоритет', default=0, help_text='Меньшее значение выполняется раньше')
+    run_at = models.DateTimeField('Выполнить не раньше', default=timezone.now)
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Наибольшее число попыток', default=3)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    locked_by = models.CharField('Исполнитель', max_length=255, blank=True)
+    locked_at = models.DateTimeField('Взята в работу', null=True, blank=True)
+    date_created = models.DateTimeField('Дата создания', auto_now_add=True)
+    started_at = models.DateTimeField('Начало последней попытки', null=True, blank=True)
+    finished_at = models.DateTimeField('Завершена', null=True, blank=True)
+    duration = models.FloatField('Длительность последней попытки, с', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(
+                fields=('queue', 'priority', 'run_at', 'id'), name='task_pending_order',
+                condition=models.Q(status=TaskStatuses.PENDING),
+            ),
+            models.Index(
+                fields=('locked_at',), name='task_running_locked_at', condition=models.Q(status=TaskStatuses.RUNNING),
+            ),
+            models.Index(fields=('name', 'status'), name='task_name_status'),
+        ]
+
+    def __str__(self):
+        return f'{self.id}: {self.name} ({self.status})'
+
+
+class CacheGeneration(models.Model):
+    """
+    Модель поколения данных модели для инвалидации кэша ответов (см. core.cache). Хранится в базе, чтобы
+    увеличение поколения в одном процессе сразу видели все процессы приложения
+    """
+
+    label = models.CharField('Модель', max_length=100, primary_key=True)
+    generation = models.BigIntegerField('Поколение')
+
+    class Meta:
+        verbose_name = 'Поколение кэша'
+        verbose_name_plural = 'Поколения кэша'
+
+    def __str__(self):
+        return f'{self.label}: {self.generation}'
@@ -0,0 +1,389 @@
+"""
+Синтетические данные для нагрузочных проверок API (команда `seed_bench`).
+
+Справочники, компании и точки выдачи создаются через `bulk_create`, большие таблицы (пользователи, предложения,
+цены, оценки и бронирования) - через COPY FROM STDIN пачками строк, сформированных в памяти. Идентификаторы
+больших таблиц назначаются заранее, начиная с max(id) + 1, поэтому связи между таблицами строятся без чтения
+вставленных строк, а последовательности выравниваются в конце загрузки.
+
+Распределения неравномерные, как в живых данных: популярность точек выдачи, предложений, предметов и активность
+пользователей подчиняются закону Ципфа (несколько «горячих» строк и длинный хвост), оценки смещены к 4-5,
+бронирования распределены на два года назад и два месяца вперед, прошлые бронирования в основном выполнены,
+будущие - новые или принятые. Bulk-вставки не вызывают сигналы, поэтому поисковые документы, агрегаты рейтинга,
+версии бронирований точек и поколения кэша пересчитываются явно после загрузки.
+"""
+import io
+import itertools
+import random
+from array import array
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from company.models import Company, RentalPoint, Reservation
+from core.cache import bump_generations
+from core.collections import ReservationStatuses, TimeUnits
+from core.geo import encode_geohash
+from offer.models import Offer, Price, Rating
+from offer.ratings import RATING_MARKS, rebuild_rental_point_ratings
+from offer.search import update_search_documents
+from product.models import Product
+from reference.models import Address, Category, City
+from user.models import User
+
+
+COPY_CHUNK_SIZE = 100000
+SEARCH_BATCH_SIZE = 50000
+ZIPF_EXPONENT = 0.8
+
+# Размеры по умолчанию; `scale` команды умножает их все
+DEFAULT_SIZES = {
+    'cities': 60,
+    'products': 5000,
+    'users': 200000,
+    'companies': 2000,
+    'rental_points': 20000,
+    'offers': 1000000,
+    'ratings': 5000000,
+    'reservations': 10000000,
+}
+MIN_SIZES = {'cities': 10, 'products': 100, 'users': 100, 'companies': 10, 'rental_points': 50}
+
+CITIES = (
+    ('Москва', 55.75, 37.62), ('Санкт-Петербург', 59.94, 30.31), ('Новосибирск', 55.03, 82.92),
+    ('Екатеринбург', 56.84, 60.61), ('Казань', 55.79, 49.12), ('Нижний Новгород', 56.33, 44.00),
+    ('Красноярск', 56.01, 92.87), ('Сочи', 43.59, 39.72), ('Мурманск', 68.97, 33.07), ('Владивосток', 43.12, 131.89),
+)
+CATEGORIES = {
+    'Зимний спорт': ('Лыжи', 'Сноуборды', 'Коньки', 'Снегоступы'),
+    'Велосипеды': ('Горные велосипеды', 'Городские велосипеды', 'Детские велосипеды', 'Электровелосипеды'),
+    'Вода': ('Байдарки', 'Сапборды', 'Каяки', 'Гидрокостюмы'),
+    'Туризм': ('Палатки', 'Спальники', 'Рюкзаки', 'Горелки'),
+    'Самокаты': ('Электросамокаты', 'Городские самокаты'),
+    'Фото и видео': ('Экшн-камеры', 'Объективы', 'Штативы'),
+}
+ADJECTIVES = ('новые', 'легкие', 'детские', 'складные', 'профессиональные', 'прогулочные', 'спортивные', 'надувные')
+DESCRIPTION_WORDS = (
+    'прокат', 'аренда', 'новый', 'надежный', 'легкий', 'комплект', 'шлем', 'чехол', 'доставка', 'скидка', 'сезон',
+    'выходные', 'размер', 'ботинки', 'крепления', 'насос', 'весла', 'жилет', 'рюкзак', 'фонарь', 'залог', 'инструктор',
+)
+SCHEDULES = (
+    {'slot': 60, 'days': {day: [['09:00', '21:00']] for day in ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')}},
+    {'slot': 60, 'days': {'mon': [['10:00', '19:00']], 'tue': [['10:00', '19:00']], 'wed': [['10:00', '19:00']],
+                          'thu': [['10:00', '19:00']], 'fri': [['10:00', '19:00']], 'sat': [['11:00', '17:00']]}},
+    {'slot': 120, 'days': {'fri': [['12:00', '22:00']], 'sat': [['08:00', '22:00']], 'sun': [['08:00', '22:00']]}},
+)
+PRICE_TIERS = ((1, TimeUnits.HOUR), (3, TimeUnits.HOUR), (1, TimeUnits.DAY), (7, TimeUnits.DAY))
+RATING_MARK_WEIGHTS = (4, 4, 10, 30, 52)
+PAST_STATUSES = (
+    (ReservationStatuses.DONE, 70), (ReservationStatuses.CANCELED, 16), (ReservationStatuses.DECLINED, 14),
+)
+FUTURE_STATUSES = (
+    (ReservationStatuses.NEW, 40), (ReservationStatuses.ACCEPTED, 50), (ReservationStatuses.CANCELED, 10),
+)
+RESERVATION_HOURS = (1, 2, 3, 4, 8, 24, 48, 72)
+HISTORY_DAYS = 2 * 365
+FUTURE_DAYS = 60
+
+
+def get_sizes(scale=1.0, **overrides):
+    """
+    Размеры таблиц: значения по умолчанию, умноженные на `scale`, и явно заданные `overrides`
+    """
+
+    sizes = {name: max(int(size * scale), MIN_SIZES.get(name, 0)) for name, size in DEFAULT_SIZES.items()}
+    sizes.update({name: size for name, size in overrides.items() if size is not None})
+
+    return sizes
+
+
+def get_cum_weights(count, exponent=ZIPF_EXPONENT):
+    """
+    Накопленные веса распределения Ципфа для `random.choices`: вес элемента с рангом k пропорционален 1 / k^exponent
+    """
+
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+class Popularity:
+    """
+    Выбор идентификаторов по закону Ципфа. Ранги перемешаны, чтобы популярные строки не были подряд идущими id
+    """
+
+    def __init__(self, rng, ids, exponent=ZIPF_EXPONENT):
+        self.rng = rng
+        self.ids = list(ids)
+        rng.shuffle(self.ids)
+        self.cum_weights = get_cum_weights(len(self.ids), exponent)
+
+    def choices(self, k):
+        return self.rng.choices(self.ids, cum_weights=self.cum_weights, k=k)
+
+
+def get_next_ids(model, count):
+    """
+    Диапазон идентификаторов для `count` новых строк модели
+    """
+
+    last = model.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+    return range(last + 1, last + 1 + count)
+
+
+def reset_sequences(*models):
+    """
+    Выравнивает последовательности id моделей по max(id) после вставки строк с явными id
+    """
+
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+def copy_lines(model, columns, lines, chunk_size=COPY_CHUNK_SIZE):
+    """
+    Загружает строки в таблицу модели через COPY пачками по `chunk_size`. Строки - готовые строки текстового
+    формата COPY (значения через табуляцию, NULL - \\N); значения генерируются и не содержат спецсимволов
+    """
+
+    sql = f'COPY {model._meta.db_table} ({", ".join(columns)}) FROM STDIN'
+    lines = iter(lines)
+    total = 0
+
+    with connection.cursor() as cursor:
+        while True:
+            chunk = list(itertools.islice(lines, chunk_size))
+            if not chunk:
+                return total
+
+            cursor.copy_expert(sql, io.StringIO('\n'.join(chunk) + '\n'))
+            total += len(chunk)
+
+
+def format_datetime(value):
+    return value.isoformat() if value is not None else '\\N'
+
+
+class BenchSeeder:
+    """
+    Генератор синтетических данных. Каждый шаг добавляет строки одной или нескольких таблиц и сообщает
+    о завершении через `progress(название, строк)`
+    """
+
+    def __init__(self, sizes, seed=0, progress=None):
+        self.sizes = sizes
+        self.rng = random.Random(seed)
+        self.progress = progress or (lambda name, count: None)
+        self.now = timezone.now().replace(microsecond=0)
+
+    def run(self):
+        self.seed_references()
+        self.seed_users()
+        self.seed_companies()
+        self.seed_offers()
+        self.seed_prices()
+        self.seed_ratings()
+        self.seed_reservations()
+        self.finish()
+
+    def seed_references(self):
+        cities = list(itertools.islice(itertools.cycle(CITIES), self.sizes['cities']))
+        self.cities = City.objects.bulk_create([
+            City(name=name if index < len(CITIES) else f'{name} {index // len(CITIES) + 1}')
+            for index, (name, _, _) in enumerate(cities)
+        ])
+        self.city_centers = {
+            city.id: (latitude, longitude) for city, (_, latitude, longitude) in zip(self.cities, cities)
+        }
+
+        # Категории сохраняются по одной: save() строит материализованный путь
+        leaves = []
+        for root_name, children in CATEGORIES.items():
+            root = Category.objects.create(name=root_name)
+            leaves.extend(Category.objects.create(name=name, parent=root) for name in children)
+
+        self.products = Popularity(self.rng, (product.id for product in Product.objects.bulk_create([
+            Product(name=f'{self.rng.choice(ADJECTIVES).capitalize()} {leaves[index % len(leaves)].name.lower()} '
+                         f'{index // len(leaves) + 1}', category=leaves[index % len(leaves)])
+            for index in range(self.sizes['products'])
+        ], batch_size=5000)))
+        self.progress('справочники', len(self.cities) + len(leaves) + self.sizes['products'])
+
+    def seed_users(self):
+        ids = get_next_ids(User, self.sizes['users'])
+        joined = self.now - timedelta(days=HISTORY_DAYS)
+        columns = ('id', 'password', 'is_superuser', 'first_name', 'last_name', 'is_staff', 'is_active', 'date_joined',
+                   'username', 'email', 'phone')
+        lines = (
+            f'{user_id}\t!\tf\tИмя {user_id}\tФамилия {user_id}\tf\tt\t'
+            f'{format_datetime(joined + timedelta(minutes=self.rng.randrange(HISTORY_DAYS * 24 * 60)))}\t\t'
+            f'bench-{user_id}@example.com\t+7900{user_id % 10000000:07d}'
+            for user_id in ids
+        )
+        copy_lines(User, columns, lines)
+        self.users = Popularity(self.rng, ids)
+        self.progress('пользователи', len(ids))
+
+    def seed_companies(self):
+        # Первые компании принадлежат самым активным пользователям, чтобы у владельцев были данные в аналитике
+        owners = self.users.ids[:self.sizes['companies'] // 2]
+        companies = Company.objects.bulk_create([
+            Company(name=f'Прокат {index + 1}', description='Прокат снаряжения',
+                    user_id=owners[index] if index < len(owners) else None)
+            for index in range(self.sizes['companies'])
+        ], batch_size=5000)
+        company_choice = Popularity(self.rng, (company.id for company in companies))
+
+        addresses = []
+        for index in range(self.sizes['rental_points']):
+            city = self.rng.choice(self.cities)
+            latitude, longitude = self.city_centers[city.id]
+            latitude = Decimal(f'{latitude + self.rng.uniform(-0.2, 0.2):.6f}')
+            longitude = Decimal(f'{longitude + self.rng.uniform(-0.3, 0.3):.6f}')
+            addresses.append(Address(
+                address=f'ул. Лесная, {index + 1}', city=city, latitude=latitude, longitude=longitude,
+                geohash=encode_geohash(latitude, longitude),
+            ))
+        addresses = Address.objects.bulk_create(addresses, batch_size=5000)
+
+        rental_points = RentalPoint.objects.bulk_create([
+            RentalPoint(address=address, company_id=company_id, phone=f'+7999{index:07d}',
+                        is_delivery=self.rng.random() < 0.3, schedule=self.rng.choice(SCHEDULES))
+            for index, (address, company_id) in enumerate(zip(addresses, company_choice.choices(len(addresses))))
+        ], batch_size=5000)
+        self.rental_points = Popularity(self.rng, (rental_point.id for rental_point in rental_points))
+        self.progress('компании и точки выдачи', len(companies) + len(rental_points))
+
+    def seed_offers(self):
+        ids = get_next_ids(Offer, self.sizes['offers'])
+        self.first_offer_id = ids.start
+        self.offers = Popularity(self.rng, ids)
+
+        # Оценки выбираются до вставки предложений, чтобы агрегаты рейтинга записать вместе с предложениями
+        self.rating_offers = self.offers.choices(self.sizes['ratings'])
+        self.rating_marks = self.rng.choices(RATING_MARKS, weights=RATING_MARK_WEIGHTS, k=self.sizes['ratings'])
+        histograms = [array('I', bytes(4 * len(ids))) for _ in RATING_MARKS]
+        for offer_id, mark in zip(self.rating_offers, self.rating_marks):
+            histograms[mark - 1][offer_id - ids.start] += 1
+
+        columns = ('id', 'rating_avg', 'rating_count', 'rating_mark_1', 'rating_mark_2', 'rating_mark_3',
+                   'rating_mark_4', 'rating_mark_5', 'updated_at', 'is_active', 'description', 'count', 'is_for_child',
+                   'is_female', 'is_male', 'is_unisex', 'product_id', 'rental_point_id', 'search_document')
+        updated_at = format_datetime(self.now)
+        rental_points = self.rental_points.choices(len(ids))
+        products = self.products.choices(len(ids))
+        rng = self.rng
+
+        def lines():
+            for index, (offer_id, rental_point_id, product_id) in enumerate(zip(ids, rental_points, products)):
+                marks = [histogram[index] for histogram in histograms]
+                count = sum(marks)
+                average = sum(mark * value for mark, value in zip(RATING_MARKS, marks)) / count if count else 0
+                is_active = 't' if rng.random() < 0.85 else 'f'
+                flags = '\t'.join('t' if rng.random() < 0.15 else 'f' for _ in range(4))
+                description = ' '.join(rng.sample(DESCRIPTION_WORDS, 6))
+                rating = '\t'.join(map(str, (average, count, *marks)))
+                yield (f'{offer_id}\t{rating}\t{updated_at}\t{is_active}\t{description}\t'
+                       f'{rng.randint(1, 20)}\t{flags}\t{product_id}\t{rental_point_id}\t')
+
+        copy_lines(Offer, columns, lines())
+        self.progress('предложения', len(ids))
+
+    def seed_prices(self):
+        ids = itertools.count(get_next_ids(Price, 0).start)
+        columns = ('id', 'updated_at', 'time_from', 'time_from_unit', 'price_per_time', 'price_per_time_unit',
+                   'offer_id')
+        updated_at = format_datetime(self.now)
+        rng = self.rng
+        count = 0
+
+        def lines():
+            nonlocal count
+            for offer_id in range(self.first_offer_id, self.first_offer_id + self.sizes['offers']):
+                hourly = rng.randint(10, 100) * 10
+                for index, (time_from, unit) in enumerate(PRICE_TIERS[:rng.randint(1, len(PRICE_TIERS))]):
+                    price = hourly * (1 - 0.15 * index) * (24 if unit == TimeUnits.DAY else 1)
+                    count += 1
+                    yield f'{next(ids)}\t{updated_at}\t{time_from}\t{unit}\t{price:.0f}\t{unit}\t{offer_id}'
+
+        copy_lines(Price, columns, lines())
+        self.progress('цены', count)
+
+    def seed_ratings(self):
+        ids = get_next_ids(Rating, self.sizes['ratings'])
+        columns = ('id', 'updated_at', 'mark', 'comment', 'offer_id', 'user_id')
+        users = self.users.choices(len(ids))
+        minutes = HISTORY_DAYS * 24 * 60
+        rng = self.rng
+
+        lines = (
+            f'{rating_id}\t{format_datetime(self.now - timedelta(minutes=rng.randrange(minutes)))}\t{mark}\t'
+            f'{"Все отлично" if mark > 3 and rng.random() < 0.3 else ""}\t{offer_id}\t{user_id}'
+            for rating_id, offer_id, user_id, mark in zip(ids, self.rating_offers, users, self.rating_marks)
+        )
+        copy_lines(Rating, columns, lines)
+        del self.rating_offers, self.rating_marks
+        self.progress('оценки', len(ids))
+
+    def seed_reservations(self):
+        ids = get_next_ids(Reservation, self.sizes['reservations'])
+        columns = ('id', 'updated_at', 'date_created', 'count', 'datetime_from', 'datetime_to', 'status', 'offer_id',
+                   'user_id')
+        span = (HISTORY_DAYS + FUTURE_DAYS) * 24 * 60
+        past_statuses, past_weights = zip(*PAST_STATUSES)
+        future_statuses, future_weights = zip(*FUTURE_STATUSES)
+        start = self.now - timedelta(days=HISTORY_DAYS)
+        rng = self.rng
+
+        def lines():
+            reservation_ids = iter(ids)
+            while True:
+                chunk = list(itertools.islice(reservation_ids, COPY_CHUNK_SIZE))
+                if not chunk:
+                    return
+
+                size = len(chunk)
+                for reservation_id, offer_id, user_id, past, future, hours in zip(
+                        chunk, self.offers.choices(size), self.users.choices(size),
+                        rng.choices(past_statuses, weights=past_weights, k=size),
+                        rng.choices(future_statuses, weights=future_weights, k=size),
+                        rng.choices(RESERVATION_HOURS, k=size)):
+                    datetime_from = start + timedelta(minutes=rng.randrange(span) // 30 * 30)
+                    date_created = min(datetime_from, self.now) - timedelta(minutes=rng.randrange(14 * 24 * 60))
+                    status = past if datetime_from < self.now else future
+                    datetime_to = datetime_from + timedelta(hours=hours)
+                    period = '\\N\t\\N'
+                    if rng.random() >= 0.03:
+                        period = f'{format_datetime(datetime_from)}\t{format_datetime(datetime_to)}'
+                    count = 1 if rng.random() < 0.8 else rng.randint(2, 4)
+                    created = format_datetime(date_created)
+                    yield f'{reservation_id}\t{created}\t{created}\t{count}\t{period}\t{status}\t{offer_id}\t{user_id}'
+
+        copy_lines(Reservation, columns, lines())
+        self.progress('бронирования', len(ids))
+
+    def finish(self):
+        reset_sequences(User, Company, RentalPoint, Address, Offer, Price, Rating, Reservation)
+
+        last_offer_id = self.first_offer_id + self.sizes['offers']
+        for batch_start in range(self.first_offer_id, last_offer_id, SEARCH_BATCH_SIZE):
+            with transaction.atomic():
+                update_search_documents(Offer.objects.filter(
+                    id__gte=batch_start, id__lt=min(batch_start + SEARCH_BATCH_SIZE, last_offer_id)))
+        self.progress('поисковые документы', self.sizes['offers'])
+
+        # Агрегаты предложений записаны при вставке, агрегаты точек выдачи считаются по ним
+        with transaction.atomic():
+            rebuild_rental_point_ratings()
+            RentalPoint.objects.update(updated_at=Now(), reservations_version=F('reservations_version') + 1)
+            bump_generations(City, Category, Product, Address, Company, RentalPoint, Offer, Price, Rating, Reservation)
+        self.progress('агрегаты точек выдачи', self.sizes['rental_points'])
+
+        with connection.cursor() as cursor:
+            for model in (User, Company, RentalPoint, Address, Offer, Price, Rating, Reservation):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
@@ -0,0 +1,28 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+
+from core.cache import bump_generations
+
+
+# Модели, от которых зависят кэшированные ответы публичных представлений, ступени цен и дерево категорий
+GENERATION_MODELS = (
+    'offer.Offer',
+    'offer.Price',
+    'company.Company',
+    'company.RentalPoint',
+    'company.Reservation',
+    'reference.City',
+    'reference.Category',
+    'reference.Address',
+    'product.Product',
+)
+
+
+def bump_model_generation(sender, **kwargs):
+    bump_generations(sender)
+
+
+for label in GENERATION_MODELS:
+    model = apps.get_model(label)
+    post_save.connect(bump_model_generation, sender=model, dispatch_uid=f'bump_generation_save_{label}')
+    post_delete.connect(bump_model_generation, sender=model, dispatch_uid=f'bump_generation_delete_{label}')
@@ -0,0 +1,269 @@
+"""
+Очередь фоновых задач в Postgres.
+
+Задача - функция, зарегистрированная декоратором `task`. Вызов `.delay(...)` или `.schedule(run_at, ...)` записывает
+строку `core.Task` в текущей транзакции: задача становится видна исполнителям только после фиксации данных, ради
+которых она поставлена. Исполнитель (`manage.py run_worker`) забирает задачи запросом
+`SELECT ... FOR UPDATE SKIP LOCKED`, поэтому несколько процессов и потоков не получают одну задачу дважды
+и не ждут друг друга.
+
+- Повторы: при исключении задача возвращается в очередь с задержкой `retry_delay * 2 ** (попытка - 1)` секунд
+  до `max_attempts` попыток, затем получает статус failed с текстом последней ошибки.
+- Отложенные задачи: `run_at` - время, раньше которого задача не выполняется.
+- Конкурентность: число потоков исполнителя и `max_concurrency` задачи - не больше стольких одновременных выполнений
+  во всех исполнителях (слоты на сессионных advisory-блокировках Postgres, освобождаются и при падении процесса).
+- Зависшие задачи: задача в статусе running дольше `visibility_timeout` считается потерянной и выдается снова.
+- Метрики: время постановки, начала и окончания, длительность и число попыток каждой задачи (`manage.py task_stats`).
+
+Аргументы задачи сохраняются в JSON, поэтому передавать нужно идентификаторы и простые значения, а не объекты.
+"""
+import logging
+import traceback
+import zlib
+from datetime import timedelta
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from core.collections import TaskStatuses
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE = 'default'
+ADVISORY_LOCK_NAMESPACE = 0x7461736b
+# Через сколько секунд снова выдать задачу, все слоты которой заняты
+SLOT_RETRY_DELAY = 0.2
+
+registry = {}
+
+
+class RegisteredTask:
+    """
+    Зарегистрированная фоновая задача. Прямой вызов выполняет функцию синхронно
+    """
+
+    def __init__(self, func, name, queue, max_attempts, retry_delay, max_concurrency, priority):
+        self.func = func
+        self.name = name
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_concurrency = max_concurrency
+        self.priority = priority
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f'<RegisteredTask {self.name}>'
+
+    def delay(self, *args, **kwargs):
+        """
+        Ставит задачу в очередь на выполнение как можно раньше
+        """
+
+        return self.schedule(None, *args, **kwargs)
+
+    def schedule(self, run_at, *args, **kwargs):
+        """
+        Ставит задачу в очередь на выполнение не раньше `run_at` (datetime или timedelta от текущего момента)
+        """
+
+        TaskModel = apps.get_model('core', 'Task')
+
+        if run_at is None:
+            run_at = timezone.now()
+        elif isinstance(run_at, timedelta):
+            run_at = timezone.now() + run_at
+
+        return TaskModel.objects.create(
+            name=self.name, queue=self.queue, args=list(args), kwargs=kwargs, priority=self.priority, run_at=run_at,
+            max_attempts=self.max_attempts,
+        )
+
+    def get_retry_at(self, attempts):
+        return timezone.now() + timedelta(seconds=self.retry_delay * 2 ** (attempts - 1))
+
+
+def task(name=None, queue=DEFAULT_QUEUE, max_attempts=3, retry_delay=10, max_concurrency=None, priority=0):
+    """
+    Регистрирует функцию как фоновую задачу. Имя по умолчанию - `<модуль>.<функция>`
+    """
+
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__qualname__}'
+        registry[task_name] = RegisteredTask(
+            func, task_name, queue, max_attempts, retry_delay, max_concurrency, priority)
+        return registry[task_name]
+
+    return decorator
+
+
+def autodiscover():
+    """
+    Импортирует модули tasks всех приложений, чтобы зарегистрировать их задачи
+    """
+
+    autodiscover_modules('tasks')
+
+
+def claim_task(worker, queues, visibility_timeout):
+    """
+    Забирает следующую готовую задачу из очередей и помечает ее выполняемой. None, если готовых задач нет
+    """
+
+    TaskModel = apps.get_model('core', 'Task')
+
+    now = timezone.now()
+    ready = Q(status=TaskStatuses.PENDING, run_at__lte=now) | Q(
+        status=TaskStatuses.RUNNING, locked_at__lt=now - timedelta(seconds=visibility_timeout))
+
+    with transaction.atomic():
+        claimed = TaskModel.objects.select_for_update(skip_locked=True).filter(
+            ready, queue__in=queues).order_by('priority', 'run_at', 'id').first()
+        if claimed is None:
+            return None
+
+        claimed.status = TaskStatuses.RUNNING
+        claimed.attempts += 1
+        claimed.locked_by = worker
+        claimed.locked_at = claimed.started_at = now
+        claimed.save(update_fields=('status', 'attempts', 'locked_by', 'locked_at', 'started_at'))
+
+    return claimed
+
+
+def has_due_tasks(queues, within=SLOT_RETRY_DELAY):
+    """
+    Есть ли в очередях задачи, которые станут готовы в ближайшие `within` секунд
+    """
+
+    TaskModel = apps.get_model('core', 'Task')
+
+    return TaskModel.objects.filter(
+        queue__in=queues, status=TaskStatuses.PENDING, run_at__lte=timezone.now() + timedelta(seconds=within),
+    ).exists()
+
+
+def acquire_slot(registered):
+    """
+    Занимает один из `max_concurrency` слотов задачи сессионной advisory-блокировкой. Номер слота или None
+    """
+
+    if not registered.max_concurrency:
+        return -1
+
+    key = zlib.crc32(registered.name.encode()) & 0x3fffffff
+    with connection.cursor() as cursor:
+        for slot in range(registered.max_concurrency):
+            cursor.execute('SELECT pg_try_advisory_lock(%s, %s)', (ADVISORY_LOCK_NAMESPACE, key + slot))
+            if cursor.fetchone()[0]:
+                return key + slot
+
+    return None
+
+
+def release_slot(slot):
+    if slot >= 0:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s, %s)', (ADVISORY_LOCK_NAMESPACE, slot))
+
+
+def purge_finished_tasks(days):
+    """
+    Удаляет выполненные задачи, завершенные раньше `days` дней назад. Возвращает число удаленных
+    """
+
+    TaskModel = apps.get_model('core', 'Task')
+
+    deleted, _ = TaskModel.objects.filter(
+        status=TaskStatuses.DONE, finished_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
+
+
+def save_attempt(claimed, **values):
+    """
+    Сохраняет изменения задачи, только если она все еще принадлежит этой попытке: после `visibility_timeout`
+    задачу может забрать другой исполнитель, и итог старой попытки не должен перезаписать состояние новой.
+    Условный UPDATE ... WHERE id AND locked_by AND attempts. False, если задача уже забрана заново
+    """
+
+    TaskModel = apps.get_model('core', 'Task')
+
+    updated = TaskModel.objects.filter(
+        id=claimed.id, locked_by=claimed.locked_by, attempts=claimed.attempts).update(**values)
+    if not updated:
+        logger.warning('Task %s (%s) attempt %s was reclaimed by another worker, result dropped', claimed.id,
+                       claimed.name, claimed.attempts)
+        return False
+
+    for field, value in values.items():
+        setattr(claimed, field, value)
+    return True
+
+
+def finish_task(claimed, status, started, error='', run_at=None):
+    finished_at = timezone.now()
+    values = {
+        'status': status,
+        'last_error': error,
+        'finished_at': finished_at,
+        'duration': (finished_at - started).total_seconds(),
+        'locked_by': '',
+        'locked_at': None,
+    }
+    if run_at is not None:
+        values['run_at'] = run_at
+
+    return save_attempt(claimed, **values)
+
+
+def run_task(claimed):
+    """
+    Выполняет забранную задачу и сохраняет результат попытки: выполнена, повтор позже или ошибка.
+    None, если все слоты задачи заняты и она возвращена в очередь без выполнения
+    """
+
+    registered = registry.get(claimed.name)
+    started = timezone.now()
+
+    if registered is None:
+        finish_task(claimed, TaskStatuses.FAILED, started, error=f'Задача {claimed.name} не зарегистрирована.')
+        logger.error('Task %s (%s) is not registered', claimed.id, claimed.name)
+        return claimed
+
+    if claimed.attempts > claimed.max_attempts:
+        # Задачу забирали снова после истечения visibility_timeout: исполнители не смогли ее завершить
+        finish_task(claimed, TaskStatuses.FAILED, started, error=claimed.last_error or 'Превышено число попыток.')
+        return claimed
+
+    slot = acquire_slot(registered)
+    if slot is None:
+        # Все слоты задачи заняты другими исполнителями: задача возвращается в очередь, попытка не засчитывается
+        save_attempt(
+            claimed, status=TaskStatuses.PENDING, attempts=claimed.attempts - 1, locked_by='', locked_at=None,
+            started_at=None, run_at=timezone.now() + timedelta(seconds=SLOT_RETRY_DELAY),
+        )
+        return None
+
+    try:
+        registered.func(*claimed.args, **claimed.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if claimed.attempts < claimed.max_attempts:
+            finish_task(claimed, TaskStatuses.PENDING, started, error, run_at=registered.get_retry_at(claimed.attempts))
+            logger.warning('Task %s (%s) failed, attempt %s of %s', claimed.id, claimed.name, claimed.attempts,
+                           claimed.max_attempts)
+        else:
+            finish_task(claimed, TaskStatuses.FAILED, started, error)
+            logger.error('Task %s (%s) failed after %s attempts', claimed.id, claimed.name, claimed.attempts)
+    else:
+        finish_task(claimed, TaskStatuses.DONE, started)
+    finally:
+        release_slot(slot)
+
+    return claimed
@@ -0,0 +1,141 @@
+import zlib
+from datetime import timedelta
+
+from django.db import connections
+from django.test import TestCase
+from django.utils import timezone
+
+from core.collections import TaskStatuses
+from core.models import Task
+from core.tasks import ADVISORY_LOCK_NAMESPACE, claim_task, finish_task, purge_finished_tasks, run_task, task
+
+
+QUEUE = 'tests'
+calls = []
+
+
+@task(name='core.tests.record', queue=QUEUE)
+def record(value):
+    calls.append(value)
+
+
+@task(name='core.tests.fail', queue=QUEUE, max_attempts=2, retry_delay=10)
+def fail():
+    raise RuntimeError('boom')
+
+
+@task(name='core.tests.single', queue=QUEUE, max_concurrency=1)
+def single():
+    calls.append('single')
+
+
+class TaskQueueTests(TestCase):
+    """
+    Очередь фоновых задач: выдача, повторы, повторная выдача зависших задач и слоты конкурентности
+    """
+
+    def setUp(self):
+        calls.clear()
+
+    def claim(self, worker='worker-1', visibility_timeout=300):
+        return claim_task(worker, [QUEUE], visibility_timeout)
+
+    @staticmethod
+    def get_slot_key():
+        return zlib.crc32(single.name.encode()) & 0x3fffffff
+
+    def test_claim_and_run(self):
+        queued = record.delay(1)
+
+        claimed = self.claim()
+        self.assertEqual(claimed.id, queued.id)
+        self.assertIsNone(self.claim())
+
+        run_task(claimed)
+        queued.refresh_from_db()
+        self.assertEqual(calls, [1])
+        self.assertEqual((queued.status, queued.attempts, queued.locked_by), (TaskStatuses.DONE, 1, ''))
+        self.assertIsNotNone(queued.duration)
+
+    def test_claim_order_and_delayed_tasks(self):
+        record.schedule(timedelta(hours=1), 'later')
+        low = Task.objects.create(name=record.name, queue=QUEUE, args=['low'], priority=1)
+        first = record.delay('first')
+        second = record.delay('second')
+
+        self.assertEqual([self.claim().id for _ in range(3)], [first.id, second.id, low.id])
+        self.assertIsNone(self.claim())
+
+    def test_failed_task_is_retried_with_backoff_then_fails(self):
+        queued = fail.delay()
+
+        with self.assertLogs('core.tasks', 'WARNING'):
+            run_task(self.claim())
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (TaskStatuses.PENDING, 1))
+        self.assertIn('RuntimeError: boom', queued.last_error)
+        self.assertGreater(queued.run_at, timezone.now() + timedelta(seconds=5))
+        self.assertIsNone(self.claim())
+
+        Task.objects.filter(id=queued.id).update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            run_task(self.claim())
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (TaskStatuses.FAILED, 2))
+
+    def test_stale_task_is_reclaimed_and_old_result_dropped(self):
+        queued = record.delay(1)
+        stale = self.claim('worker-1', visibility_timeout=60)
+        self.assertIsNone(self.claim('worker-2', visibility_timeout=60))
+
+        Task.objects.filter(id=queued.id).update(locked_at=timezone.now() - timedelta(minutes=2))
+        reclaimed = self.claim('worker-2', visibility_timeout=60)
+        self.assertEqual((reclaimed.id, reclaimed.attempts, reclaimed.locked_by), (queued.id, 2, 'worker-2'))
+
+        with self.assertLogs('core.tasks', 'WARNING'):
+            self.assertFalse(finish_task(stale, TaskStatuses.FAILED, timezone.now(), error='stale'))
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.locked_by), (TaskStatuses.RUNNING, 'worker-2'))
+
+        run_task(reclaimed)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.last_error), (TaskStatuses.DONE, ''))
+
+    def test_task_waits_for_free_slot(self):
+        queued = single.delay()
+        other = connections.create_connection('default')
+        try:
+            with other.cursor() as cursor:
+                cursor.execute('SELECT pg_try_advisory_lock(%s, %s)', (ADVISORY_LOCK_NAMESPACE, self.get_slot_key()))
+
+            self.assertIsNone(run_task(self.claim()))
+            queued.refresh_from_db()
+            self.assertEqual((queued.status, queued.attempts, queued.locked_by), (TaskStatuses.PENDING, 0, ''))
+            self.assertEqual(calls, [])
+        finally:
+            other.close()
+
+        Task.objects.filter(id=queued.id).update(run_at=timezone.now())
+        run_task(self.claim())
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (TaskStatuses.DONE, 1))
+        self.assertEqual(calls, ['single'])
+
+    def test_unregistered_task_fails(self):
+        queued = Task.objects.create(name='core.tests.missing', queue=QUEUE)
+
+        with self.assertLogs('core.tasks', 'ERROR'):
+            run_task(self.claim())
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, TaskStatuses.FAILED)
+
+    def test_purge_finished_tasks(self):
+        now = timezone.now()
+        old = Task.objects.create(name=record.name, queue=QUEUE, status=TaskStatuses.DONE,
+                                  finished_at=now - timedelta(days=8))
+        Task.objects.create(name=record.name, queue=QUEUE, status=TaskStatuses.DONE, finished_at=now)
+        Task.objects.create(name=record.name, queue=QUEUE, status=TaskStatuses.FAILED,
+                            finished_at=now - timedelta(days=8))
+
+        self.assertEqual(purge_finished_tasks(7), 1)
+        self.assertFalse(Task.objects.filter(id=old.id).exists())
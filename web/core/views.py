@@ -0,0 +1,15 @@
+from django.views.static import serve
+
+from core.blobs import IMMUTABLE_CACHE_CONTROL, is_blob_name
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """
+    Раздача media в режиме отладки. Файлы по содержимому отдаются как неизменяемые
+    """
+
+    response = serve(request, path, document_root=document_root, show_indexes=show_indexes)
+    if response.status_code == 200 and is_blob_name(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+
+    return response
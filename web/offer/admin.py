@@ -1,8 +1,9 @@
 from django.contrib import admin
 
-from offer.models import Offer, Price, Rating
+from offer.models import CatalogImport, Offer, Price, Rating
 
 
 admin.site.register(Offer)
 admin.site.register(Price)
 admin.site.register(Rating)
+admin.site.register(CatalogImport)
@@ -5,3 +5,6 @@ class OfferConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'offer'
     verbose_name = 'Предложения'
+
+    def ready(self):
+        from offer import signals  # noqa: F401
@@ -0,0 +1,437 @@
+"""
+Импорт каталога предложений компании из CSV или JSON Lines.
+
+Файл читается потоково, строки обрабатываются пачками по `batch_size`: каждая пачка - одна транзакция, в которой
+недостающие справочники (города, адреса, категории, предметы, точки выдачи) находятся одним запросом на справочник
+и создаются пачкой, а предложения и их цены вставляются `bulk_create`. Найденные идентификаторы справочников
+запоминаются в словарях поиска, поэтому повторяющиеся значения не запрашиваются снова, а память растет только
+с числом различных значений справочников, но не с размером файла.
+
+После каждой пачки в задании импорта сохраняются число обработанных строк и счетчики. Если импорт прерван,
+повторный запуск пропускает уже обработанные строки и продолжает со следующей пачки. Строки с ошибками
+не прерывают импорт: они пропускаются, а их номера и причины сохраняются в задании.
+
+Колонки (ключи строки JSON): rental_point (идентификатор точки выдачи компании) или city, address, latitude,
+longitude, phone (точка выдачи по адресу, создается при отсутствии); product, category, description, count,
+is_active, is_for_child, is_female, is_male, is_unisex; prices - JSON-список цен с ключами time_from,
+time_from_unit, price_per_time, price_per_time_unit.
+"""
+import codecs
+import csv
+import itertools
+import json
+import math
+import traceback
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Now
+
+from company.models import RentalPoint
+from core.cache import bump_generations
+from core.collections import ImportFormats, ImportStatuses, TimeUnits
+from core.geo import encode_geohash
+from offer.models import Offer, Price
+from offer.search import update_search_documents
+from product.models import Product
+from reference.models import Address, Category, City
+
+
+DEFAULT_BATCH_SIZE = 1000
+# Сколько ошибок строк хранится в задании, остальные только считаются
+MAX_STORED_ERRORS = 100
+# Наибольшее значение IntegerField в базе: большее значение отклонила бы вставка всей пачки
+MAX_INTEGER = 2 ** 31 - 1
+
+BOOLEAN_VALUES = {
+    '1': True, 'true': True, 'yes': True, 'да': True,
+    '0': False, 'false': False, 'no': False, 'нет': False, '': False,
+}
+TIME_UNITS = {unit for unit, _ in TimeUnits.CHOICES}
+OFFER_FLAGS = ('is_for_child', 'is_female', 'is_male', 'is_unisex')
+
+
+class RowError(Exception):
+    """
+    Строка файла не может быть импортирована
+    """
+
+
+def get_format(name):
+    """
+    Формат файла по расширению имени
+    """
+
+    return ImportFormats.JSONL if name.lower().endswith(('.jsonl', '.ndjson')) else ImportFormats.CSV
+
+
+def read_rows(file, format):
+    """
+    Строки файла (открытого в двоичном режиме) словарями. Строка JSON, которую не удалось разобрать, отдается
+    исключением RowError, чтобы нумерация строк не сбивалась
+    """
+
+    lines = codecs.iterdecode(file, 'utf-8-sig')
+
+    if format == ImportFormats.CSV:
+        yield from csv.DictReader(lines)
+        return
+
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield RowError(f'Неверный JSON: {error}')
+            continue
+        yield row if isinstance(row, dict) else RowError('Ожидается JSON-объект.')
+
+
+def get_text(row, key, max_length, required=False):
+    value = row.get(key)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f'Не заполнено поле {key}.')
+    if '\x00' in value:
+        raise RowError(f'Поле {key} содержит нулевой символ.')
+    if len(value) > max_length:
+        raise RowError(f'Поле {key} длиннее {max_length} символов.')
+
+    return value
+
+
+def get_number(row, key, cast, default=None, minimum=None, maximum=None):
+    value = row.get(key)
+    if value is None or value == '':
+        if default is None:
+            raise RowError(f'Не заполнено поле {key}.')
+        return default
+
+    try:
+        value = cast(value)
+    except (TypeError, ValueError, OverflowError):
+        raise RowError(f'Поле {key} должно быть числом.')
+    if not math.isfinite(value):
+        raise RowError(f'Поле {key} должно быть конечным числом.')
+    if minimum is not None and value < minimum:
+        raise RowError(f'Поле {key} должно быть не меньше {minimum}.')
+    if maximum is not None and value > maximum:
+        raise RowError(f'Поле {key} должно быть не больше {maximum}.')
+
+    return value
+
+
+def get_boolean(row, key, default=False):
+    value = row.get(key)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+
+    try:
+        return BOOLEAN_VALUES[str(value).strip().lower()]
+    except KeyError:
+        raise RowError(f'Поле {key} должно быть логическим значением.')
+
+
+def parse_prices(value):
+    if isinstance(value, str):
+        if not value.strip():
+            return []
+        try:
+            value = json.loads(value)
+        except ValueError:
+            raise RowError('Поле prices должно быть JSON-списком.')
+    if value is None:
+        return []
+    if not isinstance(value, list) or not all(isinstance(price, dict) for price in value):
+        raise RowError('Поле prices должно быть списком объектов.')
+
+    prices = []
+    for price in value:
+        units = (price.get('time_from_unit') or TimeUnits.HOUR, price.get('price_per_time_unit') or TimeUnits.HOUR)
+        if not TIME_UNITS.issuperset(units):
+            raise RowError(f'Неизвестная единица времени цены, допустимы: {", ".join(sorted(TIME_UNITS))}.')
+        prices.append({
+            'time_from': get_number(price, 'time_from', int, minimum=0, maximum=MAX_INTEGER),
+            'time_from_unit': units[0],
+            'price_per_time': get_number(price, 'price_per_time', float, minimum=0),
+            'price_per_time_unit': units[1],
+        })
+
+    return prices
+
+
+def parse_row(row):
+    """
+    Проверенные и приведенные к типам значения строки
+    """
+
+    item = {
+        'rental_point_id': get_number(row, 'rental_point', int, default=0, minimum=0, maximum=MAX_INTEGER) or None,
+        'city': get_text(row, 'city', 200),
+        'address': get_text(row, 'address', 1000),
+        'phone': get_text(row, 'phone', 20),
+        'product': get_text(row, 'product', 200, required=True),
+        'category': get_text(row, 'category', 200),
+        'description': get_text(row, 'description', 2000),
+        'count': get_number(row, 'count', int, minimum=0, maximum=MAX_INTEGER),
+        'is_active': get_boolean(row, 'is_active', default=True),
+        'prices': parse_prices(row.get('prices')),
+    }
+    item.update((flag, get_boolean(row, flag)) for flag in OFFER_FLAGS)
+
+    latitude, longitude = row.get('latitude'), row.get('longitude')
+    if latitude not in (None, '') and longitude not in (None, ''):
+        item['location'] = (get_number(row, 'latitude', float), get_number(row, 'longitude', float))
+        if not (-90 <= item['location'][0] <= 90 and -180 <= item['location'][1] <= 180):
+            raise RowError('Координаты вне допустимого диапазона.')
+    else:
+        item['location'] = None
+
+    if item['rental_point_id'] is None and not (item['city'] and item['address']):
+        raise RowError('Нужно указать rental_point или city и address.')
+
+    return item
+
+
+def lookup_filter(field, values):
+    """
+    Условие `field IN values`, в котором None означает NULL
+    """
+
+    condition = Q(**{f'{field}__in': [value for value in values if value is not None]})
+    if None in values:
+        condition |= Q(**{f'{field}__isnull': True})
+
+    return condition
+
+
+class CatalogLookups:
+    """
+    Словари поиска идентификаторов справочников по значениям из файла. Отсутствующие значения находятся
+    в базе одним запросом на справочник и пачку строк, ненайденные создаются
+    """
+
+    def __init__(self, company_id):
+        self.company_id = company_id
+        self.cities = {}
+        self.categories = {}
+        self.addresses = {}
+        self.products = {}
+        self.rental_points = {}
+        self.company_rental_points = set()
+
+    @staticmethod
+    def find(cache, queryset, fields, keys):
+        """
+        Дополняет `cache` (ключ - кортеж значений `fields`, значение - id) найденными в базе записями.
+        Из нескольких записей с одинаковыми значениями берется созданная первой. Возвращает ненайденные ключи
+        """
+
+        missing = {key for key in keys if key not in cache}
+        if not missing:
+            return set()
+
+        condition = Q()
+        for index, field in enumerate(fields):
+            condition &= lookup_filter(field, {key[index] for key in missing})
+        for pk, *values in queryset.filter(condition).order_by('-id').values_list('id', *fields):
+            if tuple(values) in missing:
+                cache[tuple(values)] = pk
+
+        return missing - cache.keys()
+
+    def resolve_cities(self, names):
+        missing = self.find(self.cities, City.objects.all(), ('name',), {(name,) for name in names})
+        created = City.objects.bulk_create([City(name=name) for name, in missing])
+        self.cities.update({(city.name,): city.id for city in created})
+
+    def resolve_categories(self, names):
+        missing = self.find(self.categories, Category.objects.all(), ('name',), {(name,) for name in names})
+        # Путь категории вычисляется в save(), поэтому новые категории создаются по одной
+        for name, in missing:
+            self.categories[(name,)] = Category.objects.create(name=name).id
+
+    def resolve_addresses(self, locations):
+        """
+        `locations` - словарь (город, адрес) -> координаты для новых адресов
+        """
+
+        self.resolve_cities({city for city, _ in locations})
+        keys = {(self.cities[(city,)], address): location for (city, address), location in locations.items()}
+        missing = self.find(self.addresses, Address.objects.all(), ('city_id', 'address'), keys)
+
+        # Геохеш вычисляется в Address.save(), который bulk_create не вызывает
+        new_addresses = []
+        for city_id, address in missing:
+            location = keys[(city_id, address)]
+            new_addresses.append(Address(
+                city_id=city_id, address=address, latitude=location and location[0],
+                longitude=location and location[1], geohash=encode_geohash(*location) if location else '',
+            ))
+        created = Address.objects.bulk_create(new_addresses)
+        self.addresses.update({(address.city_id, address.address): address.id for address in created})
+
+    def resolve_rental_points(self, phones):
+        """
+        Точки выдачи компании по адресам. `phones` - словарь id адреса -> телефон для новых точек
+        """
+
+        missing = self.find(
+            self.rental_points, RentalPoint.objects.filter(company_id=self.company_id), ('address_id',),
+            {(address_id,) for address_id in phones})
+        created = RentalPoint.objects.bulk_create([
+            RentalPoint(company_id=self.company_id, address_id=address_id, phone=phones[address_id])
+            for address_id, in missing
+        ])
+        self.rental_points.update({(rental_point.address_id,): rental_point.id for rental_point in created})
+
+    def check_rental_points(self, rental_point_ids):
+        """
+        Запоминает, какие из указанных точек выдачи принадлежат компании
+        """
+
+        missing = set(rental_point_ids) - self.company_rental_points
+        if missing:
+            self.company_rental_points.update(RentalPoint.objects.filter(
+                company_id=self.company_id, id__in=missing).values_list('id', flat=True))
+
+    def resolve_products(self, products):
+        """
+        `products` - множество пар (предмет, категория)
+        """
+
+        self.resolve_categories({category for _, category in products if category})
+        keys = {(name, self.categories[(category,)] if category else None) for name, category in products}
+        missing = self.find(self.products, Product.objects.all(), ('name', 'category_id'), keys)
+        created = Product.objects.bulk_create([
+            Product(name=name, category_id=category_id) for name, category_id in missing])
+        self.products.update({(product.name, product.category_id): product.id for product in created})
+
+    def resolve(self, items):
+        """
+        Проставляет строкам id точки выдачи и предмета, создавая недостающие справочники.
+        Возвращает принятые строки и строки с ошибками парами (строка, ошибка)
+        """
+
+        self.check_rental_points({item['rental_point_id'] for item in items if item['rental_point_id']})
+        accepted, failed = [], []
+        for item in items:
+            if item['rental_point_id'] and item['rental_point_id'] not in self.company_rental_points:
+                failed.append((item, RowError(f'Точка выдачи {item["rental_point_id"]} не найдена у компании.')))
+            else:
+                accepted.append(item)
+
+        by_address = [item for item in accepted if not item['rental_point_id']]
+        locations, phones = {}, {}
+        for item in by_address:
+            locations.setdefault((item['city'], item['address']), item['location'])
+        self.resolve_addresses(locations)
+        for item in by_address:
+            item['address_id'] = self.addresses[(self.cities[(item['city'],)], item['address'])]
+            phones.setdefault(item['address_id'], item['phone'])
+        self.resolve_rental_points(phones)
+        for item in by_address:
+            item['rental_point_id'] = self.rental_points[(item['address_id'],)]
+
+        self.resolve_products({(item['product'], item['category']) for item in accepted})
+        for item in accepted:
+            category_id = self.categories[(item['category'],)] if item['category'] else None
+            item['product_id'] = self.products[(item['product'], category_id)]
+
+        return accepted, failed
+
+
+def iter_batches(rows, batch_size):
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def add_error(job, number, error):
+    job.error_count += 1
+    if len(job.errors) < MAX_STORED_ERRORS:
+        job.errors.append({'row': number, 'error': str(error)})
+
+
+def import_batch(job, batch, lookups):
+    """
+    Импортирует пачку пар (номер строки, строка) и сохраняет прогресс задания. Выполняется в транзакции
+    """
+
+    items, failed = [], []
+    for number, row in batch:
+        try:
+            if isinstance(row, RowError):
+                raise row
+            items.append({'number': number, **parse_row(row)})
+        except RowError as error:
+            failed.append((number, error))
+
+    items, skipped = lookups.resolve(items)
+    failed.extend((item['number'], error) for item, error in skipped)
+
+    offers = Offer.objects.bulk_create([
+        Offer(
+            rental_point_id=item['rental_point_id'], product_id=item['product_id'], description=item['description'],
+            count=item['count'], is_active=item['is_active'], **{flag: item[flag] for flag in OFFER_FLAGS},
+        )
+        for item in items
+    ])
+    prices = Price.objects.bulk_create([
+        Price(offer_id=offer.id, **price) for offer, item in zip(offers, items) for price in item['prices']
+    ])
+
+    if offers:
+        offer_ids = [offer.id for offer in offers]
+        rental_point_ids = {offer.rental_point_id for offer in offers}
+        update_search_documents(Offer.objects.filter(id__in=offer_ids))
+        RentalPoint.objects.filter(id__in=rental_point_ids).update(
+            updated_at=Now(), reservations_version=F('reservations_version') + 1)
+        bump_generations(Offer, RentalPoint, Address, City, Category, Product)
+
+    for number, error in sorted(failed, key=lambda pair: pair[0]):
+        add_error(job, number, error)
+    job.rows_processed += len(batch)
+    job.offers_created += len(offers)
+    job.prices_created += len(prices)
+    job.save(update_fields=(
+        'rows_processed', 'offers_created', 'prices_created', 'error_count', 'errors', 'updated_at'))
+
+
+def run_import(job, file, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Импортирует файл задания начиная с первой необработанной строки. `progress(job)` вызывается после каждой пачки.
+    При ошибке задание получает статус failed, обработанные пачки остаются сохраненными
+    """
+
+    job.status = ImportStatuses.RUNNING
+    job.last_error = ''
+    job.save(update_fields=('status', 'last_error', 'updated_at'))
+
+    lookups = CatalogLookups(job.company_id)
+    rows = itertools.islice(enumerate(read_rows(file, job.format), start=1), job.rows_processed, None)
+
+    try:
+        for batch in iter_batches(rows, batch_size):
+            with transaction.atomic():
+                import_batch(job, batch, lookups)
+            if progress is not None:
+                progress(job)
+    except Exception:
+        error = traceback.format_exc()
+        # Счетчики в памяти могли измениться в откаченной транзакции
+        job.refresh_from_db()
+        job.status = ImportStatuses.FAILED
+        job.last_error = error
+        job.save(update_fields=('status', 'last_error', 'updated_at'))
+        raise
+
+    job.status = ImportStatuses.DONE
+    job.save(update_fields=('status', 'updated_at'))
+
+    return job
@@ -0,0 +1,191 @@
+"""
+Варианты изображений предложений: уменьшенные копии и WebP.
+
+Варианты хранятся в том же хранилище рядом с оригиналом под детерминированным именем
+(`images/photo.jpg` -> `images/photo__thumbnail.jpg`, `images/photo__webp.webp`), поэтому их наличие проверяется
+по имени без отдельной таблицы. После загрузки изображений варианты создаются фоновой задачей (offer.tasks)
+вне обработки запроса. Вариант, которого еще нет (изображение загружено до появления конвейера или фоновая задача
+не успела выполниться), создается по первому обращению и дальше отдается с диска.
+
+Оригиналы хранятся по содержимому (см. core.blobs): одинаковые фотографии, загруженные повторно, получают
+ту же запись OfferImage, тот же файл и те же варианты.
+"""
+import os
+import threading
+from io import BytesIO
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from PIL import Image, ImageOps
+
+from core.blobs import hash_file, store_blob
+
+
+VARIANT_CACHE_PREFIX = 'offer_image_variant'
+VARIANT_CACHE_TIMEOUT = 24 * 60 * 60
+# Отсутствие варианта запоминается ненадолго: фоновая задача может создать его в любой момент
+VARIANT_MISSING_CACHE_TIMEOUT = 60
+
+# Вариант: (наибольшая сторона в пикселях или None без уменьшения, формат Pillow, расширение, параметры сохранения)
+VARIANTS = {
+    'thumbnail': (320, 'JPEG', 'jpg', {'quality': 80, 'optimize': True, 'progressive': True}),
+    'thumbnail_webp': (320, 'WEBP', 'webp', {'quality': 75, 'method': 4}),
+    'webp': (1600, 'WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+
+VARIANT_LOCKS = tuple(threading.Lock() for _ in range(64))
+
+
+class ImageVariantError(Exception):
+    """
+    Вариант изображения не может быть создан
+    """
+
+
+def get_or_create_image(file, name):
+    """
+    Изображение предложения с содержимым файла: существующее с тем же хешем или новое.
+    Возвращает (изображение, создано ли оно)
+    """
+
+    OfferImage = apps.get_model('offer', 'OfferImage')
+
+    checksum = hash_file(file)
+    image = OfferImage.objects.filter(checksum=checksum).first()
+    if image is not None:
+        return image, False
+
+    image_name = store_blob(file, checksum, name)
+    try:
+        with transaction.atomic():
+            return OfferImage.objects.create(name=name, image=image_name, checksum=checksum), True
+    except IntegrityError:
+        # То же содержимое одновременно сохранил другой запрос
+        return OfferImage.objects.get(checksum=checksum), False
+
+
+def get_variant_name(name, variant):
+    """
+    Имя файла варианта в хранилище рядом с оригиналом
+    """
+
+    root, _ = os.path.splitext(name)
+    return f'{root}__{variant}.{VARIANTS[variant][2]}'
+
+
+def get_source_root(name):
+    """
+    Имя файла без расширения и без суффикса варианта: общее для оригинала и всех его вариантов
+    """
+
+    root, _ = os.path.splitext(name)
+    source_root, _, variant = root.rpartition('__')
+    return source_root if source_root and variant in VARIANTS else root
+
+
+def get_variant_lock(name):
+    return VARIANT_LOCKS[hash(name) % len(VARIANT_LOCKS)]
+
+
+def get_variant_cache_key(name):
+    return f'{VARIANT_CACHE_PREFIX}:{name}'
+
+
+def check_variants(names):
+    """
+    {имя: есть ли файл варианта}. Результаты проверки хранилища запоминаются в кэше: наличие на сутки,
+    отсутствие на VARIANT_MISSING_CACHE_TIMEOUT, чтобы список изображений не обращался к хранилищу
+    за каждым вариантом каждого изображения
+    """
+
+    keys = {get_variant_cache_key(name): name for name in names}
+    cached = cache.get_many(keys)
+    result = {keys[key]: exists for key, exists in cached.items()}
+
+    for key, name in keys.items():
+        if key not in cached:
+            result[name] = default_storage.exists(name)
+            cache.set(key, result[name], VARIANT_CACHE_TIMEOUT if result[name] else VARIANT_MISSING_CACHE_TIMEOUT)
+
+    return result
+
+
+def variant_exists(name):
+    return check_variants([name])[name]
+
+
+def render_variant(file, variant):
+    size, image_format, _, options = VARIANTS[variant]
+
+    try:
+        with Image.open(file) as image:
+            image = ImageOps.exif_transpose(image)
+            if size:
+                image.thumbnail((size, size), Image.LANCZOS)
+            if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+
+            content = BytesIO()
+            image.save(content, image_format, **options)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        raise ImageVariantError(f'Не удалось обработать изображение: {error}') from error
+
+    return content.getvalue()
+
+
+def generate_variant(name, variant):
+    """
+    Создает вариант изображения `name`, если его еще нет, и возвращает имя файла варианта
+    """
+
+    variant_name = get_variant_name(name, variant)
+    if variant_exists(variant_name):
+        return variant_name
+
+    # Параллельные запросы одного варианта ждут первый вместо повторной обработки
+    with get_variant_lock(variant_name):
+        if default_storage.exists(variant_name):
+            return variant_name
+
+        with default_storage.open(name, 'rb') as file:
+            content = render_variant(file, variant)
+
+        # Хранилище не должно переименовывать вариант: имя детерминировано
+        saved_name = default_storage.save(variant_name, ContentFile(content))
+        if saved_name != variant_name:
+            default_storage.delete(saved_name)
+
+    cache.set(get_variant_cache_key(variant_name), True, VARIANT_CACHE_TIMEOUT)
+    return variant_name
+
+
+def generate_variants(name, variants=None):
+    """
+    Создает все варианты изображения. Ошибки отдельных вариантов не прерывают обработку остальных
+    """
+
+    generated = {}
+    for variant in variants or VARIANTS:
+        try:
+            generated[variant] = generate_variant(name, variant)
+        except (ImageVariantError, OSError):
+            generated[variant] = None
+
+    return generated
+
+
+def get_variant_urls(name):
+    """
+    {вариант: URL файла} для уже созданных вариантов, None для еще не созданных
+    """
+
+    names = {variant: get_variant_name(name, variant) for variant in VARIANTS}
+    exists = check_variants(names.values())
+
+    return {
+        variant: default_storage.url(variant_name) if exists[variant_name] else None
+        for variant, variant_name in names.items()
+    }
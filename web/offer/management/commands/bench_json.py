@@ -0,0 +1,128 @@
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from api.core.renderers import FastJSONRenderer
+from api.public.company.serializers import OfferReadOnlySerializer
+from api.public.offer.serializers import OfferSerializer
+from company.models import Company, RentalPoint
+from core.collections import ReservationStatuses
+from offer.models import Offer, Price, Rating
+from product.models import Product
+from reference.models import Address, Category, City
+from user.models import User
+
+
+class Command(BaseCommand):
+    """
+    Сравнение JSONRenderer и FastJSONRenderer на данных списков предложений: время кодирования и пиковая память
+    (tracemalloc). Данные создаются внутри транзакции, которая откатывается по завершении
+    """
+
+    help = 'Бенчмарк JSON-рендереров на данных предложений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--offers', type=int, default=2000, help='Количество предложений в ответе')
+        parser.add_argument('--repeat', type=int, default=20, help='Количество повторов кодирования')
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+
+        with transaction.atomic():
+            offers = self.seed_offers(options['offers'])
+            payloads = {
+                'OfferSerializer': OfferSerializer(offers, many=True).data,
+                'OfferReadOnlySerializer': OfferReadOnlySerializer(offers, many=True).data,
+                'Decimal/datetime/lazy': self.raw_payload(options['offers']),
+            }
+            transaction.set_rollback(True)
+
+        for name, payload in payloads.items():
+            with override_settings(FAST_JSON=True):
+                fast = self.measure(FastJSONRenderer(), payload, options['repeat'])
+            standard = self.measure(JSONRenderer(), payload, options['repeat'])
+
+            if json.loads(fast[0]) != json.loads(standard[0]):
+                self.stderr.write(f'{name}: результаты рендереров различаются')
+
+            self.stdout.write(
+                f'{name:24} {len(standard[0]) / 1024:8.0f} КБ   '
+                f'JSONRenderer {standard[1]:7.2f} мс, {standard[2] / 1024:7.0f} КБ пик   '
+                f'FastJSONRenderer {fast[1]:7.2f} мс, {fast[2] / 1024:7.0f} КБ пик   '
+                f'ускорение {standard[1] / fast[1]:4.1f}x'
+            )
+
+        if not settings.FAST_JSON:
+            self.stdout.write('FAST_JSON выключен в настройках: API использует стандартный модуль json')
+
+    def seed_offers(self, count):
+        city = City.objects.create(name='Москва')
+        category = Category.objects.create(name='Велосипеды')
+        product = Product.objects.create(name='Горный велосипед', category=category)
+        company = Company.objects.create(name='Прокат')
+        user = User.objects.create(email='bench-json@example.com')
+        rental_points = []
+        for index in range(max(count // 20, 1)):
+            address = Address.objects.create(
+                address=f'ул. Лесная, {index}', city=city,
+                latitude=Decimal(f'{55 + random.random():.15f}'), longitude=Decimal(f'{37 + random.random():.15f}'),
+            )
+            rental_points.append(RentalPoint.objects.create(address=address, company=company, phone='+79990000000'))
+
+        offers = Offer.objects.bulk_create([
+            Offer(count=random.randint(1, 20), description='Прокат велосипеда с шлемом и замком',
+                  product=product, rental_point=random.choice(rental_points))
+            for _ in range(count)
+        ])
+        Price.objects.bulk_create([
+            Price(offer=offer, time_from=time_from, price_per_time=random.randint(100, 500))
+            for offer in offers for time_from in (1, 3, 24)
+        ])
+        Rating.objects.bulk_create([
+            Rating(offer=offer, user=user, mark=random.randint(1, 5), comment='Все отлично') for offer in offers
+        ])
+
+        return list(Offer.objects.filter(id__in=[offer.id for offer in offers]).select_related(
+            'product__category', 'rental_point__address__city').prefetch_related('prices', 'ratings'))
+
+    def raw_payload(self, count):
+        now = timezone.now()
+        return [
+            {
+                'id': index,
+                'latitude': Decimal(f'{55 + random.random():.15f}'),
+                'longitude': Decimal(f'{37 + random.random():.15f}'),
+                'datetime_from': now + timedelta(hours=index),
+                'datetime_to': now + timedelta(hours=index + 1),
+                'status': gettext_lazy('Принята'),
+                'status_code': ReservationStatuses.ACCEPTED,
+            }
+            for index in range(count)
+        ]
+
+    def measure(self, renderer, payload, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            content = renderer.render(payload, 'application/json')
+            timings.append((time.perf_counter() - started) * 1000)
+
+        tracemalloc.start()
+        renderer.render(payload, 'application/json')
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        return content, statistics.median(timings), peak
@@ -0,0 +1,117 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.public.offer.filters import OfferSearchFilter
+from company.models import Company, RentalPoint
+from offer.models import Offer
+from offer.search import update_search_documents
+from product.models import Product
+from reference.models import Address, Category, City
+
+
+CITIES = ('Москва', 'Санкт-Петербург', 'Екатеринбург', 'Новосибирск', 'Казань', 'Красноярск', 'Сочи', 'Мурманск')
+CATEGORIES = ('Лыжи', 'Сноуборды', 'Велосипеды', 'Самокаты', 'Палатки', 'Байдарки', 'Коньки', 'Сапборды')
+ADJECTIVES = ('горные', 'беговые', 'детские', 'складные', 'туристические', 'прогулочные', 'спортивные', 'надувные')
+DESCRIPTION_WORDS = (
+    'прокат', 'аренда', 'новый', 'надежный', 'легкий', 'комплект', 'шлем', 'чехол', 'доставка', 'скидка', 'сезон',
+    'выходные', 'размер', 'ботинки', 'крепления', 'насос', 'весла', 'жилет', 'рюкзак', 'фонарь',
+)
+
+
+class Command(BaseCommand):
+    """
+    Сравнение поиска предложений через SearchFilter (icontains по трем join) и через поисковый документ
+    на синтетическом каталоге. Каталог создается внутри транзакции, которая откатывается по завершении
+    """
+
+    help = 'Бенчмарк поиска предложений: icontains SearchFilter против полнотекстового и триграммного поиска'
+
+    search_fields = ('product__category__name', 'rental_point__address__city__name', 'rental_point__company__name')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--offers', type=int, default=200000, help='Количество синтетических предложений')
+        parser.add_argument('--repeat', type=int, default=5, help='Количество повторов каждого запроса')
+        parser.add_argument('--page-size', type=int, default=50, help='Размер страницы результата')
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            self.seed_catalog(options['offers'])
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'Каталог из {options["offers"]} предложений создан за {elapsed:.1f} с')
+
+            terms = ('Москва', 'лыжи', 'сноуборд', 'Казань велосипеды', 'Компания 17', 'снаборд', 'Новосибрск')
+            for term in terms:
+                legacy = self.measure(self.legacy_search, term, options)
+                engine = self.measure(self.engine_search, term, options)
+                self.stdout.write(
+                    f'{term!r:24} SearchFilter: {legacy[0]:8.1f} мс ({legacy[1]:3} строк)   '
+                    f'поисковый документ: {engine[0]:8.1f} мс ({engine[1]:3} строк)'
+                )
+
+            transaction.set_rollback(True)
+
+    def seed_catalog(self, offers_count):
+        cities = City.objects.bulk_create([City(name=name) for name in CITIES])
+        categories = Category.objects.bulk_create([Category(name=name) for name in CATEGORIES])
+        products = Product.objects.bulk_create([
+            Product(name=f'{adjective.capitalize()} {category.name.lower()}', category=category)
+            for category in categories for adjective in ADJECTIVES
+        ])
+        companies = Company.objects.bulk_create([Company(name=f'Компания {index}') for index in range(200)])
+        addresses = Address.objects.bulk_create([
+            Address(address=f'ул. Лесная, {index}', city=random.choice(cities)) for index in range(1000)
+        ])
+        rental_points = RentalPoint.objects.bulk_create([
+            RentalPoint(address=address, company=random.choice(companies)) for address in addresses
+        ])
+
+        batch = []
+        for _ in range(offers_count):
+            batch.append(Offer(
+                count=random.randint(1, 20),
+                description=' '.join(random.sample(DESCRIPTION_WORDS, 6)),
+                product=random.choice(products),
+                rental_point=random.choice(rental_points),
+            ))
+            if len(batch) == 5000:
+                Offer.objects.bulk_create(batch)
+                batch = []
+        Offer.objects.bulk_create(batch)
+
+        update_search_documents(Offer.objects.all())
+
+    def request(self, term):
+        return Request(APIRequestFactory().get('/', {'search': term}))
+
+    def legacy_search(self, term, page_size):
+        filter_backend = SearchFilter()
+        queryset = filter_backend.filter_queryset(self.request(term), Offer.objects.all(), self)
+
+        return list(queryset.order_by('-id')[:page_size])
+
+    def engine_search(self, term, page_size):
+        filter_backend = OfferSearchFilter()
+        request = self.request(term)
+        queryset = filter_backend.filter_queryset(request, Offer.objects.all(), self)
+
+        return list(queryset.order_by(*filter_backend.get_ordering(request, queryset, self))[:page_size])
+
+    def measure(self, search, term, options):
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            rows = search(term, options['page_size'])
+            timings.append((time.perf_counter() - started) * 1000)
+
+        return statistics.median(timings), len(rows)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from offer.models import ImageUpload
+from offer.uploads import discard_part, get_expired_uploads
+
+
+class Command(BaseCommand):
+    """
+    Команда удаления брошенных загрузок изображений по частям вместе с их временными файлами
+    """
+
+    help = 'Удаляет незавершенные загрузки изображений, не получавшие частей дольше заданного времени'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Время без новых частей в часах')
+
+    def handle(self, *args, **options):
+        removed = 0
+        for upload in get_expired_uploads(ImageUpload.objects.all(), options['hours']).iterator():
+            discard_part(upload)
+            upload.delete()
+            removed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Удалено незавершенных загрузок: {removed}'))
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from core.blobs import BLOB_PREFIX, walk_files
+from offer.images import get_source_root
+from offer.models import ImageUpload, Offer, OfferImage
+
+
+class Command(BaseCommand):
+    """
+    Сборка мусора изображений предложений: удаляет изображения, не привязанные ни к одному предложению,
+    и файлы (оригиналы и варианты), на которые не ссылается ни одно изображение. Изображения недавних загрузок
+    и недавно созданные файлы не удаляются: их еще может привязать незавершенный запрос
+    """
+
+    help = 'Удаляет неиспользуемые изображения предложений и их файлы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=int, default=24, help='Не удалять объекты моложе, часов')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет удалено')
+
+    def handle(self, *args, **options):
+        threshold = timezone.now() - timedelta(hours=options['grace_hours'])
+
+        linked = Offer.images.through.objects.values('offerimage_id')
+        recent = ImageUpload.objects.filter(updated_at__gte=threshold, image__isnull=False).values('image_id')
+        used = Q(id__in=linked) | Q(id__in=recent)
+        orphans = OfferImage.objects.exclude(used)
+
+        orphans_count = orphans.count()
+        if not options['dry_run']:
+            orphans.delete()
+
+        referenced = {
+            get_source_root(name) for name in OfferImage.objects.filter(used).values_list('image', flat=True).iterator()
+        }
+
+        removed = size = 0
+        for name in walk_files(BLOB_PREFIX):
+            if get_source_root(name) in referenced or default_storage.get_modified_time(name) >= threshold:
+                continue
+
+            removed += 1
+            size += default_storage.size(name)
+            if options['dry_run']:
+                self.stdout.write(name)
+            else:
+                default_storage.delete(name)
+
+        action = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action}: изображений без предложений {orphans_count}, файлов {removed} ({size / 1024 / 1024:.1f} МБ)'))
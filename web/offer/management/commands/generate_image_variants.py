@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from offer.images import VARIANTS, generate_variants
+from offer.models import OfferImage
+
+
+class Command(BaseCommand):
+    """
+    Команда создания недостающих вариантов изображений предложений, например для изображений,
+    загруженных до появления конвейера
+    """
+
+    help = 'Создает недостающие уменьшенные копии и WebP-варианты изображений предложений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Количество потоков обработки')
+        parser.add_argument('--variant', action='append', choices=sorted(VARIANTS), help='Создать только вариант')
+
+    def handle(self, *args, **options):
+        names = OfferImage.objects.exclude(image='').values_list('image', flat=True).iterator()
+
+        processed = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for generated in executor.map(lambda name: generate_variants(name, options['variant']), names):
+                processed += 1
+                failed += sum(1 for variant_name in generated.values() if variant_name is None)
+
+        self.stdout.write(self.style.SUCCESS(f'Обработано изображений: {processed}, ошибок вариантов: {failed}'))
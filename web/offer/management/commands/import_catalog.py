@@ -0,0 +1,85 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from company.models import Company
+from core.blobs import hash_file
+from core.collections import ImportFormats, ImportStatuses
+from offer.catalog import DEFAULT_BATCH_SIZE, get_format, run_import
+from offer.models import CatalogImport
+
+
+class Command(BaseCommand):
+    """
+    Команда импорта каталога предложений компании из файла CSV или JSON Lines (см. offer.catalog).
+    Прерванный импорт продолжается с первой необработанной строки: `--resume <id задания>`
+    """
+
+    help = 'Импортирует предложения и цены компании из CSV или JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу')
+        parser.add_argument('--company', type=int, help='Идентификатор компании')
+        parser.add_argument('--format', choices=[format for format, _ in ImportFormats.CHOICES],
+                            help='Формат файла, по умолчанию по расширению')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Строк в одной транзакции')
+        parser.add_argument('--resume', type=int, metavar='JOB_ID', help='Продолжить прерванный импорт')
+
+    def handle(self, *args, **options):
+        path = os.path.abspath(options['path'])
+        if not os.path.isfile(path):
+            raise CommandError(f'Файл {path} не найден.')
+
+        with open(path, 'rb') as file:
+            checksum = hash_file(file)
+
+            if options['resume']:
+                job = self.get_job(options['resume'], checksum)
+            else:
+                if not options['company'] or not Company.objects.filter(pk=options['company']).exists():
+                    raise CommandError('Нужно указать существующую компанию: --company <id>.')
+                job = CatalogImport.objects.create(
+                    company_id=options['company'], source=path, format=options['format'] or get_format(path),
+                    checksum=checksum,
+                )
+                self.stdout.write(f'Задание импорта #{job.id}')
+
+            self.started = time.monotonic()
+            self.skipped = job.rows_processed
+            try:
+                run_import(job, file, options['batch_size'], progress=self.report)
+            except Exception as error:
+                raise CommandError(
+                    f'Импорт прерван на строке {job.rows_processed + 1}: {error}. '
+                    f'Продолжить: import_catalog {path} --resume {job.id}'
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт #{job.id} завершен: строк {job.rows_processed}, предложений {job.offers_created}, '
+            f'цен {job.prices_created}, строк с ошибками {job.error_count}'
+        ))
+        for error in job.errors:
+            self.stdout.write(f'  строка {error["row"]}: {error["error"]}')
+
+    def get_job(self, job_id, checksum):
+        try:
+            job = CatalogImport.objects.get(pk=job_id)
+        except CatalogImport.DoesNotExist:
+            raise CommandError(f'Задание импорта #{job_id} не найдено.')
+
+        if job.status == ImportStatuses.DONE:
+            raise CommandError(f'Задание импорта #{job_id} уже завершено.')
+        if job.checksum != checksum:
+            raise CommandError('Файл отличается от файла задания, продолжить импорт нельзя.')
+
+        self.stdout.write(f'Продолжение импорта #{job.id} со строки {job.rows_processed + 1}')
+        return job
+
+    def report(self, job):
+        elapsed = time.monotonic() - self.started
+        rate = (job.rows_processed - self.skipped) / elapsed if elapsed else 0
+        self.stdout.write(
+            f'  строк {job.rows_processed}, предложений {job.offers_created}, цен {job.prices_created}, '
+            f'ошибок {job.error_count}, {rate:.0f} строк/с'
+        )
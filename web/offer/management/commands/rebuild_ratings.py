@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from offer.ratings import rebuild_offer_ratings, rebuild_rental_point_ratings
+
+
+class Command(BaseCommand):
+    """
+    Команда полного пересчета хранимых агрегатов рейтинга предложений и точек выдачи
+    """
+
+    help = 'Пересчитывает средние оценки, количество оценок и гистограммы предложений и точек выдачи'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Размер пакета обновления')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_offer_ratings(batch_size=options['batch_size'])
+            rebuild_rental_point_ratings(batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS('Агрегаты рейтинга пересчитаны'))
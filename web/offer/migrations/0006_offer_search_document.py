@@ -0,0 +1,38 @@
+# Generated by Django 3.2.3 on 2026-10-18 12:04
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+import offer.search
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offer', '0005_offer_rating_aggregates'),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.TrigramExtension(),
+        migrations.AddField(
+            model_name='offer',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Поисковый документ'),
+        ),
+        migrations.AddField(
+            model_name='offer',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(offer.search.fill_search_documents, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='offer',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='offer_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='offer_search_document_trgm', opclasses=('gin_trgm_ops',)),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.3 on 2026-10-18 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offer', '0008_image_upload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='offerimage',
+            name='checksum',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='SHA-256 содержимого'),
+        ),
+        migrations.AlterField(
+            model_name='offerimage',
+            name='image',
+            field=models.FileField(max_length=255, upload_to='images', verbose_name='Файл'),
+        ),
+        migrations.AddConstraint(
+            model_name='offerimage',
+            constraint=models.UniqueConstraint(condition=models.Q(('checksum', ''), _negated=True), fields=('checksum',), name='offer_image_unique_checksum'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.3 on 2026-10-18 12:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0007_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('offer', '0009_image_checksum'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения')),
+                ('date_created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('file', models.FileField(blank=True, max_length=255, upload_to='imports/', verbose_name='Файл')),
+                ('source', models.CharField(blank=True, max_length=1000, verbose_name='Источник')),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('jsonl', 'JSON Lines')], default='csv', max_length=10, verbose_name='Формат')),
+                ('checksum', models.CharField(blank=True, max_length=64, verbose_name='SHA-256 файла')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('running', 'Выполняется'), ('done', 'Выполнен'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('rows_processed', models.PositiveIntegerField(default=0, verbose_name='Обработано строк')),
+                ('offers_created', models.PositiveIntegerField(default=0, verbose_name='Создано предложений')),
+                ('prices_created', models.PositiveIntegerField(default=0, verbose_name='Создано цен')),
+                ('error_count', models.PositiveIntegerField(default=0, verbose_name='Строк с ошибками')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Ошибки строк')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='company.company', verbose_name='Компания')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Импорт каталога',
+                'verbose_name_plural': 'Импорты каталога',
+            },
+        ),
+    ]
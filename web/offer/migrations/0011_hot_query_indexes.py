@@ -0,0 +1,42 @@
+# Generated by Django 3.2.3 on 2026-10-18 12:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('company', '0010_reservation_hot_indexes'),
+        ('offer', '0010_catalog_import'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['rental_point', 'is_active'], name='offer_rental_point_active'),
+        ),
+        migrations.AddIndex(
+            model_name='price',
+            index=models.Index(fields=['offer', 'time_from'], name='price_offer_time_from'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['offer', 'mark'], name='rating_offer_mark'),
+        ),
+        migrations.AlterField(
+            model_name='offer',
+            name='rental_point',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='offers', to='company.rentalpoint', verbose_name='Точка выдачи'),
+        ),
+        migrations.AlterField(
+            model_name='price',
+            name='offer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='prices', to='offer.offer', verbose_name='Предложение'),
+        ),
+        migrations.AlterField(
+            model_name='rating',
+            name='offer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='ratings', to='offer.offer', verbose_name='Предложение'),
+        ),
+    ]
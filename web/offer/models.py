@@ -1,11 +1,15 @@
+import uuid
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 
-from core.collections import TimeUnits
-from core.models import AbstractImage
+from core.collections import ImportFormats, ImportStatuses, TimeUnits, UploadStatuses
+from core.models import AbstractImage, AbstractRatingAggregate, AbstractUpdatedAt
 
 
-class Offer(models.Model):
+class Offer(AbstractRatingAggregate, AbstractUpdatedAt):
     """
     Модель предложения
     """
@@ -21,18 +25,26 @@ class Offer(models.Model):
         'product.Product', verbose_name='Предмет аренды', on_delete=models.SET_NULL, null=True, blank=True)
     rental_point = models.ForeignKey(
         'company.RentalPoint', verbose_name='Точка выдачи', on_delete=models.CASCADE,
-        related_name='offers')
+        related_name='offers', db_index=False)
     images = models.ManyToManyField('offer.OfferImage', verbose_name='Изображения', related_name='+', blank=True)
+    search_vector = SearchVectorField('Поисковый вектор', null=True, editable=False)
+    search_document = models.TextField('Поисковый документ', blank=True, default='', editable=False)
 
     class Meta:
         verbose_name = 'Предложение'
         verbose_name_plural = 'Предложения'
+        indexes = [
+            GinIndex(fields=('search_vector',), name='offer_search_vector_gin'),
+            GinIndex(fields=('search_document',), name='offer_search_document_trgm', opclasses=('gin_trgm_ops',)),
+            # Заменяет индекс внешнего ключа rental_point: активные предложения точек выдачи (слоты, страница точки)
+            models.Index(fields=('rental_point', 'is_active'), name='offer_rental_point_active'),
+        ]
 
     def __str__(self):
         return f'{self.description[:30]}: {self.count}'
 
 
-class Price(models.Model):
+class Price(AbstractUpdatedAt):
     """
     Модель цены
     """
@@ -44,17 +56,21 @@ class Price(models.Model):
     price_per_time_unit = models.CharField(
         'Единица измерения', max_length=10, choices=TimeUnits.CHOICES, default=TimeUnits.HOUR)
     offer = models.ForeignKey(
-        'offer.Offer', verbose_name='Предложение', related_name='prices', on_delete=models.CASCADE)
+        'offer.Offer', verbose_name='Предложение', related_name='prices', on_delete=models.CASCADE, db_index=False)
 
     class Meta:
         verbose_name = 'Цена'
         verbose_name_plural = 'Цены'
+        indexes = [
+            # Заменяет индекс внешнего ключа offer: ступени цен предложения по порядку (выгрузка, offer.pricing)
+            models.Index(fields=('offer', 'time_from'), name='price_offer_time_from'),
+        ]
 
     def __str__(self):
         return f'От {self.time_from} {self.time_from_unit} цена: {self.price_per_time} за {self.price_per_time_unit}'
 
 
-class Rating(models.Model):
+class Rating(AbstractUpdatedAt):
     """
     Модель рейтинга предложения
     """
@@ -62,12 +78,16 @@ class Rating(models.Model):
     mark = models.SmallIntegerField('Оценка', validators=[MinValueValidator(1), MaxValueValidator(5)])
     comment = models.CharField('Комментарий', max_length=2000, blank=True)
     offer = models.ForeignKey(
-        'offer.Offer', related_name='ratings', verbose_name='Предложение', on_delete=models.CASCADE)
+        'offer.Offer', related_name='ratings', verbose_name='Предложение', on_delete=models.CASCADE, db_index=False)
     user = models.ForeignKey('user.User', verbose_name='Пользователь', on_delete=models.CASCADE)
 
     class Meta:
         verbose_name = 'Оценка'
         verbose_name_plural = 'Оценки'
+        indexes = [
+            # Заменяет индекс внешнего ключа offer: гистограмма оценок предложения читается только из индекса
+            models.Index(fields=('offer', 'mark'), name='rating_offer_mark'),
+        ]
 
     def __str__(self):
         return f'{self.mark}'
@@ -75,8 +95,69 @@ class Rating(models.Model):
 
 class OfferImage(AbstractImage):
     """
-    Модель изображения предложения
+    Модель изображения предложения. Изображения с одинаковым содержимым хранятся одной записью и одним файлом
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('checksum',), condition=~models.Q(checksum=''), name='offer_image_unique_checksum'),
+        ]
+
+
+class ImageUpload(AbstractUpdatedAt):
+    """
+    Модель загрузки изображения предложения по частям.
+    Части дописываются во временный файл, после получения всего файла создается изображение предложения
     """
 
-    pass
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    date_created = models.DateTimeField('Дата создания', auto_now_add=True)
+    name = models.CharField('Имя файла', max_length=255)
+    size = models.PositiveBigIntegerField('Размер')
+    received = models.PositiveBigIntegerField('Получено байт', default=0)
+    status = models.CharField(
+        'Статус', max_length=10, choices=UploadStatuses.CHOICES, default=UploadStatuses.PENDING)
+    user = models.ForeignKey(
+        'user.User', verbose_name='Пользователь', related_name='+', on_delete=models.CASCADE)
+    image = models.ForeignKey(
+        'offer.OfferImage', verbose_name='Изображение', related_name='+', on_delete=models.SET_NULL, null=True,
+        blank=True)
 
+    class Meta:
+        verbose_name = 'Загрузка изображения'
+        verbose_name_plural = 'Загрузки изображений'
+
+    def __str__(self):
+        return f'{self.name}: {self.received}/{self.size}'
+
+
+class CatalogImport(AbstractUpdatedAt):
+    """
+    Модель импорта каталога предложений компании из файла CSV или JSON Lines (см. offer.catalog).
+    Прогресс сохраняется после каждой пачки строк, поэтому прерванный импорт продолжается с первой необработанной строки
+    """
+
+    date_created = models.DateTimeField('Дата создания', auto_now_add=True)
+    company = models.ForeignKey('company.Company', verbose_name='Компания', related_name='+', on_delete=models.CASCADE)
+    user = models.ForeignKey(
+        'user.User', verbose_name='Пользователь', related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
+    file = models.FileField('Файл', upload_to='imports/', max_length=255, blank=True)
+    source = models.CharField('Источник', max_length=1000, blank=True)
+    format = models.CharField('Формат', max_length=10, choices=ImportFormats.CHOICES, default=ImportFormats.CSV)
+    checksum = models.CharField('SHA-256 файла', max_length=64, blank=True)
+    status = models.CharField(
+        'Статус', max_length=10, choices=ImportStatuses.CHOICES, default=ImportStatuses.PENDING)
+    rows_processed = models.PositiveIntegerField('Обработано строк', default=0)
+    offers_created = models.PositiveIntegerField('Создано предложений', default=0)
+    prices_created = models.PositiveIntegerField('Создано цен', default=0)
+    error_count = models.PositiveIntegerField('Строк с ошибками', default=0)
+    errors = models.JSONField('Ошибки строк', default=list, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        verbose_name = 'Импорт каталога'
+        verbose_name_plural = 'Импорты каталога'
+
+    def __str__(self):
+        return f'{self.source}: {self.get_status_display()}, {self.rows_processed} строк'
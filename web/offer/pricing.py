@@ -0,0 +1,163 @@
+"""
+Расчет стоимости аренды по ценовым ступеням предложения.
+
+Ступень `Price` действует для аренды длительностью от `time_from` `time_from_unit` и стоит `price_per_time`
+за каждую начатую `price_per_time_unit`. Для длительности применяется ступень с наибольшим порогом, не превышающим
+ее, аренда короче первой ступени оплачивается как минимальный срок первой ступени.
+
+Ступени предложения один раз нормализуются в минуты (отсортированные пороги, длина оплачиваемой единицы и ее цена)
+и хранятся в кэше до изменения цен. Ключ кэша включает поколение цен из базы (см. core.cache): кэш в памяти
+процесса у каждого процесса свой, и изменение цены в одном процессе должно сбрасывать ступени во всех.
+Стоимость набора длительностей считается одним проходом по отсортированным длительностям и порогам.
+"""
+import math
+from bisect import bisect_right
+
+from django.apps import apps
+from django.core.cache import cache
+
+from core.cache import get_generations
+from core.collections import TimeUnits
+
+
+PRICE_TIERS_CACHE_PREFIX = 'offer_price_tiers'
+PRICE_TIERS_CACHE_TIMEOUT = 24 * 60 * 60
+UNIT_MINUTES = {
+    TimeUnits.MINUTE: 1,
+    TimeUnits.HOUR: 60,
+    TimeUnits.DAY: 24 * 60,
+}
+
+
+class PriceTiers:
+    """
+    Нормализованные ступени цен предложения: пороги в минутах по возрастанию, длина оплачиваемой единицы
+    в минутах и цена единицы для каждой ступени
+    """
+
+    __slots__ = ('thresholds', 'unit_minutes', 'unit_prices')
+
+    def __init__(self, thresholds, unit_minutes, unit_prices):
+        self.thresholds = thresholds
+        self.unit_minutes = unit_minutes
+        self.unit_prices = unit_prices
+
+    def __bool__(self):
+        return bool(self.thresholds)
+
+    def cost(self, tier, minutes):
+        minutes = max(minutes, self.thresholds[tier])
+        return math.ceil(minutes / self.unit_minutes[tier]) * self.unit_prices[tier]
+
+    def quote(self, minutes):
+        """
+        Стоимость аренды на `minutes` минут или None, если цены не заданы
+        """
+
+        if not self:
+            return None
+
+        return self.cost(max(bisect_right(self.thresholds, minutes) - 1, 0), minutes)
+
+    def quote_many(self, durations, order=None):
+        """
+        Стоимость для последовательности длительностей в минутах, в том же порядке.
+        `order` - индексы длительностей по возрастанию, если уже посчитаны
+        """
+
+        if not self:
+            return [None] * len(durations)
+
+        if order is None:
+            order = sorted(range(len(durations)), key=durations.__getitem__)
+
+        quotes = [None] * len(durations)
+        tier, last_tier = 0, len(self.thresholds) - 1
+        for index in order:
+            minutes = durations[index]
+            while tier < last_tier and self.thresholds[tier + 1] <= minutes:
+                tier += 1
+            quotes[index] = self.cost(tier, minutes)
+
+        return quotes
+
+
+def normalize_tiers(prices):
+    """
+    Нормализует ступени из последовательности (time_from, time_from_unit, price_per_time, price_per_time_unit).
+    При совпадении порогов действует ступень, указанная последней
+    """
+
+    tiers = {}
+    for time_from, time_from_unit, price_per_time, price_per_time_unit in prices:
+        tiers[max(time_from, 0) * UNIT_MINUTES[time_from_unit]] = (
+            UNIT_MINUTES[price_per_time_unit], price_per_time)
+
+    thresholds = tuple(sorted(tiers))
+    return PriceTiers(
+        thresholds,
+        tuple(tiers[threshold][0] for threshold in thresholds),
+        tuple(tiers[threshold][1] for threshold in thresholds),
+    )
+
+
+def get_cache_key(offer_id, generation):
+    return f'{PRICE_TIERS_CACHE_PREFIX}:{generation}:{offer_id}'
+
+
+def get_price_tiers(offer_ids):
+    """
+    Нормализованные ступени предложений: {offer_id: PriceTiers}. Отсутствующие в кэше загружаются одним запросом
+    """
+
+    Price = apps.get_model('offer', 'Price')
+
+    generation, = get_generations(('offer.price',))
+    keys = {offer_id: get_cache_key(offer_id, generation) for offer_id in offer_ids}
+    cached = cache.get_many(keys.values())
+    result = {offer_id: cached[key] for offer_id, key in keys.items() if key in cached}
+
+    missing = [offer_id for offer_id in keys if offer_id not in result]
+    if missing:
+        prices = {offer_id: [] for offer_id in missing}
+        for offer_id, *price in Price.objects.filter(offer_id__in=missing).order_by('id').values_list(
+                'offer_id', 'time_from', 'time_from_unit', 'price_per_time', 'price_per_time_unit'):
+            prices[offer_id].append(price)
+
+        loaded = {offer_id: normalize_tiers(offer_prices) for offer_id, offer_prices in prices.items()}
+        cache.set_many({keys[offer_id]: tiers for offer_id, tiers in loaded.items()}, PRICE_TIERS_CACHE_TIMEOUT)
+        result.update(loaded)
+
+    return result
+
+
+def invalidate_price_tiers(*offer_ids):
+    """
+    Сбрасывает ступени предложений в кэше сразу, не дожидаясь фиксации транзакции и увеличения поколения цен
+    """
+
+    generation, = get_generations(('offer.price',))
+    cache.delete_many([get_cache_key(offer_id, generation) for offer_id in offer_ids if offer_id is not None])
+
+
+def duration_minutes(duration):
+    """
+    Длительность timedelta в целых минутах, неполная минута округляется вверх
+    """
+
+    return math.ceil(duration.total_seconds() / 60)
+
+
+def quote(offer_id, duration):
+    return get_price_tiers((offer_id,))[offer_id].quote(duration_minutes(duration))
+
+
+def quote_many(offer_ids, durations):
+    """
+    Стоимость каждого предложения на каждую длительность: {offer_id: [стоимость, ...]}
+    """
+
+    minutes = [duration_minutes(duration) for duration in durations]
+    order = sorted(range(len(minutes)), key=minutes.__getitem__)
+
+    return {offer_id: tiers.quote_many(minutes, order) for offer_id, tiers in get_price_tiers(offer_ids).items()}
@@ -0,0 +1,143 @@
+"""
+Поддержка хранимых агрегатов рейтинга предложений и точек выдачи.
+
+Агрегаты (средняя оценка, количество оценок и гистограмма по оценкам) обновляются инкрементально
+одним UPDATE при изменении оценки и могут быть полностью пересчитаны командой `rebuild_ratings`.
+"""
+from collections import Counter
+
+from django.apps import apps as global_apps
+from django.db.models import F, Value, FloatField, Count, Q, Sum
+from django.db.models.functions import Cast, Coalesce, Now, NullIf
+
+
+RATING_MARKS = (1, 2, 3, 4, 5)
+RATING_MARK_FIELDS = {mark: f'rating_mark_{mark}' for mark in RATING_MARKS}
+
+
+def _rating_delta_updates(deltas):
+    """
+    Возвращает выражения UPDATE, сдвигающие гистограмму на `deltas` и пересчитывающие среднее по новой гистограмме
+    """
+
+    marks = {mark: F(field) + deltas.get(mark, 0) for mark, field in RATING_MARK_FIELDS.items()}
+    count = F('rating_count') + sum(deltas.values())
+    total = sum((Value(mark) * expression for mark, expression in marks.items()), Value(0))
+
+    updates = {RATING_MARK_FIELDS[mark]: marks[mark] for mark, delta in deltas.items() if delta}
+    updates.update({
+        'rating_count': count,
+        'rating_avg': Coalesce(
+            Cast(total, FloatField()) / NullIf(count, Value(0)), Value(.0), output_field=FloatField()),
+    })
+
+    return updates
+
+
+def apply_rating_change(offer_id, added=None, removed=None):
+    """
+    Инкрементально обновляет агрегаты предложения и его точки выдачи.
+    Вызывается в той же транзакции, в которой создается, изменяется или удаляется оценка
+    """
+
+    deltas = Counter()
+    if added is not None:
+        deltas[added] += 1
+    if removed is not None:
+        deltas[removed] -= 1
+
+    if not any(deltas.values()):
+        return
+
+    Offer = global_apps.get_model('offer', 'Offer')
+    RentalPoint = global_apps.get_model('company', 'RentalPoint')
+
+    updates = _rating_delta_updates(deltas)
+    Offer.objects.filter(id=offer_id).update(**updates, updated_at=Now())
+    RentalPoint.objects.filter(offers__id=offer_id).update(**updates, updated_at=Now())
+
+
+def _aggregate_values(histogram):
+    count = sum(histogram.values())
+    total = sum(mark * histogram[mark] for mark in RATING_MARKS)
+    values = {RATING_MARK_FIELDS[mark]: histogram[mark] for mark in RATING_MARKS}
+    values.update({'rating_count': count, 'rating_avg': total / count if count else .0})
+
+    return values
+
+
+def _bulk_apply(model, rows, batch_size):
+    """
+    Записывает агрегаты `rows` (id, значения полей) пакетами по `batch_size`
+    """
+
+    fields = ['rating_avg', 'rating_count', *RATING_MARK_FIELDS.values()]
+    batch = []
+    for pk, values in rows:
+        batch.append(model(id=pk, **values))
+        if len(batch) >= batch_size:
+            model.objects.bulk_update(batch, fields)
+            batch = []
+
+    if batch:
+        model.objects.bulk_update(batch, fields)
+
+
+def _reset(queryset):
+    return queryset.update(rating_avg=.0, rating_count=0, **{field: 0 for field in RATING_MARK_FIELDS.values()})
+
+
+def rebuild_offer_ratings(apps=global_apps, batch_size=1000):
+    """
+    Полностью пересчитывает агрегаты предложений по таблице оценок
+    """
+
+    Offer = apps.get_model('offer', 'Offer')
+    Rating = apps.get_model('offer', 'Rating')
+
+    _reset(Offer.objects.filter(rating_count__gt=0).exclude(id__in=Rating.objects.values('offer_id')))
+
+    aggregates = Rating.objects.order_by().values('offer_id').annotate(
+        **{f'mark_{mark}': Count('mark', filter=Q(mark=mark)) for mark in RATING_MARKS})
+
+    rows = (
+        (row['offer_id'], _aggregate_values({mark: row[f'mark_{mark}'] for mark in RATING_MARKS}))
+        for row in aggregates.iterator(chunk_size=batch_size)
+    )
+    _bulk_apply(Offer, rows, batch_size)
+
+
+def rebuild_rental_point_ratings(apps=global_apps, rental_point_ids=None, batch_size=1000):
+    """
+    Пересчитывает агрегаты точек выдачи по гистограммам их предложений.
+    Если `rental_point_ids` не указаны, пересчитываются все точки
+    """
+
+    RentalPoint = apps.get_model('company', 'RentalPoint')
+    Offer = apps.get_model('offer', 'Offer')
+
+    rental_points = RentalPoint.objects.all()
+    offers = Offer.objects.filter(rating_count__gt=0)
+    if rental_point_ids is not None:
+        rental_points = rental_points.filter(id__in=rental_point_ids)
+        offers = offers.filter(rental_point_id__in=rental_point_ids)
+
+    _reset(rental_points.filter(rating_count__gt=0).exclude(id__in=offers.values('rental_point_id')))
+
+    aggregates = offers.order_by().values('rental_point_id').annotate(
+        **{f'mark_{mark}': Sum(field) for mark, field in RATING_MARK_FIELDS.items()})
+
+    rows = (
+        (row['rental_point_id'], _aggregate_values({mark: row[f'mark_{mark}'] for mark in RATING_MARKS}))
+        for row in aggregates.iterator(chunk_size=batch_size)
+    )
+    _bulk_apply(RentalPoint, rows, batch_size)
+
+
+def rebuild_ratings(apps, schema_editor):
+    """
+    Заполнение агрегатов в миграции
+    """
+
+    rebuild_offer_ratings(apps)
+    rebuild_rental_point_ratings(apps)
@@ -0,0 +1,90 @@
+"""
+Полнотекстовый и триграммный поиск предложений.
+
+Для каждого предложения хранится поисковый документ: `search_vector` (tsvector с русским стеммингом и весами
+предмет/категория > город/компания > описание) и `search_document` (тот же текст одной строкой для триграммного
+поиска с опечатками). Оба поля покрыты GIN-индексами и пересчитываются одним UPDATE при изменении предложения
+или связанных с ним справочников (см. `offer.signals`).
+"""
+from django.contrib.postgres.lookups import PostgresOperatorLookup
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramBase
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Coalesce, Concat
+
+
+SEARCH_CONFIG = 'russian'
+
+SEARCH_VECTOR = (
+    SearchVector('product__name', 'product__category__name', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('rental_point__address__city__name', 'rental_point__company__name', weight='B',
+                   config=SEARCH_CONFIG)
+    + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+)
+
+SEARCH_DOCUMENT_FIELDS = (
+    'product__name', 'product__category__name', 'rental_point__address__city__name', 'rental_point__company__name',
+    'description'
+)
+
+
+@TextField.register_lookup
+class TrigramWordSimilar(PostgresOperatorLookup):
+    """
+    Lookup `trigram_word_similar`: в документе есть фрагмент, похожий на искомую строку (оператор `%>`, GIN)
+    """
+
+    lookup_name = 'trigram_word_similar'
+    postgres_operator = '%%>'
+
+
+class TrigramWordSimilarity(TrigramBase):
+    """
+    Похожесть строки на наиболее близкий фрагмент документа
+    """
+
+    function = 'WORD_SIMILARITY'
+
+
+def get_search_document():
+    parts = []
+    for field in SEARCH_DOCUMENT_FIELDS:
+        parts.extend((Coalesce(F(field), Value('')), Value(' ')))
+
+    return Concat(*parts[:-1], output_field=TextField())
+
+
+def update_search_documents(offers):
+    """
+    Пересчитывает поисковые документы предложений из queryset `offers` одним UPDATE
+    """
+
+    documents = offers.model.objects.filter(pk=OuterRef('pk'))
+
+    return offers.update(
+        search_vector=Subquery(documents.annotate(vector=SEARCH_VECTOR).values('vector')[:1]),
+        search_document=Subquery(documents.annotate(document=get_search_document()).values('document')[:1]),
+    )
+
+
+def fill_search_documents(apps, schema_editor):
+    """
+    Заполнение поисковых документов в миграции
+    """
+
+    update_search_documents(apps.get_model('offer', 'Offer').objects.all())
+
+
+def search_offers(queryset, text):
+    """
+    Отбирает предложения по полнотекстовому совпадению или по триграммной похожести (устойчиво к опечаткам)
+    и добавляет аннотацию `search_rank` для сортировки по релевантности
+    """
+
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+
+    return queryset.annotate(
+        search_rank=(
+            Coalesce(SearchRank(F('search_vector'), query), Value(.0), output_field=FloatField())
+            + Coalesce(TrigramWordSimilarity(Value(text), F('search_document')), Value(.0), output_field=FloatField())
+        ),
+    ).filter(Q(search_vector=query) | Q(search_document__trigram_word_similar=text))
@@ -0,0 +1,69 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from company.models import Company, RentalPoint
+from offer.models import Offer, OfferImage, Price
+from offer.pricing import invalidate_price_tiers
+from offer.search import update_search_documents
+from offer.tasks import schedule_variants
+from product.models import Product
+from reference.models import Address, Category, City
+
+
+SEARCH_DOCUMENT_OFFER_FIELDS = {'description', 'product', 'product_id', 'rental_point', 'rental_point_id'}
+
+
+@receiver(post_save, sender=Offer)
+def update_offer_search_document(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not SEARCH_DOCUMENT_OFFER_FIELDS.intersection(update_fields):
+        return
+
+    update_search_documents(Offer.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_documents(sender, instance, created=False, **kwargs):
+    if not created:
+        update_search_documents(Offer.objects.filter(product=instance))
+
+
+@receiver(post_save, sender=Category)
+def update_category_search_documents(sender, instance, created=False, **kwargs):
+    if not created:
+        update_search_documents(Offer.objects.filter(product__category=instance))
+
+
+@receiver(post_save, sender=City)
+def update_city_search_documents(sender, instance, created=False, **kwargs):
+    if not created:
+        update_search_documents(Offer.objects.filter(rental_point__address__city=instance))
+
+
+@receiver(post_save, sender=Address)
+def update_address_search_documents(sender, instance, created=False, **kwargs):
+    if not created:
+        update_search_documents(Offer.objects.filter(rental_point__address=instance))
+
+
+@receiver(post_save, sender=Company)
+def update_company_search_documents(sender, instance, created=False, **kwargs):
+    if not created:
+        update_search_documents(Offer.objects.filter(rental_point__company=instance))
+
+
+@receiver(post_save, sender=RentalPoint)
+def update_rental_point_search_documents(sender, instance, created=False, **kwargs):
+    if not created:
+        update_search_documents(Offer.objects.filter(rental_point=instance))
+
+
+@receiver(post_save, sender=Price)
+@receiver(post_delete, sender=Price)
+def invalidate_offer_price_tiers(sender, instance, **kwargs):
+    invalidate_price_tiers(instance.offer_id)
+
+
+@receiver(post_save, sender=OfferImage)
+def schedule_offer_image_variants(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or update_fields is None or 'image' in update_fields:
+        schedule_variants([instance])
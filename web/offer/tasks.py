@@ -0,0 +1,38 @@
+from core.collections import ImportStatuses
+from core.tasks import task
+from offer.catalog import run_import
+from offer.images import generate_variants
+from offer.models import CatalogImport
+
+
+@task(name='offer.generate_image_variants', queue='images', max_attempts=3, retry_delay=30, max_concurrency=4)
+def generate_image_variants(name):
+    """
+    Создает уменьшенные копии и WebP-вариант изображения предложения
+    """
+
+    generate_variants(name)
+
+
+def schedule_variants(images):
+    """
+    Ставит создание вариантов изображений в очередь фоновых задач в текущей транзакции
+    """
+
+    for image in images:
+        if image.image:
+            generate_image_variants.delay(image.image.name)
+
+
+@task(name='offer.import_catalog', queue='imports', max_attempts=3, retry_delay=60, max_concurrency=2)
+def import_catalog(job_id):
+    """
+    Импортирует загруженный файл каталога. Повторная попытка продолжает с первой необработанной пачки строк
+    """
+
+    job = CatalogImport.objects.select_related('company').get(pk=job_id)
+    if job.status == ImportStatuses.DONE:
+        return
+
+    with job.file.open('rb') as file:
+        run_import(job, file)
@@ -1,3 +1,172 @@
+import json
+from datetime import timedelta
+from io import BytesIO
+
+from django.core.cache import cache
+from django.db.models import F
 from django.test import TestCase
 
-# Create your tests here.
+from company.models import Company, RentalPoint
+from core.collections import ImportFormats, ImportStatuses, TimeUnits
+from core.models import CacheGeneration
+from offer.catalog import run_import
+from offer.models import CatalogImport, Offer, Price
+from offer.pricing import normalize_tiers, quote, quote_many
+from reference.models import Category
+
+
+class PriceTiersTests(TestCase):
+    """
+    Стоимость аренды по ступеням цен
+    """
+
+    tiers = normalize_tiers([
+        (1, TimeUnits.DAY, 1000, TimeUnits.DAY),
+        (2, TimeUnits.HOUR, 100, TimeUnits.HOUR),
+    ])
+
+    def test_quote_uses_largest_reached_threshold(self):
+        self.assertEqual(self.tiers.thresholds, (120, 1440))
+        # Аренда короче первой ступени оплачивается как ее минимальный срок
+        self.assertEqual(self.tiers.quote(30), 200)
+        self.assertEqual(self.tiers.quote(150), 300)
+        self.assertEqual(self.tiers.quote(1440), 1000)
+        self.assertEqual(self.tiers.quote(1441), 2000)
+
+    def test_quote_many_keeps_order(self):
+        durations = [1441, 30, 150, 1440]
+
+        self.assertEqual(self.tiers.quote_many(durations), [self.tiers.quote(minutes) for minutes in durations])
+
+    def test_last_tier_with_same_threshold_wins(self):
+        tiers = normalize_tiers([(1, TimeUnits.HOUR, 100, TimeUnits.HOUR), (60, TimeUnits.MINUTE, 50, TimeUnits.HOUR)])
+
+        self.assertEqual(tiers.quote(60), 50)
+
+    def test_no_prices(self):
+        tiers = normalize_tiers([])
+
+        self.assertIsNone(tiers.quote(60))
+        self.assertEqual(tiers.quote_many([60, 120]), [None, None])
+
+
+class QuoteTests(TestCase):
+    """
+    Стоимость аренды предложений по ценам из базы и сброс кэша ступеней при изменении цен
+    """
+
+    def setUp(self):
+        cache.clear()
+        rental_point = RentalPoint.objects.create(company=Company.objects.create(name='Прокат'))
+        self.offer = Offer.objects.create(rental_point=rental_point, count=1)
+        self.other = Offer.objects.create(rental_point=rental_point, count=1)
+        Price.objects.create(
+            offer=self.offer, time_from=0, time_from_unit=TimeUnits.HOUR, price_per_time=100,
+            price_per_time_unit=TimeUnits.HOUR)
+
+    def test_quote_rounds_duration_up(self):
+        self.assertEqual(quote(self.offer.id, timedelta(minutes=60)), 100)
+        self.assertEqual(quote(self.offer.id, timedelta(minutes=60, seconds=1)), 200)
+        self.assertIsNone(quote(self.other.id, timedelta(hours=1)))
+
+    def test_quote_many(self):
+        self.assertEqual(quote_many((self.offer.id, self.other.id), [timedelta(hours=3), timedelta(hours=1)]), {
+            self.offer.id: [300, 100],
+            self.other.id: [None, None],
+        })
+
+    def test_price_change_invalidates_cached_tiers(self):
+        self.assertEqual(quote(self.offer.id, timedelta(days=2)), 4800)
+
+        price = Price.objects.create(
+            offer=self.offer, time_from=1, time_from_unit=TimeUnits.DAY, price_per_time=1000,
+            price_per_time_unit=TimeUnits.DAY)
+        self.assertEqual(quote(self.offer.id, timedelta(days=2)), 2000)
+
+        price.delete()
+        self.assertEqual(quote(self.offer.id, timedelta(days=2)), 4800)
+
+    def test_price_change_in_another_process_is_seen(self):
+        self.assertEqual(quote(self.offer.id, timedelta(hours=1)), 100)
+
+        # Другой процесс меняет цену: локальный кэш не сбрасывается, но поколение цен в базе увеличивается
+        Price.objects.filter(offer=self.offer).update(price_per_time=150)
+        self.assertEqual(quote(self.offer.id, timedelta(hours=1)), 100)
+        CacheGeneration.objects.filter(label='offer.price').update(generation=F('generation') + 1)
+        self.assertEqual(quote(self.offer.id, timedelta(hours=1)), 150)
+
+
+class CatalogImportTests(TestCase):
+    """
+    Импорт каталога пачками: ошибки строк, повторное использование справочников и продолжение прерванного импорта
+    """
+
+    rows = (
+        'city,address,product,category,count,prices\n'
+        'Москва,Тверская 1,Велосипед,Спорт,3,"[{""time_from"": 0, ""price_per_time"": 100}]"\n'
+        'Москва,Тверская 1,Самокат,Спорт,2,\n'
+        'Москва,Арбат 2,Ролики,Спорт,1,\n'
+        'Москва,Арбат 2,Лыжи,Спорт,-1,\n'
+        'Казань,Баумана 3,Велосипед,Спорт,4,\n'
+    ).encode()
+
+    def setUp(self):
+        self.company = Company.objects.create(name='Прокат')
+        self.job = CatalogImport.objects.create(company=self.company, source='catalog.csv')
+
+    def test_interrupted_import_resumes_after_saved_batches(self):
+        def interrupt(job):
+            raise RuntimeError('interrupted')
+
+        with self.assertRaises(RuntimeError):
+            run_import(self.job, BytesIO(self.rows), batch_size=2, progress=interrupt)
+
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.rows_processed, self.job.offers_created),
+                         (ImportStatuses.FAILED, 2, 2))
+
+        run_import(self.job, BytesIO(self.rows), batch_size=2)
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, ImportStatuses.DONE)
+        self.assertEqual((self.job.rows_processed, self.job.offers_created, self.job.prices_created), (5, 4, 1))
+        self.assertEqual(self.job.error_count, 1)
+        self.assertEqual(self.job.errors[0]['row'], 4)
+
+        offers = Offer.objects.filter(rental_point__company=self.company)
+        self.assertEqual(sorted(offers.values_list('product__name', flat=True)),
+                         ['Велосипед', 'Велосипед', 'Ролики', 'Самокат'])
+        self.assertEqual(RentalPoint.objects.filter(company=self.company).count(), 3)
+        self.assertEqual(Category.objects.filter(name='Спорт').count(), 1)
+
+    def test_jsonl_row_errors_keep_numbering(self):
+        self.job.format = ImportFormats.JSONL
+        lines = [
+            json.dumps({'rental_point': 0, 'city': 'Москва', 'address': 'Тверская 1', 'product': 'Велосипед',
+                        'count': 1}),
+            '{not json',
+            json.dumps({'rental_point': 999999, 'product': 'Самокат', 'count': 1}),
+            json.dumps({'city': 'Москва', 'address': 'Тверская 1', 'product': 'Самокат', 'count': 2,
+                        'prices': [{'time_from': 1, 'time_from_unit': 'week', 'price_per_time': 1}]}),
+        ]
+
+        run_import(self.job, BytesIO('\n'.join(lines).encode()), batch_size=10)
+
+        self.assertEqual(self.job.offers_created, 1)
+        self.assertEqual([error['row'] for error in self.job.errors], [2, 3, 4])
+
+    def test_values_out_of_database_range_are_row_errors(self):
+        self.job.format = ImportFormats.JSONL
+        row = {'city': 'Москва', 'address': 'Тверская 1', 'product': 'Велосипед', 'count': 1}
+        lines = [
+            json.dumps({**row, 'count': 10000000000}),
+            json.dumps({**row, 'prices': [{'time_from': 2 ** 31, 'price_per_time': 1}]}),
+            json.dumps({**row, 'description': 'a\x00b'}),
+            json.dumps({**row, 'rental_point': 2 ** 40}),
+            json.dumps(row),
+        ]
+
+        run_import(self.job, BytesIO('\n'.join(lines).encode()), batch_size=10)
+
+        self.assertEqual((self.job.status, self.job.offers_created), (ImportStatuses.DONE, 1))
+        self.assertEqual([error['row'] for error in self.job.errors], [1, 2, 3, 4])
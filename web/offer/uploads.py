@@ -0,0 +1,151 @@
+"""
+Загрузка изображений предложений по частям с возобновлением.
+
+Клиент создает загрузку с именем и размером файла, затем отправляет части запросами PUT с заголовком
+`Content-Range: bytes <начало>-<конец>/<размер>` и телом части. Тело читается из потока блоками фиксированного
+размера и сразу дописывается во временный файл, поэтому память процесса не зависит от размера части.
+Часть принимается, только если начинается с уже полученного смещения: после обрыва связи клиент запрашивает
+загрузку и продолжает с поля `received`. Получив последний байт, сервер проверяет изображение и переносит файл
+в хранилище как изображение предложения (повторно загруженное содержимое получает уже существующее изображение).
+"""
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from PIL import Image
+
+from core.collections import UploadStatuses
+from offer.images import get_or_create_image
+
+
+UPLOAD_BLOCK_SIZE = 64 * 1024
+CONTENT_RANGE = re.compile(r'^bytes (?P<start>\d+)-(?P<end>\d+)/(?P<size>\d+)$')
+
+
+class UploadError(Exception):
+    """
+    Часть загрузки не может быть принята
+    """
+
+
+class UploadOffsetMismatch(UploadError):
+    """
+    Часть начинается не с полученного смещения: клиент должен продолжить с `received`
+    """
+
+    def __init__(self, received):
+        super().__init__(f'Ожидается часть, начинающаяся с байта {received}.')
+        self.received = received
+
+
+def get_part_path(upload):
+    return os.path.join(settings.IMAGE_UPLOAD_TEMP_DIR, f'{upload.id}.part')
+
+
+def parse_content_range(header, size):
+    """
+    (начало, длина) части из заголовка Content-Range
+    """
+
+    match = CONTENT_RANGE.match((header or '').strip())
+    if match is None:
+        raise UploadError('Ожидается заголовок Content-Range: bytes <начало>-<конец>/<размер>.')
+
+    start, end = int(match['start']), int(match['end'])
+    if int(match['size']) != size:
+        raise UploadError(f'Размер файла в Content-Range не совпадает с размером загрузки {size}.')
+    if end < start or end >= size:
+        raise UploadError('Неверный диапазон Content-Range.')
+
+    return start, end - start + 1
+
+
+def write_chunk(upload, stream, content_range):
+    """
+    Дописывает часть из потока во временный файл и сохраняет полученное смещение. Если поток оборвался,
+    принятая часть байт сохраняется и клиент продолжит с нее. Загрузку нужно заблокировать (select_for_update)
+    """
+
+    if upload.status == UploadStatuses.COMPLETED:
+        raise UploadError('Загрузка уже завершена.')
+
+    start, length = parse_content_range(content_range, upload.size)
+    if start != upload.received:
+        raise UploadOffsetMismatch(upload.received)
+    if stream is None:
+        raise UploadError('Пустое тело части.')
+
+    path = get_part_path(upload)
+    if start and (not os.path.exists(path) or os.path.getsize(path) < start):
+        # Временный файл потерян (очищен каталог или часть пришла на другой сервер): загрузка начинается заново,
+        # иначе начало файла заполнилось бы нулями, а ошибка обнаружилась бы только после получения всего файла
+        upload.received = 0
+        upload.save(update_fields=('received', 'updated_at'))
+        raise UploadOffsetMismatch(0)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    written = 0
+    with open(path, 'r+b' if start else 'wb') as part:
+        part.seek(start)
+        while written < length:
+            block = stream.read(min(UPLOAD_BLOCK_SIZE, length - written))
+            if not block:
+                break
+            part.write(block)
+            written += len(block)
+        part.truncate()
+
+    upload.received = start + written
+    upload.save(update_fields=('received', 'updated_at'))
+
+    if written < length:
+        raise UploadError(f'Получено {written} из {length} байт части.')
+
+    if upload.received == upload.size:
+        complete_upload(upload)
+
+    return upload
+
+
+def complete_upload(upload):
+    """
+    Проверяет полученный файл и переносит его в хранилище как изображение предложения,
+    если изображения с таким содержимым еще нет
+    """
+
+    path = get_part_path(upload)
+
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        discard_part(upload)
+        upload.received = 0
+        upload.save(update_fields=('received', 'updated_at'))
+        raise UploadError('Файл не является изображением, загрузку нужно начать заново.')
+
+    with open(path, 'rb') as part:
+        image, _ = get_or_create_image(part, upload.name)
+
+    discard_part(upload)
+    upload.image = image
+    upload.status = UploadStatuses.COMPLETED
+    upload.save(update_fields=('image', 'status', 'updated_at'))
+
+
+def discard_part(upload):
+    try:
+        os.remove(get_part_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def get_expired_uploads(queryset, hours):
+    """
+    Незавершенные загрузки без новых частей дольше `hours` часов
+    """
+
+    return queryset.filter(status=UploadStatuses.PENDING, updated_at__lt=timezone.now() - timedelta(hours=hours))
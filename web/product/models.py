@@ -1,7 +1,9 @@
 from django.db import models
 
+from core.models import AbstractUpdatedAt
 
-class Product(models.Model):
+
+class Product(AbstractUpdatedAt):
     """
     Модель предмета аренды
     """
@@ -5,3 +5,6 @@ class ReferenceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reference'
     verbose_name = 'Справочники'
+
+    def ready(self):
+        from reference import signals  # noqa: F401
@@ -0,0 +1,137 @@
+"""
+Дерево категорий в виде материализованного пути.
+
+`Category.path` хранит идентификаторы предков и самой категории: '/1/5/12/'. Все потомки категории, включая ее саму,
+выбираются одним запросом `path LIKE '/1/5/%'` по индексу (для CharField с db_index Django создает в PostgreSQL
+дополнительный индекс varchar_pattern_ops). Путь поддерживается при записи: перенос категории одним UPDATE
+переписывает пути всего поддерева.
+
+Ключ кэша дерева категорий включает поколение категорий из базы (см. core.cache), поэтому категории, созданные
+в другом процессе (например, импортом каталога в исполнителе задач), сразу видны во всех процессах.
+"""
+from django.apps import apps as global_apps
+from django.core.cache import cache
+from django.db.models import Q, Value
+from django.db.models.functions import Concat, Substr
+
+from core.cache import get_generations
+
+
+CATEGORY_TREE_CACHE_PREFIX = 'category_tree'
+CATEGORY_TREE_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def get_category_model(apps=global_apps):
+    return apps.get_model('reference', 'Category')
+
+
+def build_path(category):
+    if category.parent_id is None:
+        return f'/{category.pk}/'
+
+    parent_path = get_category_model().objects.filter(pk=category.parent_id).values_list('path', flat=True).first()
+    return f'{parent_path or "/"}{category.pk}/'
+
+
+def is_in_subtree(category_id, root):
+    """
+    Принадлежит ли категория `category_id` поддереву `root` (включая сам `root`)
+    """
+
+    if category_id == root.pk:
+        return True
+
+    return bool(root.path) and get_category_model().objects.filter(
+        pk=category_id, path__startswith=root.path).exists()
+
+
+def move_subtree(category, previous_path, path):
+    """
+    Переписывает путь категории и всех ее потомков с `previous_path` на `path`
+    """
+
+    Category = get_category_model()
+
+    if previous_path:
+        Category.objects.filter(path__startswith=previous_path).update(
+            path=Concat(Value(path), Substr('path', len(previous_path) + 1)))
+    else:
+        Category.objects.filter(pk=category.pk).update(path=path)
+
+    category.path = path
+
+
+def detach_subtree(path):
+    """
+    Делает корнями дочерние категории удаленной категории с путем `path`: у потомков отбрасывается префикс пути
+    """
+
+    get_category_model().objects.filter(path__startswith=path).update(
+        path=Concat(Value('/'), Substr('path', len(path) + 1)))
+
+
+def descendants(categories):
+    """
+    Условие для категорий: потомки любой из `categories` (включая их самих). `categories` - queryset или список.
+    Категория без пути (создана bulk_create или еще не заполнена) дает только саму себя: пустой префикс
+    совпал бы со всеми категориями
+    """
+
+    condition = Q(pk__in=[category.pk for category in categories if not category.path])
+    for path in {category.path for category in categories if category.path}:
+        condition |= Q(path__startswith=path)
+
+    return condition
+
+
+def fill_category_paths(apps, schema_editor):
+    """
+    Заполняет пути всех категорий от корней вниз, один запрос на уровень дерева
+    """
+
+    Category = get_category_model(apps)
+
+    level = list(Category.objects.filter(parent__isnull=True))
+    for category in level:
+        category.path = f'/{category.pk}/'
+
+    while level:
+        Category.objects.bulk_update(level, ['path'], batch_size=1000)
+        paths = {category.pk: category.path for category in level}
+        level = list(Category.objects.filter(parent__in=list(paths)))
+        for category in level:
+            category.path = f'{paths[category.parent_id]}{category.pk}/'
+
+
+def get_category_tree_cache_key():
+    generation, = get_generations(('reference.category',))
+    return f'{CATEGORY_TREE_CACHE_PREFIX}:{generation}'
+
+
+def get_category_tree():
+    """
+    Полное дерево категорий: [{'id', 'name', 'children': [...]}, ...]. Строится одним запросом и кэшируется
+    """
+
+    key = get_category_tree_cache_key()
+    tree = cache.get(key)
+    if tree is not None:
+        return tree
+
+    tree, nodes = [], {}
+    for category_id, name, parent_id in get_category_model().objects.order_by('path', 'id').values_list(
+            'id', 'name', 'parent_id'):
+        node = nodes[category_id] = {'id': category_id, 'name': name, 'children': []}
+        parent = nodes.get(parent_id)
+        (parent['children'] if parent is not None else tree).append(node)
+
+    cache.set(key, tree, CATEGORY_TREE_CACHE_TIMEOUT)
+    return tree
+
+
+def invalidate_category_tree():
+    """
+    Сбрасывает дерево в кэше сразу, не дожидаясь фиксации транзакции и увеличения поколения категорий
+    """
+
+    cache.delete(get_category_tree_cache_key())
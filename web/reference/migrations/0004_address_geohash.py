@@ -0,0 +1,36 @@
+# Generated by Django 3.2.3 on 2026-10-18 12:06
+
+from django.db import migrations, models
+
+from core.geo import encode_geohash
+
+
+def fill_geohash(apps, schema_editor):
+    Address = apps.get_model('reference', 'Address')
+
+    addresses = Address.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    batch = []
+    for address in addresses.only('id', 'latitude', 'longitude').iterator(chunk_size=2000):
+        address.geohash = encode_geohash(address.latitude, address.longitude)
+        batch.append(address)
+        if len(batch) == 2000:
+            Address.objects.bulk_update(batch, ['geohash'])
+            batch = []
+
+    Address.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reference', '0003_auto_20210522_0738'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12, verbose_name='Геохеш'),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.3 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+from reference.categories import fill_category_paths
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reference', '0004_address_geohash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255, verbose_name='Путь'),
+        ),
+        migrations.RunPython(fill_category_paths, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,12 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 
-from core.models import LatitudeField, LongitudeField
+from core.geo import encode_geohash
+from core.models import AbstractUpdatedAt, LatitudeField, LongitudeField
+from reference.categories import build_path, is_in_subtree, move_subtree
 
 
-class City(models.Model):
+class City(AbstractUpdatedAt):
     """
     Модель города
     """
@@ -18,7 +21,7 @@ class City(models.Model):
         return self.name
 
 
-class Address(models.Model):
+class Address(AbstractUpdatedAt):
     """
     Модель адреса
     """
@@ -27,6 +30,7 @@ class Address(models.Model):
     latitude = LatitudeField(null=True, blank=True)
     longitude = LongitudeField(null=True, blank=True)
     city = models.ForeignKey('City', verbose_name='Город', on_delete=models.SET_NULL, null=True, blank=True)
+    geohash = models.CharField('Геохеш', max_length=12, blank=True, db_index=True, editable=False)
 
     class Meta:
         verbose_name = 'Адрес'
@@ -35,8 +39,18 @@ class Address(models.Model):
     def __str__(self):
         return self.address or self.city.name if self.city else 'Не указан'
 
+    def save(self, *args, **kwargs):
+        has_location = self.latitude is not None and self.longitude is not None
+        self.geohash = encode_geohash(self.latitude, self.longitude) if has_location else ''
 
-class Category(models.Model):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'}.intersection(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+
+        super().save(*args, **kwargs)
+
+
+class Category(AbstractUpdatedAt):
     """
     Модель категории
     """
@@ -44,6 +58,7 @@ class Category(models.Model):
     name = models.CharField('Название', max_length=200)
     parent = models.ForeignKey(
         'self', verbose_name='Категория верхнего уровня', on_delete=models.SET_NULL, null=True, blank=True)
+    path = models.CharField('Путь', max_length=255, db_index=True, editable=False, default='')
 
     class Meta:
         verbose_name = 'Категория'
@@ -51,3 +66,17 @@ class Category(models.Model):
 
     def __str__(self):
         return self.name
+
+    def clean(self):
+        if self.pk is not None and self.parent_id is not None and is_in_subtree(self.parent_id, self):
+            raise ValidationError({'parent': 'Категория не может быть вложена в саму себя или в свою подкатегорию.'})
+
+    def save(self, *args, **kwargs):
+        self.clean()
+
+        previous_path = self.path
+        super().save(*args, **kwargs)
+
+        path = build_path(self)
+        if path != previous_path:
+            move_subtree(self, previous_path, path)
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from reference.categories import detach_subtree, invalidate_category_tree
+from reference.models import Category
+
+
+@receiver(post_save, sender=Category)
+def invalidate_saved_category_tree(sender, instance, **kwargs):
+    invalidate_category_tree()
+
+
+@receiver(post_delete, sender=Category)
+def detach_deleted_category(sender, instance, **kwargs):
+    if instance.path:
+        detach_subtree(instance.path)
+    invalidate_category_tree()
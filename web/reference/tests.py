@@ -1,3 +1,90 @@
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import F
 from django.test import TestCase
 
-# Create your tests here.
+from core.models import CacheGeneration
+from reference.categories import descendants, get_category_tree
+from reference.models import Category
+
+
+class CategoryPathTests(TestCase):
+    """
+    Материализованный путь категорий: заполнение, перенос поддерева, удаление и выборка потомков
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.sport = Category.objects.create(name='Спорт')
+        self.bikes = Category.objects.create(name='Велосипеды', parent=self.sport)
+        self.mountain = Category.objects.create(name='Горные', parent=self.bikes)
+        self.winter = Category.objects.create(name='Зима')
+
+    def get_paths(self):
+        return dict(Category.objects.values_list('name', 'path'))
+
+    def test_paths_follow_parents(self):
+        self.assertEqual(self.get_paths(), {
+            'Спорт': f'/{self.sport.pk}/',
+            'Велосипеды': f'/{self.sport.pk}/{self.bikes.pk}/',
+            'Горные': f'/{self.sport.pk}/{self.bikes.pk}/{self.mountain.pk}/',
+            'Зима': f'/{self.winter.pk}/',
+        })
+
+    def test_moving_category_rewrites_subtree(self):
+        self.bikes.parent = self.winter
+        self.bikes.save()
+
+        paths = self.get_paths()
+        self.assertEqual(paths['Велосипеды'], f'/{self.winter.pk}/{self.bikes.pk}/')
+        self.assertEqual(paths['Горные'], f'/{self.winter.pk}/{self.bikes.pk}/{self.mountain.pk}/')
+        self.assertEqual(paths['Спорт'], f'/{self.sport.pk}/')
+
+    def test_category_cannot_move_into_own_subtree(self):
+        self.sport.parent = self.mountain
+
+        with self.assertRaises(ValidationError):
+            self.sport.save()
+
+    def test_deleted_category_detaches_children(self):
+        self.sport.delete()
+
+        paths = self.get_paths()
+        self.assertEqual(paths['Велосипеды'], f'/{self.bikes.pk}/')
+        self.assertEqual(paths['Горные'], f'/{self.bikes.pk}/{self.mountain.pk}/')
+
+    def test_descendants(self):
+        def names(categories):
+            return set(Category.objects.filter(descendants(categories)).values_list('name', flat=True))
+
+        self.assertEqual(names([self.sport]), {'Спорт', 'Велосипеды', 'Горные'})
+        self.assertEqual(names(Category.objects.filter(pk__in=(self.mountain.pk, self.winter.pk))), {'Горные', 'Зима'})
+
+        # Категория без пути (например, созданная bulk_create) совпадает только сама с собой
+        orphan, = Category.objects.bulk_create([Category(name='Без пути')])
+        self.assertEqual(names([orphan]), {'Без пути'})
+
+    def test_category_tree(self):
+        # Корни упорядочены по строке пути, а не по числовому id
+        self.assertEqual(sorted(get_category_tree(), key=lambda node: node['id']), [
+            {'id': self.sport.pk, 'name': 'Спорт', 'children': [
+                {'id': self.bikes.pk, 'name': 'Велосипеды', 'children': [
+                    {'id': self.mountain.pk, 'name': 'Горные', 'children': []},
+                ]},
+            ]},
+            {'id': self.winter.pk, 'name': 'Зима', 'children': []},
+        ])
+
+        self.mountain.parent = None
+        self.mountain.save()
+        roots = {node['id'] for node in get_category_tree()}
+        self.assertEqual(roots, {self.sport.pk, self.winter.pk, self.mountain.pk})
+
+    def test_category_created_in_another_process_appears_in_tree(self):
+        get_category_tree()
+
+        # Другой процесс создает категорию: локальный кэш не сбрасывается, но поколение категорий в базе увеличивается
+        created, = Category.objects.bulk_create([Category(name='Лето')])
+        self.assertNotIn(created.pk, {node['id'] for node in get_category_tree()})
+        CacheGeneration.objects.filter(label='reference.category').update(generation=F('generation') + 1)
+        self.assertIn(created.pk, {node['id'] for node in get_category_tree()})